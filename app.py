@@ -1,324 +1,268 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from fpdf import FPDF
+from functools import wraps
 from urllib.parse import quote_plus 
-import re 
 import os
-import json
-import requests 
+import time
+
+import busqueda
+import carga_rapida
+import catalogo
+import directorio_clientes
+import historial
+import indices
+import listas_precios
+import modelo_cotizacion
+import pdf_cotizacion
+import pedidos
+import perfil
+import servidor
+from texto import limpiar_nombre_archivo
 
 # ==============================================================================
 # SECCIÓN 1: DEFINICIÓN DE FUNCIONES
 # ==============================================================================
 
-def limpiar_nombre_archivo(nombre):
-    """Convierte el nombre del cliente en un nombre de archivo seguro."""
-    reemplazos = {
-        'á':'a', 'é':'e', 'í':'i', 'ó':'o', 'ú':'u',
-        'Á':'A', 'É':'E', 'Í':'I', 'Ó':'O', 'Ú':'U',
-        'ñ':'n', 'Ñ':'N', 'ü':'u', 'Ü':'U'
-    }
-    for k, v in reemplazos.items():
-        nombre = nombre.replace(k, v)
-
-    nombre = re.sub(r'[<>:"/\\|?*,\.]', '', nombre)
-    nombre = '_'.join(nombre.split())
-
-    return nombre[:50] if nombre else "MOSTRADOR"
+@st.cache_resource
+def obtener_catalogo_incremental(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
+    # Una sola instancia por proceso, compartida por todas las sesiones
+    return catalogo.CatalogoIncremental(nombre_archivo_catalogo, nombre_archivo_actualizaciones)
 
-
-
-@st.cache_data
+@perfil.medido('catalogo')
 def cargar_catalogo(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
-    catalogo = []
-    try:
-        with open(nombre_archivo_catalogo, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    partes = line.strip().split(',')
-                    if len(partes) < 3: continue
-                    codigo = partes[0].strip()
-                    precio = float(partes[-1].strip())
-                    descripcion = ','.join(partes[1:-1]).strip()
-                    catalogo.append({'codigo': codigo, 'descripcion': descripcion, 'precio': precio})
-                except (ValueError, IndexError): continue
-    except FileNotFoundError:
-        return pd.DataFrame()
-
-    df = pd.DataFrame(catalogo)
-    if df.empty: return pd.DataFrame(columns=['codigo', 'descripcion', 'precio'])
-    df = df.set_index('codigo')
-
-    try:
-        with open(nombre_archivo_actualizaciones, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    partes = line.strip().split(',')
-                    if len(partes) < 3: continue 
-                    codigo = partes[0].strip()
-                    nuevo_precio = float(partes[-1].strip())
-                    nueva_descripcion = ','.join(partes[1:-1]).strip()
-                    df.loc[codigo] = {'descripcion': nueva_descripcion, 'precio': nuevo_precio}
-                except: continue
-    except FileNotFoundError: pass
-
-    df = df.reset_index()
-    df['display'] = df['codigo'] + " - " + df['descripcion']
-    return df
-
-URL_CLIENTES_SHEET = "https://docs.google.com/spreadsheets/d/e/2PACX-1vTxPh4_poWxwC63UWWeczmFn-iAItg6UYnrZjtzBHcz-7SRs550_0pqwRHS8LCvu3PYe7oLgmn1IKoz/pub?gid=0&single=true&output=csv"
-
-@st.cache_data(ttl=600)
+    # Sólo relee las líneas nuevas o editadas de precios_actualizados.txt;
+    # el catálogo base sale del snapshot compilado
+    return obtener_catalogo_incremental(nombre_archivo_catalogo, nombre_archivo_actualizaciones).refrescar()
+
+LIMITE_RESULTADOS_BUSQUEDA = 25
+
+@perfil.medido('catalogo.buscador')
+def obtener_buscador(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
+    # Los índices se reconstruyen sólo cuando cambia la versión del catálogo
+    return obtener_catalogo_incremental(nombre_archivo_catalogo, nombre_archivo_actualizaciones).derivado(
+        'buscador', busqueda.BuscadorProductos)
+
+@perfil.medido('catalogo.indice')
+def obtener_indice_catalogo(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
+    # display -> fila y codigo -> fila, también por versión del catálogo
+    return obtener_catalogo_incremental(nombre_archivo_catalogo, nombre_archivo_actualizaciones).derivado(
+        'indice', lambda df: indices.TablaIndexada(df, ['display', 'codigo']))
+
+@perfil.medido('catalogo.tabla_precios')
+def obtener_tabla_precios(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
+    # Precio de cada producto en cada lista y escala, calculado en bloque por versión del catálogo
+    return obtener_catalogo_incremental(nombre_archivo_catalogo, nombre_archivo_actualizaciones).derivado(
+        'tabla_precios', listas_precios.motor_predeterminado().precalcular)
+
+@perfil.medido('catalogo.mapa_codigos')
+def obtener_mapa_codigos(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
+    # codigo -> (descripcion, precio) para la Carga Rápida
+    return obtener_catalogo_incremental(nombre_archivo_catalogo, nombre_archivo_actualizaciones).derivado(
+        'mapa_codigos', catalogo.mapa_codigos)
+
+@st.cache_resource
+def obtener_directorio_clientes(nombre_archivo_clientes):
+    # Compartido entre sesiones; arranca del snapshot local y se revalida en segundo plano
+    return directorio_clientes.DirectorioClientes(archivo_respaldo=nombre_archivo_clientes)
+
+@perfil.medido('clientes')
 def cargar_clientes(nombre_archivo_clientes):
-    # 1) Intenta leer desde Google Sheets
-    try:
-        df = pd.read_csv(URL_CLIENTES_SHEET, dtype=str).fillna("")
-        df = df.rename(columns={
-            'ID Vendedor': 'cve_age',
-            'ID Cliente': 'cve',
-            'Nombre Cliente ': 'nombre'
-        })
-        df = df[df['cve'].str.strip() != ""]
-        df['cve'] = df['cve'].str.strip()
-        df['cve_age'] = df['cve_age'].str.strip()
-        df['nombre'] = df['nombre'].str.strip()
-        df['display'] = df['cve'] + " - " + df['nombre'] + " (Vend: " + df['cve_age'] + ")"
-        return df[['cve', 'cve_age', 'nombre', 'display']]
-    except Exception as e:
-        st.error(f"Error leyendo Sheet: {e}")
-    # 2) Respaldo: archivo local si el Sheet falla
-    clientes = []
-    try:
-        with open(nombre_archivo_clientes, 'r', encoding='utf-8') as f:
-            for line in f:
-                partes = line.strip().split(',', 2)
-                if len(partes) >= 3:
-                    cve = partes[0].strip()
-                    cve_age = partes[1].strip()
-                    nombre = partes[2].strip()
-                    display = f"{cve} - {nombre} (Vend: {cve_age})"
-                    clientes.append({'cve': cve, 'cve_age': cve_age, 'nombre': nombre, 'display': display})
-    except FileNotFoundError:
-        return pd.DataFrame()
-    return pd.DataFrame(clientes)
-    def obtener_siguiente_folio_render():
-        url = "https://servidor-pedidos.onrender.com/api/folio-actual"
-    intentos_maximos = 3
-    
-    for intento in range(1, intentos_maximos + 1):
-        try:
-            # Mensaje visible al usuario sobre el intento actual
-            if intento > 1:
-                st.info(f"⏳ Intento {intento}/{intentos_maximos}: El servidor está despertando...")
-            
-            respuesta = requests.get(url, timeout=60)  # 60 seg para cold start
-            
-            if respuesta.status_code == 200:
-                datos = respuesta.json()
-                return int(datos['folio'])
-            else:
-                # AHORA SÍ vemos qué código devuelve
-                st.error(f"❌ El servidor respondió código {respuesta.status_code}")
-                st.code(respuesta.text[:500])  # Muestra el mensaje del servidor
-                return 99999
-                
-        except requests.exceptions.Timeout:
-            if intento < intentos_maximos:
-                continue  # Reintenta sin avisar todavía
-            st.error("❌ Timeout: El servidor tardó más de 60 seg en responder en cada intento.")
-            return 99999
-            
-        except requests.exceptions.ConnectionError as e:
-            st.error(f"❌ No se puede conectar al servidor. ¿Está caído?")
-            st.code(str(e))
-            return 99999
-            
-        except ValueError as e:
-            # JSON inválido
-            st.error(f"❌ El servidor respondió, pero no es JSON válido.")
-            st.code(f"Respuesta: {respuesta.text[:500]}")
-            return 99999
-            
-        except Exception as e:
-            st.error(f"❌ Error inesperado: {type(e)._name_}: {e}")
-            return 99999
-    
-    return 99999
-def crear_pedido_render(nombre_cliente, id_vendedor, id_cliente, cotizacion):
-    url = "https://servidor-pedidos.onrender.com/api/crear-pedido"
-    
-    # 1. Traducimos los datos de Python al formato exacto que pide Node.js
-    productos_formateados = []
-    for item in cotizacion:
-        productos_formateados.append({
-            "key": item["codigo"],        # server.js busca 'key'
-            "quantity": item["cantidad"], # server.js busca 'quantity'
-            "cve_suc": "PED",             
-            "cve_mon": 1,
-            "lugar": "A2"                 # Forzando almacén A2 por defecto
-        })
-        
-    # 2. Armamos el paquete de envío
-    payload = {
-        "clientName": nombre_cliente,
-        "agentId": id_vendedor,
-        "clientId": id_cliente,
-        "products": productos_formateados
-    }
-    
-    # 3. Enviamos la orden de crear pedido al servidor
-    try:
-        respuesta = requests.post(url, json=payload, timeout=30)
-        
-        if respuesta.status_code == 201:
-            datos = respuesta.json()
-            return datos["folio"] 
+    # Tabla de clientes con índices por display y cve; nunca espera al Sheet si ya hay una copia
+    directorio = obtener_directorio_clientes(nombre_archivo_clientes)
+    tabla = directorio.obtener()
+    if directorio.ultimo_error and directorio.origen in (None, 'archivo'):
+        st.error(f"Error leyendo Sheet: {directorio.ultimo_error}")
+    return tabla
+
+@perfil.medido('clientes.indice')
+def obtener_indice_clientes(nombre_archivo_clientes):
+    # Particiones por vendedor + buscador, recalculados sólo cuando cambia el directorio
+    return obtener_directorio_clientes(nombre_archivo_clientes).derivado(
+        'indice', directorio_clientes.IndiceClientes)
+
+def calentar_servidor():
+    # No bloquea; si el servidor se usó hace poco no hace nada
+    servidor.cliente_compartido().calentar()
+
+@st.cache_resource
+def obtener_buzon_pedidos():
+    # Un solo buzón e hilo de entrega por proceso, compartido por todas las sesiones
+    return pedidos.BuzonPedidos().iniciar()
+
+INTERVALO_ESTADO_PEDIDO = 2  # segundos entre consultas mientras el pedido está en cola
+
+def clave_pedido_de(cot, datos_pedido):
+    # Misma cotización y versión -> misma clave (un doble clic no duplica); otra cotización igual, otra clave
+    return cot.memoizado(('clave_pedido', datos_pedido), lambda: pedidos.clave_idempotencia(
+        pedidos.armar_payload(*datos_pedido, cot.cantidades()), f"{cot.uid}:{cot.version}"))
+
+@perfil.medido('pedido.encolar')
+def crear_pedido_render(cot, datos_pedido):
+    # Ya no espera al servidor: deja el pedido en el buzón y regresa su clave
+    payload = pedidos.armar_payload(*datos_pedido, cot.cantidades())
+    clave = obtener_buzon_pedidos().encolar(payload, clave_pedido_de(cot, datos_pedido))
+    # La sesión sólo muestra el estado de los pedidos que ella encoló
+    st.session_state.setdefault('pedidos_encolados', set()).add(clave)
+    return clave
+
+@perfil.medido('pedido.estado')
+def mostrar_estado_pedido(clave):
+    estado = obtener_buzon_pedidos().estado(clave)
+    if estado is None:
+        return
+    if estado['estado'] == 'enviado':
+        if st.session_state.get('folio_generado') != estado['folio']:
+            st.session_state.folio_generado = estado['folio']
+            st.rerun(scope="app")
+        st.success(f"✅ Pedido registrado con folio {estado['folio']}")
+    elif estado['estado'] == 'pendiente':
+        st.info(f"⏳ Pedido en cola, esperando al servidor (intentos: {estado['intentos']}). Puedes seguir trabajando.")
+        if estado['error']:
+            st.caption(f"Último error: {estado['error']}")
+    else:
+        if estado['estado'] == 'incierto':
+            st.error(f"⚠️ Se perdió la respuesta del servidor; el pedido pudo haberse registrado ({estado['error']}).")
+            st.caption("Revisa en el ERP antes de reintentar, para no duplicarlo.")
         else:
-            st.error(f"⚠️ El servidor rechazó el pedido: {respuesta.text}")
-            return None
-            
-    except Exception as e:
-        st.error(f"🔍 Problema de comunicación con Render: {e}")
-        return None
-
-# --- AJUSTES EN GENERAR_PDF ---
-def generar_pdf(df, cliente, tipo_doc, lista, total):
-    pdf = FPDF()
-    pdf.add_page()
-    
-    if os.path.exists("logo_tepalcates.png"):
-        pdf.image("logo_tepalcates.png", x=10, y=8, w=35)
-        
-    if os.path.exists("logo_truper_completo.png"): # Asegúrate de que tu imagen nueva se llame así
-        pdf.image("logo_truper_completo.png", x=165, y=8, w=35)
-
-    # TÍTULO SIMPLIFICADO
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(200, 10, txt="Cotización", ln=True, align='C') 
-    
-    pdf.ln(15) 
-    # ... (el resto de la función sigue igual)
-    
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 8, txt=f"Cliente: {cliente}", ln=True)
-    pdf.cell(200, 8, txt=f"Tipo: {tipo_doc}", ln=True)
-    pdf.cell(200, 8, txt=f"Lista: {lista}", ln=True)
-    pdf.cell(200, 8, txt=f"Fecha: {datetime.now().strftime('%d/%m/%Y')}", ln=True)
-    pdf.ln(10)
-    
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(30, 10, "Código", 1)
-    pdf.cell(90, 10, "Descripción", 1)
-    pdf.cell(20, 10, "Cant.", 1)
-    pdf.cell(25, 10, "P. Unit", 1)
-    pdf.cell(25, 10, "Subt.", 1)
-    pdf.ln()
-    
-    pdf.set_font("Arial", size=9)
-    for _, row in df.iterrows():
-        pdf.cell(30, 8, str(row['codigo']), 1)
-        pdf.cell(90, 8, str(row['descripcion'])[:45], 1)
-        pdf.cell(20, 8, str(int(row['cantidad'])), 1)
-        pdf.cell(25, 8, f"${row['precio_unitario']:,.2f}", 1)
-        pdf.cell(25, 8, f"${row['Subtotal']:,.2f}", 1)
-        pdf.ln()
-        
-    pdf.ln(5)
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(200, 10, txt=f"TOTAL: ${total:,.2f}", ln=True, align='R')
-    
-    pdf.ln(10) 
-    pdf.set_font("Arial", 'I', 10) 
-    pdf.cell(200, 10, txt="Válida únicamente durante el mes de emisión de este documento.", ln=True, align='C')
-    
-    try:
-        return bytes(pdf.output())
-    except TypeError:
-        return pdf.output(dest='S').encode('latin-1')
-    except AttributeError:
-        return pdf.output()
-    
-    
-    
+            motivo = "El servidor rechazó el pedido" if estado['estado'] == 'rechazado' else "No se pudo entregar el pedido"
+            st.error(f"⚠️ {motivo}: {estado['error']}")
+        if st.button("🔁 Reintentar envío", use_container_width=True):
+            obtener_buzon_pedidos().reintentar(clave)
+            st.rerun()
 
-def analizar_y_cargar_pedido(texto_pedido, df_catalogo):
-    lineas = [line.strip() for line in texto_pedido.split('\n') if line.strip()]
-    nuevos_productos = []
-    catalogo_map = df_catalogo.set_index('codigo').to_dict('index')
-    PATRON = re.compile(r'^[^\d]*(\d{4,6})[^\d]*(\d{1,3})')
-
-    for linea in lineas:
-        match = PATRON.match(linea)
-        if match:
-            cod = match.group(1)
-            cant = int(match.group(2))
-            if cod in catalogo_map:
-                p_base = float(catalogo_map[cod]['precio'])
-                precio_final = p_base if st.session_state.tipo_lista == "Distribuidor" else p_base / 0.90
-                nuevos_productos.append({
-                    'codigo': cod, 'descripcion': catalogo_map[cod]['descripcion'],
-                    'cantidad': cant,
-                    'precio_base': p_base,
-                    'precio_unitario': precio_final
-                })
+@perfil.medido('carga_rapida')
+def analizar_y_cargar_pedido(texto_pedido, mapa_codigos, tabla_precios=None):
+    resultado = carga_rapida.analizar_pedido(texto_pedido, mapa_codigos)
+    nuevos_productos = resultado['productos']
+
+    # El reporte se guarda para mostrarlo después del st.rerun()
+    st.session_state.reporte_carga_rapida = {
+        'cargados': len(nuevos_productos),
+        'lineas': resultado['lineas'],
+        'desconocidos': resultado['desconocidos'],
+        'malformadas': resultado['malformadas'],
+    }
     if nuevos_productos:
-        st.session_state.cotizacion.extend(nuevos_productos)
+        if not st.session_state.cotizacion: calentar_servidor()
+        st.session_state.cotizacion.extender(nuevos_productos, tabla_precios=tabla_precios)
         if 'folio_generado' in st.session_state: del st.session_state.folio_generado
+@perfil.medido('agregar_producto')
 def agregar_producto_manual():
     if st.session_state.prod_sel:
-        info = st.session_state.catalogo_df[st.session_state.catalogo_df['display'] == st.session_state.prod_sel].iloc[0]
+        info = st.session_state.indice_catalogo.fila('display', st.session_state.prod_sel)
+        if info is None: return
         p_base = float(info['precio'])
+        if not st.session_state.cotizacion: calentar_servidor()
         
-        st.session_state.cotizacion.append({
-            'codigo': info['codigo'], 'descripcion': info['descripcion'],
-            'cantidad': st.session_state.cant_sel, 'precio_base': p_base
-        })
+        precios = st.session_state.tabla_precios.precios_codigo(info['codigo'], st.session_state.cant_sel)
+        st.session_state.cotizacion.agregar(info['codigo'], info['descripcion'], st.session_state.cant_sel, p_base, precios)
         
         st.session_state.prod_sel = None 
         st.session_state.cant_sel = 1
         if 'folio_generado' in st.session_state: del st.session_state.folio_generado
 
-ARCHIVO_HISTORIAL = "historial_cotizaciones.json"
+@perfil.medido('pdf')
+def preparar_pdf(clave_pdf, datos, total):
+    # Los bytes quedan en la sesión: el archivo de descarga es de ella mientras la cotización no cambie
+    lista = datos['tipo_lista']
+    st.session_state.pdf_preparado = (clave_pdf, pdf_cotizacion.generar_pdf_cacheado(
+        st.session_state.cotizacion.renglones(lista), datos['nombre_cliente_limpio'], datos['tipo_doc'], lista, total))
 
-def leer_historial():
-    if os.path.exists(ARCHIVO_HISTORIAL):
-        with open(ARCHIVO_HISTORIAL, 'r', encoding='utf-8') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-    return {}
+@st.cache_resource
+def inicializar_historial():
+    # Esquema y migración del JSON anterior, una vez por proceso
+    return historial.inicializar()
 
-def guardar_cotizacion(cliente_display, tipo_doc, tipo_lista, total):
-    historial = leer_historial()
-    
-    if st.session_state.editando_id:
-        cot_id = st.session_state.editando_id
-        fecha_registro = historial[cot_id]['fecha'] 
-    else:
-        cot_id = datetime.now().strftime("%Y%m%d%H%M%S")
-        fecha_registro = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    historial[cot_id] = {
-        "id": cot_id,
-        "fecha": fecha_registro,
+COTIZACIONES_POR_PAGINA = 20
+
+@perfil.medido('historial.guardar')
+def guardar_cotizacion(cliente_display, tipo_doc, tipo_lista, total, vendedor=""):
+    datos = {
         "cliente": cliente_display if cliente_display else "MOSTRADOR",
+        "vendedor": vendedor,
         "tipo_doc": tipo_doc,
         "lista_precios": tipo_lista,
         "total": round(total, 2),
-        "productos": st.session_state.cotizacion
+        "productos": st.session_state.cotizacion.a_productos(tipo_lista)
     }
     
-    with open(ARCHIVO_HISTORIAL, 'w', encoding='utf-8') as f:
-        json.dump(historial, f, indent=4)
+    anterior = historial.obtener(st.session_state.editando_id) if st.session_state.editando_id else None
+    if anterior:
+        historial.guardar(dict(datos, id=anterior['id'], fecha=anterior['fecha']))
+    else:
+        historial.guardar_nueva(dict(
+            datos,
+            id=datetime.now().strftime("%Y%m%d%H%M%S"),
+            fecha=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ))
     
     st.session_state.editando_id = None
-    st.session_state.cotizacion = []
+    st.session_state.cotizacion = modelo_cotizacion.Cotizacion()
     st.session_state.cliente_seleccionado = None
     st.session_state.vendedor_input = ""
     st.session_state.tipo_doc_input = "Remisión"
     if 'folio_generado' in st.session_state: del st.session_state.folio_generado
+    st.session_state.pop('reporte_carga_rapida', None)
+
+def seccion(nombre):
+    # Convierte la función en un fragmento (sus widgets sólo la vuelven a ejecutar a ella)
+    # y la mide como 'seccion.<nombre>'. Un rerun parcial corre en otro hilo: se reactiva el perfil
+    def decorar(funcion):
+        medida = perfil.medido(f"seccion.{nombre}")(funcion)
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if perfil_activo and perfil.actual() is None:
+                perfil.activar(st.session_state.perfilador)
+            return medida(*args, **kwargs)
+        return st.fragment(envoltura)
+    return decorar
+
+def quitar_linea(indice):
+    # Callback del "❌": corre antes que la sección, así basta con su rerun parcial
+    st.session_state.cotizacion.quitar(indice)
+    if 'folio_generado' in st.session_state: del st.session_state.folio_generado
+
+def pagina_historial(cursor=None):
+    # Callback de la paginación: sin cursor regresa una página, con cursor avanza
+    if cursor is None:
+        st.session_state.hist_cursores.pop()
+    else:
+        st.session_state.hist_cursores.append(cursor)
+
+def mostrar_panel_perfil(perfilador):
+    # Panel oculto: sólo aparece con ?perfil=<COTIZADOR_PERFIL_CLAVE> o COTIZADOR_PERFIL=1
+    with st.expander("⏱️ Perfil de reruns (admin)"):
+        # Las llamadas al servidor de pedidos son de todo el proceso: incluyen los POST del buzón,
+        # que corren en su propio hilo fuera de cualquier sesión
+        metricas = servidor.cliente_compartido().resumen_metricas()
+        if metricas:
+            st.caption("Servidor de pedidos (todas las sesiones y el buzón)")
+            st.dataframe(pd.DataFrame([
+                {"Endpoint": endpoint, "Llamadas": m['llamadas'], "Errores": m['errores'], "p50 ms": m['p50_ms'],
+                 "p95 ms": m['p95_ms'], "Máx ms": m['max_ms']}
+                for endpoint, m in metricas.items()]).round(2), use_container_width=True, hide_index=True)
+        resumen = perfilador.resumen()
+        if not resumen:
+            st.write("Sin mediciones todavía.")
+            return
+        st.caption(f"Sesión {perfilador.sesion} · {perfilador.rerun} reruns")
+        st.dataframe(pd.DataFrame([
+            {"Etapa": etapa, "Llamadas": r['llamadas'], "Total ms": r['total_ms'], "p50 ms": r['p50_ms'],
+             "p95 ms": r['p95_ms'], "p99 ms": r['p99_ms'], "Máx ms": r['max_ms']}
+            for etapa, r in resumen.items()]).round(2), use_container_width=True, hide_index=True)
+        etapa_hist = st.selectbox("Histograma de:", list(resumen), key="perfil_etapa")
+        st.bar_chart(pd.DataFrame(perfilador.histograma(etapa_hist), columns=["Latencia", "Llamadas"]).set_index("Latencia"))
+        c_perf1, c_perf2, c_perf3 = st.columns(3)
+        c_perf1.download_button("📥 Muestras (JSON-lines)", data=perfilador.a_jsonl(),
+                                file_name=f"perfil_{perfilador.sesion}.jsonl", mime="application/x-ndjson",
+                                use_container_width=True)
+        if c_perf2.button(f"💾 Agregar a {perfil.ARCHIVO_LOG}", use_container_width=True):
+            st.toast(f"{perfilador.exportar()} muestras exportadas")
+        if c_perf3.button("♻️ Reiniciar", use_container_width=True):
+            perfilador.reiniciar()
+            st.rerun()
 
 # ==============================================================================
 # SECCIÓN 2: INTERFAZ
@@ -341,7 +285,19 @@ page_bg_img = """
 """
 st.markdown(page_bg_img, unsafe_allow_html=True)
 
-if 'cotizacion' not in st.session_state: st.session_state.cotizacion = []
+# Perfil de tiempos por sesión; apagado no mide nada
+perfil_activo = perfil.habilitado(st.query_params.get("perfil"))
+if perfil_activo and 'perfilador' not in st.session_state:
+    st.session_state.perfilador = perfil.Perfilador()
+perfil.activar(st.session_state.perfilador if perfil_activo else None)
+inicio_rerun = time.perf_counter()
+
+inicializar_historial()
+
+if 'cotizacion' not in st.session_state:
+    # Sesión nueva: despierta al servidor de pedidos mientras se arma la cotización
+    calentar_servidor()
+    st.session_state.cotizacion = modelo_cotizacion.Cotizacion()
 if 'tipo_lista' not in st.session_state: st.session_state.tipo_lista = "Distribuidor"
 if 'editando_id' not in st.session_state: st.session_state.editando_id = None
 if 'cliente_seleccionado' not in st.session_state: st.session_state.cliente_seleccionado = None
@@ -369,211 +325,297 @@ with col_logo2:
 
 catalogo_df = cargar_catalogo("CATALAGO 25 TRUP PRUEBA COTIZADOR.txt", "precios_actualizados.txt")
 st.session_state.catalogo_df = catalogo_df
+st.session_state.indice_catalogo = obtener_indice_catalogo("CATALAGO 25 TRUP PRUEBA COTIZADOR.txt", "precios_actualizados.txt")
+st.session_state.tabla_precios = obtener_tabla_precios("CATALAGO 25 TRUP PRUEBA COTIZADOR.txt", "precios_actualizados.txt")
+buscador_productos = obtener_buscador("CATALAGO 25 TRUP PRUEBA COTIZADOR.txt", "precios_actualizados.txt")
 
-clientes_df = cargar_clientes("clientes.txt")
-st.session_state.clientes_df = clientes_df
+# Logos del PDF reducidos una sola vez por proceso (las siguientes llamadas salen del caché)
+with perfil.etapa('logos'):
+    pdf_cotizacion.preparar_logos()
 
-st.write("### Datos Generales")
-c_cfg1, c_cfg2, c_cfg3 = st.columns(3)
-
-with c_cfg1:
-    vendedor = st.text_input("Clave Vendedor (Sirve de Filtro):", value=st.session_state.vendedor_input)
-    st.session_state.vendedor_input = vendedor
-    
-    opciones_clientes = []
-    if not clientes_df.empty:
-        if vendedor: 
-            df_filtrado = clientes_df[clientes_df['cve_age'] == str(vendedor).strip()]
-            opciones_clientes = df_filtrado['display'].tolist()
-        else: 
-            opciones_clientes = clientes_df['display'].tolist()
-    
-    index_cliente = None
-    if st.session_state.cliente_seleccionado in opciones_clientes:
-        index_cliente = opciones_clientes.index(st.session_state.cliente_seleccionado)
+clientes = cargar_clientes("clientes.txt")
+clientes_df = clientes.df
+st.session_state.clientes_df = clientes_df
+indice_clientes = obtener_indice_clientes("clientes.txt")
+
+# --- SECCIONES QUE SE VUELVEN A EJECUTAR POR SEPARADO ---
+# Salvo Datos Generales, cada una es un fragmento: sus propios widgets sólo
+# vuelven a ejecutar esa función. Lo que necesita el resto de la página
+# (productos agregados, cotización guardada o cargada) provoca un rerun
+# completo con st.rerun(). Todo depende de Datos Generales (cliente, lista,
+# documento), así que esa parte corre en el script principal.
+
+@perfil.medido('datos_generales')
+def seccion_datos_generales(clientes, indice_clientes):
+    st.write("### Datos Generales")
+    c_cfg1, c_cfg2, c_cfg3 = st.columns(3)
+
+    with c_cfg1:
+        vendedor = st.text_input("Clave Vendedor (Sirve de Filtro):", value=st.session_state.vendedor_input)
+        st.session_state.vendedor_input = vendedor
         
-    cliente_seleccionado = st.selectbox(
-        "Seleccione Cliente:", 
-        options=opciones_clientes,
-        index=index_cliente,
-        placeholder="Teclee nombre o clave..."
-    )
-    st.session_state.cliente_seleccionado = cliente_seleccionado
-
-with c_cfg2:
-    tipo_doc = st.text_input("Tipo de Documento:", value=st.session_state.tipo_doc_input)
-    st.session_state.tipo_doc_input = tipo_doc
-    
-    no_ped_manual = st.text_input("No. Pedido (Dejar vacío para autogenerar):", value="")
-
-with c_cfg3:
-    st.session_state.tipo_lista = st.radio("Lista de Precios:", ["Distribuidor", "Dimefet"], horizontal=True)
-
-cve_cliente_real = ""
-cve_vendedor_real = vendedor 
-nombre_cliente_limpio = "MOSTRADOR"
+        consulta_cliente = st.text_input("Buscar Cliente:", key="cli_busqueda", placeholder="Nombre o clave...")
+        # Lista del vendedor o mejores resultados; nunca los ~4.5k clientes completos
+        opciones_clientes = indice_clientes.opciones(vendedor, consulta_cliente)
+        # El cliente ya elegido (o el de una cotización cargada) sigue disponible si es del vendedor
+        info_previo = clientes.fila('display', st.session_state.cliente_seleccionado) if st.session_state.cliente_seleccionado else None
+        if info_previo and (not vendedor.strip() or info_previo['cve_age'] == vendedor.strip()) \
+                and st.session_state.cliente_seleccionado not in opciones_clientes:
+            opciones_clientes.insert(0, st.session_state.cliente_seleccionado)
+        
+        index_cliente = None
+        if st.session_state.cliente_seleccionado in opciones_clientes:
+            index_cliente = opciones_clientes.index(st.session_state.cliente_seleccionado)
+            
+        cliente_seleccionado = st.selectbox(
+            "Seleccione Cliente:", 
+            options=opciones_clientes,
+            index=index_cliente,
+            placeholder="Escriba la clave de vendedor o busque arriba..."
+        )
+        st.session_state.cliente_seleccionado = cliente_seleccionado
 
-if cliente_seleccionado and not clientes_df.empty:
-    info_cliente = clientes_df[clientes_df['display'] == cliente_seleccionado].iloc[0]
-    cve_cliente_real = info_cliente['cve']
-    nombre_cliente_limpio = info_cliente['nombre'] 
-    
-    if not cve_vendedor_real and info_cliente['cve_age']:
-        cve_vendedor_real = info_cliente['cve_age']
-
-with st.expander("🔍 Búsqueda de Productos"):
-    c1, c2, c3 = st.columns([4,1,1])
-    c1.selectbox(
-        "Producto:", catalogo_df['display'], index=None, 
-        placeholder="Escriba o seleccione un producto...", key="prod_sel"
-    )
-    c2.number_input("Cant:", min_value=1, value=1, key="cant_sel")
-    c3.button("➕ Añadir", on_click=agregar_producto_manual)
-
-with st.expander("🚀 Carga Rápida"):
-    texto = st.text_area("Pega aquí (Código Cantidad)")
-    if st.button("Procesar"):
-        analizar_y_cargar_pedido(texto, catalogo_df)
-        st.rerun()
-
-if st.session_state.cotizacion:
-    df_cot = pd.DataFrame(st.session_state.cotizacion)
-    
-    # --- AQUÍ EMPIEZA LO NUEVO QUE VAS A PEGAR ---
-    if 'precio_base' not in df_cot.columns:
-        if st.session_state.tipo_lista == "Dimefet":
-            df_cot['precio_base'] = df_cot['precio_unitario'] * 0.90
-        else:
-            df_cot['precio_base'] = df_cot['precio_unitario']
+    with c_cfg2:
+        tipo_doc = st.text_input("Tipo de Documento:", value=st.session_state.tipo_doc_input)
+        st.session_state.tipo_doc_input = tipo_doc
+        
+        no_ped_manual = st.text_input("No. Pedido (Dejar vacío para autogenerar):", value="")
+
+    with c_cfg3:
+        # Listas generales más las exclusivas del cliente elegido
+        info_lista = clientes.fila('display', cliente_seleccionado) if cliente_seleccionado else None
+        opciones_listas = listas_precios.motor_predeterminado().disponibles(info_lista['cve'] if info_lista else "")
+        index_lista = opciones_listas.index(st.session_state.tipo_lista) if st.session_state.tipo_lista in opciones_listas else 0
+        st.session_state.tipo_lista = st.radio("Lista de Precios:", opciones_listas, index=index_lista, horizontal=True)
+
+    datos = {
+        'vendedor': vendedor,
+        'cliente_seleccionado': cliente_seleccionado,
+        'tipo_doc': tipo_doc,
+        'no_ped_manual': no_ped_manual,
+        'tipo_lista': st.session_state.tipo_lista,
+        'cve_cliente_real': "",
+        'cve_vendedor_real': vendedor,
+        'nombre_cliente_limpio': "MOSTRADOR",
+    }
+    info_cliente = clientes.fila('display', cliente_seleccionado) if cliente_seleccionado else None
+    if info_cliente:
+        datos['cve_cliente_real'] = info_cliente['cve']
+        datos['nombre_cliente_limpio'] = info_cliente['nombre'] 
+        
+        if not datos['cve_vendedor_real'] and info_cliente['cve_age']:
+            datos['cve_vendedor_real'] = info_cliente['cve_age']
+
+    return datos
+
+@seccion('productos')
+def seccion_productos(buscador_productos):
+    with st.expander("🔍 Búsqueda de Productos"):
+        c1, c2, c3 = st.columns([4,1,1])
+        # Sólo los mejores resultados viajan al navegador, no el catálogo completo
+        consulta_producto = c1.text_input(
+            "Buscar:", key="prod_busqueda",
+            placeholder="Código o descripción (ej. martillo 16 oz)..."
+        )
+        with perfil.etapa('busqueda_productos'):
+            opciones_productos = buscador_productos.buscar_display(consulta_producto, LIMITE_RESULTADOS_BUSQUEDA) if consulta_producto else []
+        c1.selectbox(
+            "Producto:", opciones_productos, index=None, 
+            placeholder="Escriba arriba y seleccione un producto...", key="prod_sel"
+        )
+        c2.number_input("Cant:", min_value=1, value=1, key="cant_sel")
+        if c3.button("➕ Añadir", on_click=agregar_producto_manual):
+            # El detalle está en otra sección
+            st.rerun()
 
-    if st.session_state.tipo_lista == "Distribuidor":
-        df_cot['precio_unitario'] = df_cot['precio_base']
-    else:
-        df_cot['precio_unitario'] = df_cot['precio_base'] / 0.90
-    # --- AQUÍ TERMINA LO NUEVO ---
+    with st.expander("🚀 Carga Rápida"):
+        texto = st.text_area("Pega aquí (Código Cantidad)")
+        if st.button("Procesar"):
+            analizar_y_cargar_pedido(texto, obtener_mapa_codigos("CATALAGO 25 TRUP PRUEBA COTIZADOR.txt", "precios_actualizados.txt"),
+                                     st.session_state.tabla_precios)
+            st.rerun()
 
-    # Esta línea ya la tenías, solo se empuja hacia abajo
-    df_cot['Subtotal'] = df_cot['cantidad'] * df_cot['precio_unitario']
+        reporte = st.session_state.get('reporte_carga_rapida')
+        if reporte:
+            st.success(f"{reporte['cargados']} productos cargados de {reporte['lineas']} líneas.")
+            if reporte['desconocidos']:
+                st.warning("Códigos que no están en el catálogo: " + ", ".join(
+                    f"{cod} ({cant})" for cod, cant in reporte['desconocidos'].items()))
+            if reporte['malformadas']:
+                st.warning(f"{len(reporte['malformadas'])} líneas sin código/cantidad reconocibles:")
+                st.code("\n".join(reporte['malformadas'][:50]))
+
+@seccion('cotizacion')
+def seccion_cotizacion(datos):
+    if not st.session_state.cotizacion:
+        st.info("Agregue productos para iniciar la cotización.")
+        return
+
+    cot = st.session_state.cotizacion
+    lista_activa = datos['tipo_lista']
+    # Precios y totales de cada lista ya vienen calculados en el modelo; aquí sólo se pinta
+    indice_lista = cot.motor.indice(lista_activa)
 
     st.write("### Detalle Actual")
-    # ... todo el resto de tu código (el for i, row in df_cot.iterrows(): etc...) se queda exactamente igual.    
-    st.write("### Detalle Actual")
-    for i, row in df_cot.iterrows():
-        col_item1, col_item2, col_item3 = st.columns([6, 2, 1])
-        col_item1.write(f"*{row['codigo']}* - {row['descripcion']}")
-        col_item2.write(f"{row['cantidad']} x ${row['precio_unitario']:,.2f} = *${row['Subtotal']:,.2f}*")
-        if col_item3.button("❌", key=f"del_{i}"):
-            st.session_state.cotizacion.pop(i)
-            if 'folio_generado' in st.session_state: del st.session_state.folio_generado
-            st.rerun()
-
-    total = df_cot['Subtotal'].sum()
-    st.subheader(f"Total ({st.session_state.tipo_lista}): ${total:,.2f}")
+    with perfil.etapa('detalle'):
+        for i, linea in enumerate(cot.lineas):
+            precio_unitario = linea.precios[indice_lista]
+            col_item1, col_item2, col_item3 = st.columns([6, 2, 1])
+            col_item1.write(f"*{linea.codigo}* - {linea.descripcion}")
+            col_item2.write(f"{linea.cantidad} x ${precio_unitario:,.2f} = *${linea.cantidad * precio_unitario:,.2f}*")
+            # Sólo se repintan el detalle, el total y las acciones
+            col_item3.button("❌", key=f"del_{i}", on_click=quitar_linea, args=(i,))
+
+    total = cot.total(lista_activa)
+    st.subheader(f"Total ({lista_activa}): ${total:,.2f}")
+    seccion_acciones(datos, total)
+
+@seccion('acciones')
+def seccion_acciones(datos, total):
+    cot = st.session_state.cotizacion
+    lista_activa = datos['tipo_lista']
+    nombre_cliente_limpio = datos['nombre_cliente_limpio']
+    tipo_doc = datos['tipo_doc']
 
     # --- BOTONES DE SALIDA PARA COTIZACIÓN (Sin Folio) ---
     mensaje_cot = f"Cotización\n\nCliente: {nombre_cliente_limpio}\nDocumento: {tipo_doc}\n\nDetalle:\n\n"
-    for _, fila in df_cot.iterrows():
-        mensaje_cot += f"· {fila['codigo']} {int(fila['cantidad'])} {fila['descripcion']}\n"
+    mensaje_cot += cot.texto_detalle()
     wa_url_cot = f"https://wa.me/?text={quote_plus(mensaje_cot)}"
     
     col_acc1, col_acc2, col_acc3, col_acc4 = st.columns(4)
     with col_acc1: 
         st.link_button("📲 Enviar Cotización (WhatsApp)", wa_url_cot, use_container_width=True)
     with col_acc2:
-        pdf_bytes = generar_pdf(df_cot, nombre_cliente_limpio, tipo_doc, st.session_state.tipo_lista, total)
-        nombre_archivo = limpiar_nombre_archivo(nombre_cliente_limpio)
-        fecha_archivo = datetime.now().strftime("%d-%m-%Y")
-        st.download_button(
-            "📥 Descargar PDF",
-            data=pdf_bytes,
-            file_name=f"Cotizacion_{nombre_archivo}_{fecha_archivo}.pdf",
-            mime="application/pdf",
-            use_container_width=True
-        )
+        # El PDF se genera (o sale del caché) sólo al presionar "Preparar PDF"; ya armado,
+        # se descarga mientras no cambien las líneas, el cliente, el documento o la lista
+        clave_pdf = (cot.uid, cot.version, nombre_cliente_limpio, tipo_doc, lista_activa)
+        pdf_preparado = st.session_state.get('pdf_preparado')
+        if pdf_preparado and pdf_preparado[0] == clave_pdf:
+            nombre_archivo = limpiar_nombre_archivo(nombre_cliente_limpio)
+            fecha_archivo = datetime.now().strftime("%d-%m-%Y")
+            st.download_button(
+                "📥 Descargar PDF",
+                data=pdf_preparado[1],
+                file_name=f"Cotizacion_{nombre_archivo}_{fecha_archivo}.pdf",
+                mime="application/pdf",
+                on_click="ignore",  # descargar no cambia nada: no hace falta rerun
+                use_container_width=True
+            )
+        else:
+            st.button("📄 Preparar PDF", on_click=preparar_pdf, args=(clave_pdf, datos, total),
+                      use_container_width=True)
     with col_acc3:
         texto_btn_guardar = "💾 Actualizar Cotización" if st.session_state.editando_id else "💾 Guardar Cotización"
         if st.button(texto_btn_guardar, use_container_width=True):
-            guardar_cotizacion(cliente_seleccionado, tipo_doc, st.session_state.tipo_lista, total)
+            guardar_cotizacion(datos['cliente_seleccionado'], tipo_doc, lista_activa, total, datos['cve_vendedor_real'])
             st.success("¡Guardado exitosamente!")
             st.rerun()
     with col_acc4:
         if st.button("🗑️ Limpiar / Cancelar", use_container_width=True):
-            st.session_state.cotizacion = []
+            st.session_state.cotizacion = modelo_cotizacion.Cotizacion()
             st.session_state.editando_id = None
             st.session_state.cliente_seleccionado = None
             st.session_state.vendedor_input = ""
             st.session_state.tipo_doc_input = "Remisión"
             if 'folio_generado' in st.session_state: del st.session_state.folio_generado
+            st.session_state.pop('reporte_carga_rapida', None)
             st.rerun()
             
     # --- CONVERSIÓN A PEDIDO (WhatsApp Directo) ---
-   # --- CONVERSIÓN A PEDIDO (WhatsApp Directo) ---
     st.write("---")
     st.write("### 🚀 Levantar Pedido")
     
+    cve_vendedor_real = datos['cve_vendedor_real']
+    cve_cliente_real = datos['cve_cliente_real']
+    no_ped_manual = datos['no_ped_manual']
     if cve_vendedor_real and cve_cliente_real:
         col_erp1, col_erp2 = st.columns(2)
         
         with col_erp1:
+            datos_pedido = (nombre_cliente_limpio, cve_vendedor_real, cve_cliente_real)
+            clave_pedido = clave_pedido_de(cot, datos_pedido)
             if st.button("🔄 Convertir a Pedido", use_container_width=True):
                 if no_ped_manual:
                     st.session_state.folio_generado = no_ped_manual
                     st.warning("⚠️ Folio manual. El pedido NO se registró en el servidor.")
                 else:
-                    with st.spinner("Creando pedido en el servidor..."):
-                        # Aquí obligamos a Python a usar la función que creamos arriba
-                        folio_nuevo = crear_pedido_render(nombre_cliente_limpio, cve_vendedor_real, cve_cliente_real, st.session_state.cotizacion)
-                        
-                        if folio_nuevo:
-                            st.session_state.folio_generado = folio_nuevo
-                            st.success(f"✅ Pedido registrado con folio {folio_nuevo}")
+                    # Se encola y se entrega en segundo plano
+                    crear_pedido_render(cot, datos_pedido)
+            if not no_ped_manual and clave_pedido in st.session_state.get('pedidos_encolados', ()):
+                estado_pedido = obtener_buzon_pedidos().estado(clave_pedido)
+                en_cola = estado_pedido is not None and estado_pedido['estado'] == 'pendiente'
+                st.fragment(mostrar_estado_pedido, run_every=INTERVALO_ESTADO_PEDIDO if en_cola else None)(clave_pedido)
         
         with col_erp2:
             if 'folio_generado' in st.session_state:
                 # Armamos el texto para WhatsApp
                 mensaje_pedido = "Pedido Registrado\n"
-                mensaje_pedido += f"Vendedor: {vendedor}\n"
+                mensaje_pedido += f"Vendedor: {datos['vendedor']}\n"
                 mensaje_pedido += f"Cliente: {cve_cliente_real} - {nombre_cliente_limpio}\n"
                 mensaje_pedido += f"Documento: {tipo_doc}\n"
                 mensaje_pedido += f"Folio: {st.session_state.folio_generado}\n\n"
                 mensaje_pedido += "Detalle del Pedido:\n\n"
                 
-                for _, fila in df_cot.iterrows():
-                    mensaje_pedido += f"· {fila['codigo']} {int(fila['cantidad'])} {fila['descripcion']}\n"
+                mensaje_pedido += cot.texto_detalle()
                 
                 wa_url_pedido = f"https://wa.me/?text={quote_plus(mensaje_pedido)}"
                 st.link_button(f"📲 Enviar por WhatsApp (Folio: {st.session_state.folio_generado})", wa_url_pedido, use_container_width=True)
     else:
         st.warning("⚠️ Selecciona un Cliente del catálogo para habilitar la conversión a pedido.")
-            
-else:
-    st.info("Agregue productos para iniciar la cotización.")
 
-st.divider()
-with st.expander("📂 Historial de Cotizaciones Guardadas (Cargar y Editar)"):
-    historial = leer_historial()
-    
-    if not historial:
-        st.write("No hay cotizaciones guardadas.")
-    else:
-        lista_historial = []
-        for cot_id, datos in historial.items():
-            lista_historial.append({
-                "ID": datos['id'],
-                "Fecha": datos['fecha'],
-                "Cliente": datos['cliente'],
-                "Total": f"${datos['total']:,.2f}"
-            })
+@seccion('historial')
+def seccion_historial():
+    with st.expander("📂 Historial de Cotizaciones Guardadas (Cargar y Editar)"):
+        # Sólo se consulta una página de resúmenes; los productos se leen al cargar una
+        f_hist1, f_hist2, f_hist3, f_hist4 = st.columns([3, 1, 2, 2])
+        filtro_cliente = f_hist1.text_input("Cliente:", key="hist_cliente", placeholder="Nombre o clave...")
+        filtro_vendedor = f_hist2.text_input("Vendedor:", key="hist_vendedor")
+        filtro_fechas = f_hist3.date_input("Fechas:", value=(), key="hist_fechas", format="DD/MM/YYYY")
+        filtro_total = f_hist4.number_input("Total mínimo:", min_value=0.0, value=0.0, step=100.0, key="hist_total")
+
+        filtros = {
+            "cliente": filtro_cliente.strip() or None,
+            "vendedor": filtro_vendedor.strip() or None,
+            "desde": filtro_fechas[0] if len(filtro_fechas) > 0 else None,
+            "hasta": filtro_fechas[1] if len(filtro_fechas) > 1 else (filtro_fechas[0] if len(filtro_fechas) > 0 else None),
+            "total_min": filtro_total or None,
+        }
+        # Si cambian los filtros se vuelve a la primera página
+        if st.session_state.get('hist_filtros') != filtros:
+            st.session_state.hist_filtros = filtros
+            st.session_state.hist_cursores = [None]
+        cursor_actual = st.session_state.hist_cursores[-1]
+
+        with perfil.etapa('historial.pagina'):
+            pagina_hist, siguiente_cursor = historial.consultar(
+                **filtros, cursor=cursor_actual, limite=COTIZACIONES_POR_PAGINA)
         
-        df_hist = pd.DataFrame(lista_historial).sort_values(by="Fecha", ascending=False)
-        st.dataframe(df_hist, use_container_width=True, hide_index=True)
+        if not pagina_hist:
+            st.write("No hay cotizaciones guardadas.")
+            return
+
+        df_hist = pd.DataFrame([{
+            "ID": datos['id'],
+            "Fecha": pd.to_datetime(datos['fecha']),
+            "Cliente": datos['cliente'],
+            "Vendedor": datos['vendedor'],
+            "Total": f"${datos['total']:,.2f}"
+        } for datos in pagina_hist])
+        st.dataframe(df_hist, use_container_width=True, hide_index=True,
+                     column_config={"Fecha": st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm")})
+
+        c_pag1, c_pag2, c_pag3 = st.columns([1, 2, 1])
+        c_pag1.button("⬅️ Anteriores", disabled=len(st.session_state.hist_cursores) == 1, on_click=pagina_historial)
+        c_pag2.caption(f"Página {len(st.session_state.hist_cursores)}")
+        c_pag3.button("Siguientes ➡️", disabled=siguiente_cursor is None, on_click=pagina_historial,
+                      args=(siguiente_cursor,))
         
         st.write("---")
       # --- AQUÍ ESTÁ EL AJUSTE ---
         st.write("*Selecciona una cotización para cargarla y editarla:*")
         
         # Cambiamos el orden para que muestre: Cliente | Fecha | ID
-        opciones_select = [f"{datos['cliente']} | {datos['fecha']} | {cot_id}" for cot_id, datos in historial.items()]
+        opciones_select = [f"{datos['cliente']} | {datos['fecha']} | {datos['id']}" for datos in pagina_hist]
         cot_seleccionada = st.selectbox("Cotizaciones Guardadas:", opciones_select, index=None, placeholder="Elige una por nombre de cliente...")
         
         if cot_seleccionada:
@@ -581,11 +623,31 @@ with st.expander("📂 Historial de Cotizaciones Guardadas (Cargar y Editar)"):
             id_a_cargar = cot_seleccionada.split(" | ")[2]
             if st.button("✏️ Cargar al Editor"):
                 # ... (el resto sigue igual)
-                datos_cot = historial[id_a_cargar]
-                st.session_state.cotizacion = datos_cot['productos']
+                with perfil.etapa('historial.cargar'):
+                    datos_cot = historial.obtener(id_a_cargar)
+                    st.session_state.cotizacion = modelo_cotizacion.Cotizacion(datos_cot['productos'], datos_cot['lista_precios'])
                 st.session_state.cliente_seleccionado = datos_cot['cliente']
                 st.session_state.tipo_doc_input = datos_cot['tipo_doc']
                 st.session_state.tipo_lista = datos_cot['lista_precios']
                 st.session_state.editando_id = datos_cot['id']
                 if 'folio_generado' in st.session_state: del st.session_state.folio_generado
+                st.session_state.pop('reporte_carga_rapida', None)
+                # El editor y los datos generales están fuera de esta sección
                 st.rerun()
+
+# --- PÁGINA ---
+
+datos_generales = seccion_datos_generales(clientes, indice_clientes)
+
+seccion_productos(buscador_productos)
+seccion_cotizacion(datos_generales)
+
+st.divider()
+seccion_historial()
+
+if perfil_activo:
+    perfilador = st.session_state.perfilador
+    perfilador.registrar('rerun', (time.perf_counter() - inicio_rerun) * 1000)
+    if perfil.EXPORTAR_CADA_RERUN:
+        perfilador.exportar()
+    mostrar_panel_perfil(perfilador)
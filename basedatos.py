@@ -0,0 +1,14 @@
+"""Conexiones SQLite compartidas (historial de cotizaciones y buzón de pedidos)."""
+import sqlite3
+
+
+def conectar(ruta_db):
+    """Conexión nueva en modo WAL: las lecturas no esperan a la escritura en curso.
+
+    Una conexión por operación: sqlite3 no comparte conexiones entre hilos y
+    Streamlit atiende cada sesión en su propio hilo.
+    """
+    conexion = sqlite3.connect(ruta_db, timeout=10)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA busy_timeout=10000")
+    return conexion
@@ -0,0 +1,1262 @@
+"""Benchmarks del cotizador. Se corren a mano, no forman parte de la app.
+
+    python benchmarks.py arranque
+    python benchmarks.py actualizaciones
+    python benchmarks.py busqueda
+    python benchmarks.py carga_rapida
+    python benchmarks.py pdf
+    python benchmarks.py pdf_grande
+    python benchmarks.py pedidos --escenario intermitente
+    python benchmarks.py servidor
+    python benchmarks.py clientes
+    python benchmarks.py cotizacion
+    python benchmarks.py listas
+    python benchmarks.py recotizar
+    python benchmarks.py ventas
+    python benchmarks.py perfil
+    python benchmarks.py secciones
+    python benchmarks.py carga --sesiones 30 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import closing
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import requests
+from fpdf import FPDF
+
+import busqueda
+import carga_rapida
+import catalogo
+import directorio_clientes
+import historial
+import listas_precios
+import modelo_cotizacion
+import pdf_cotizacion
+import pedidos
+import perfil
+import recotizar
+import servidor
+import ventas
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta `funcion` varias veces y regresa los tiempos en milisegundos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def reportar(nombre, tiempos):
+    print(f"{nombre:<40} min {min(tiempos):9.2f} ms | mediana {statistics.median(tiempos):9.2f} ms")
+
+
+def reportar_percentiles(nombre, tiempos):
+    ordenados = sorted(tiempos)
+    print(f"{nombre:<40} p50 {perfil.percentil(ordenados, 50):8.3f} ms | p95 {perfil.percentil(ordenados, 95):8.3f} ms"
+          f" | p99 {perfil.percentil(ordenados, 99):8.3f} ms | n={len(tiempos)}")
+
+
+# --- ARRANQUE: PARSEO EN TEXTO VS SNAPSHOT COMPILADO ---
+
+def cargar_catalogo_por_linea(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
+    """Cómo cargaba app.py el catálogo antes: split por línea y df.loc por actualización (referencia)."""
+    catalogo_lineas = []
+    try:
+        with open(nombre_archivo_catalogo, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    partes = line.strip().split(',')
+                    if len(partes) < 3: continue
+                    codigo = partes[0].strip()
+                    precio = float(partes[-1].strip())
+                    descripcion = ','.join(partes[1:-1]).strip()
+                    catalogo_lineas.append({'codigo': codigo, 'descripcion': descripcion, 'precio': precio})
+                except (ValueError, IndexError): continue
+    except FileNotFoundError:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(catalogo_lineas)
+    if df.empty: return pd.DataFrame(columns=['codigo', 'descripcion', 'precio'])
+    df = df.set_index('codigo')
+
+    try:
+        with open(nombre_archivo_actualizaciones, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    partes = line.strip().split(',')
+                    if len(partes) < 3: continue
+                    codigo = partes[0].strip()
+                    nuevo_precio = float(partes[-1].strip())
+                    nueva_descripcion = ','.join(partes[1:-1]).strip()
+                    df.loc[codigo] = {'descripcion': nueva_descripcion, 'precio': nuevo_precio}
+                except: continue
+    except FileNotFoundError: pass
+
+    df = df.reset_index()
+    df['display'] = df['codigo'] + " - " + df['descripcion']
+    return df
+
+
+def bench_arranque(args):
+    dir_snapshot = tempfile.mkdtemp(prefix="bench_catalogo_")
+    try:
+        fuentes = (args.catalogo, args.actualizaciones)
+        reportar("parseo por línea (antes)", medir(lambda: cargar_catalogo_por_linea(*fuentes), args.repeticiones))
+        reportar("parseo vectorizado", medir(lambda: catalogo.parsear_catalogo(*fuentes), args.repeticiones))
+        reportar("compilar snapshot", medir(lambda: catalogo.compilar_snapshot(*fuentes, dir_snapshot), 1))
+        reportar("cargar snapshot (memory-map)",
+                 medir(lambda: catalogo.cargar_catalogo(*fuentes, dir_snapshot), args.repeticiones))
+    finally:
+        shutil.rmtree(dir_snapshot, ignore_errors=True)
+
+
+# --- ACTUALIZACIONES: df.loc POR FILA VS UPSERT VECTORIZADO ---
+
+def actualizar_por_fila(df_base, lineas):
+    """Cómo aplicaba cargar_catalogo las actualizaciones antes (referencia)."""
+    df = df_base[catalogo.COLUMNAS].set_index('codigo')
+    for line in lineas:
+        partes = line.strip().split(',')
+        if len(partes) < 3: continue
+        df.loc[partes[0].strip()] = {'descripcion': ','.join(partes[1:-1]).strip(),
+                                     'precio': float(partes[-1].strip())}
+    return df.reset_index()
+
+
+def generar_lineas_actualizacion(df_base, n, semilla=0):
+    """Mezcla de precios cambiados, códigos nuevos y códigos repetidos."""
+    azar = random.Random(semilla)
+    codigos = df_base['codigo'].tolist()
+    lineas = []
+    for i in range(n):
+        tirada = azar.random()
+        if tirada < 0.7:
+            codigo = azar.choice(codigos)
+        elif tirada < 0.9:
+            codigo = str(900000 + i)
+        else:
+            codigo = str(900000 + azar.randrange(max(i, 1)))
+        lineas.append(f"{codigo},Producto de prueba {i}, TRUPER,{azar.uniform(5, 5000):.2f}")
+    return lineas
+
+
+def bench_actualizaciones(args):
+    df_base = catalogo.parsear_catalogo(args.catalogo, "")[catalogo.COLUMNAS]
+    for n in args.filas:
+        lineas = generar_lineas_actualizacion(df_base, n)
+        vectorizado = medir(lambda: catalogo.aplicar_actualizaciones(
+            df_base, catalogo.parsear_lineas_precios(lineas)), args.repeticiones)
+        reportar(f"upsert vectorizado ({n} filas)", vectorizado)
+        if n <= args.max_por_fila:
+            reportar(f"df.loc por fila ({n} filas)", medir(lambda: actualizar_por_fila(df_base, lineas), 1))
+    _, resumen = catalogo.aplicar_actualizaciones(df_base, catalogo.parsear_lineas_precios(lineas))
+    print(f"Resumen con {args.filas[-1]} filas: {resumen}")
+
+
+# --- BÚSQUEDA DE PRODUCTOS ---
+
+def generar_consultas(df, n, semilla=0):
+    """Consultas como las que teclea un vendedor: palabras, prefijos, errores de dedo y códigos."""
+    azar = random.Random(semilla)
+    filas = list(df[['codigo', 'descripcion']].itertuples(index=False))
+    consultas = []
+    for _ in range(n):
+        codigo, descripcion = azar.choice(filas)
+        palabras = [p for p in busqueda.tokenizar(descripcion) if len(p) > 2] or [codigo]
+        tipo = azar.randrange(6)
+        if tipo == 0:
+            consultas.append(palabras[0])
+        elif tipo == 1:
+            consultas.append(palabras[0][:azar.randint(2, 5)])
+        elif tipo == 2:
+            consultas.append(" ".join(azar.sample(palabras, min(2, len(palabras)))))
+        elif tipo == 3:
+            palabra = azar.choice(palabras)
+            i = azar.randrange(len(palabra))
+            consultas.append(palabra[:i] + palabra[i + 1:] if len(palabra) > 4 else palabra)
+        elif tipo == 4:
+            consultas.append(codigo[:4])
+        else:
+            consultas.append(codigo)
+    return consultas
+
+
+def bench_busqueda(args):
+    df = catalogo.cargar_catalogo(args.catalogo, args.actualizaciones)
+    reportar("construir índices", medir(lambda: busqueda.BuscadorProductos(df), 3))
+    buscador = busqueda.BuscadorProductos(df)
+
+    consultas = generar_consultas(df, args.consultas)
+    tiempos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        buscador.buscar(consulta, args.limite)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    reportar_percentiles(f"consulta (top {args.limite})", tiempos)
+
+    p99 = perfil.percentil(sorted(tiempos), 99)
+    estado = "OK" if p99 < args.objetivo_p99 else "FUERA DE OBJETIVO"
+    print(f"Objetivo p99 < {args.objetivo_p99} ms: {estado}")
+
+
+# --- CARGA RÁPIDA: PARSER POR LÍNEA VS POR LOTES ---
+
+def analizar_por_linea(texto_pedido, df_catalogo):
+    """Cómo parseaba analizar_y_cargar_pedido antes (referencia)."""
+    lineas = [line.strip() for line in texto_pedido.split('\n') if line.strip()]
+    catalogo_map = df_catalogo.set_index('codigo').to_dict('index')
+    patron = re.compile(r'^[^\d]*(\d{4,6})[^\d]*(\d{1,3})')
+    productos = []
+    for linea in lineas:
+        match = patron.match(linea)
+        if match and match.group(1) in catalogo_map:
+            info = catalogo_map[match.group(1)]
+            productos.append({'codigo': match.group(1), 'descripcion': info['descripcion'],
+                              'cantidad': int(match.group(2)), 'precio_base': float(info['precio'])})
+    return productos
+
+
+def generar_pedido_pegado(df, n, semilla=0):
+    """Texto como el que se pega desde Excel: con repetidos, desconocidos y basura."""
+    azar = random.Random(semilla)
+    codigos = df['codigo'].tolist()
+    lineas = []
+    for _ in range(n):
+        tirada = azar.random()
+        if tirada < 0.9:
+            lineas.append(f"{azar.choice(codigos)}\t{azar.randint(1, 200)}")
+        elif tirada < 0.95:
+            lineas.append(f"{azar.randint(900000, 999999)} {azar.randint(1, 20)}")
+        else:
+            lineas.append("TOTAL PIEZAS")
+    return "\n".join(lineas)
+
+
+def bench_carga_rapida(args):
+    df = catalogo.cargar_catalogo(args.catalogo, args.actualizaciones)
+    reportar("construir mapa de códigos", medir(lambda: catalogo.mapa_codigos(df), 3))
+    mapa = catalogo.mapa_codigos(df)
+    for n in args.lineas:
+        texto = generar_pedido_pegado(df, n)
+        por_lotes = medir(lambda: carga_rapida.analizar_pedido(texto, mapa), args.repeticiones)
+        por_linea = medir(lambda: analizar_por_linea(texto, df), args.repeticiones)
+        reportar(f"por lotes ({n} líneas)", por_lotes)
+        reportar(f"por línea + to_dict ({n} líneas)", por_linea)
+        print(f"{'':<40} {n / (min(por_lotes) / 1000):,.0f} líneas/s por lotes"
+              f" vs {n / (min(por_linea) / 1000):,.0f} líneas/s antes")
+
+
+# --- PDF: PNG COMPLETOS POR DOCUMENTO VS PLANTILLA ---
+
+def generar_pdf_original(df, cliente, tipo_doc, lista, total):
+    """El generar_pdf anterior: decodifica los PNG completos en cada documento (referencia)."""
+    pdf = FPDF()
+    pdf.add_page()
+    if os.path.exists("logo_tepalcates.png"):
+        pdf.image("logo_tepalcates.png", x=10, y=8, w=35)
+    if os.path.exists("logo_truper_completo.png"):
+        pdf.image("logo_truper_completo.png", x=165, y=8, w=35)
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(200, 10, txt="Cotización", ln=True, align='C')
+    pdf.ln(15)
+    pdf.set_font("Arial", size=12)
+    for texto in (f"Cliente: {cliente}", f"Tipo: {tipo_doc}", f"Lista: {lista}",
+                  f"Fecha: {datetime.now().strftime('%d/%m/%Y')}"):
+        pdf.cell(200, 8, txt=texto, ln=True)
+    pdf.ln(10)
+    pdf.set_font("Arial", 'B', 10)
+    for ancho, titulo in ((30, "Código"), (90, "Descripción"), (20, "Cant."), (25, "P. Unit"), (25, "Subt.")):
+        pdf.cell(ancho, 10, titulo, 1)
+    pdf.ln()
+    pdf.set_font("Arial", size=9)
+    for _, row in df.iterrows():
+        pdf.cell(30, 8, str(row['codigo']), 1)
+        pdf.cell(90, 8, str(row['descripcion'])[:45], 1)
+        pdf.cell(20, 8, str(int(row['cantidad'])), 1)
+        pdf.cell(25, 8, f"${row['precio_unitario']:,.2f}", 1)
+        pdf.cell(25, 8, f"${row['Subtotal']:,.2f}", 1)
+        pdf.ln()
+    pdf.ln(5)
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(200, 10, txt=f"TOTAL: ${total:,.2f}", ln=True, align='R')
+    pdf.ln(10)
+    pdf.set_font("Arial", 'I', 10)
+    pdf.cell(200, 10, txt="Válida únicamente durante el mes de emisión de este documento.", ln=True, align='C')
+    return bytes(pdf.output())
+
+
+def generar_cotizacion(df_catalogo, n, semilla=0):
+    """DataFrame con las columnas que arma la app para el detalle de la cotización."""
+    muestra = df_catalogo.sample(n=n, replace=n > len(df_catalogo), random_state=semilla)
+    azar = random.Random(semilla)
+    df = pd.DataFrame({
+        'codigo': muestra['codigo'].tolist(),
+        'descripcion': muestra['descripcion'].tolist(),
+        'cantidad': [azar.randint(1, 50) for _ in range(n)],
+        'precio_base': muestra['precio'].tolist(),
+    })
+    df['precio_unitario'] = df['precio_base']
+    df['Subtotal'] = df['cantidad'] * df['precio_unitario']
+    return df
+
+
+def bench_pdf(args):
+    df_catalogo = catalogo.cargar_catalogo(args.catalogo, args.actualizaciones)
+    reportar("preparar logos (una vez)", medir(pdf_cotizacion.preparar_logos, 1))
+    for n in args.lineas:
+        df = generar_cotizacion(df_catalogo, n)
+        total = df['Subtotal'].sum()
+        datos = (df, "CLIENTE DE PRUEBA", "Remisión", "Distribuidor", total)
+        antes = medir(lambda: generar_pdf_original(*datos), args.repeticiones)
+        ahora = medir(lambda: pdf_cotizacion.generar_pdf(*datos), args.repeticiones)
+        reportar(f"PNG completos ({n} líneas)", antes)
+        reportar(f"plantilla ({n} líneas)", ahora)
+        print(f"{'':<40} tamaño {len(generar_pdf_original(*datos)) / 1024:,.0f} KB"
+              f" -> {len(pdf_cotizacion.generar_pdf(*datos)) / 1024:,.0f} KB")
+
+
+def medir_memoria(funcion):
+    """Pico de memoria asignada por Python durante `funcion`, en MB."""
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_pdf_grande(args):
+    df_catalogo = catalogo.cargar_catalogo(args.catalogo, args.actualizaciones)
+    pdf_cotizacion.preparar_logos()
+    for n in args.lineas:
+        df = generar_cotizacion(df_catalogo, n)
+        columnas = [df[c].tolist() for c in pdf_cotizacion.COLUMNAS_PDF]
+
+        def por_iterador():
+            return pdf_cotizacion.generar_pdf_lineas(zip(*columnas), "CLIENTE DE PRUEBA", "Remisión", "Distribuidor")
+
+        def con_iterrows():
+            return generar_pdf_original(df, "CLIENTE DE PRUEBA", "Remisión", "Distribuidor", df['Subtotal'].sum())
+
+        reportar(f"iterador paginado ({n} líneas)", medir(por_iterador, args.repeticiones))
+        reportar(f"iterrows original ({n} líneas)", medir(con_iterrows, args.repeticiones))
+        print(f"{'':<40} pico de memoria {medir_memoria(por_iterador):6.1f} MB"
+              f" vs {medir_memoria(con_iterrows):6.1f} MB")
+
+
+# --- PEDIDOS: SERVIDOR LOCAL QUE IMITA A RENDER ---
+
+class ServidorStub:
+    """Servidor HTTP local que imita al de Render: lento, intermitente o que rechaza.
+
+    `respuestas` es una función (ruta, cuerpo, cabeceras) -> (código, dict) que
+    decide cada respuesta (o (código, bytes, cabeceras) para responder otra
+    cosa que JSON); `retraso` se suma a cada respuesta y `arranque`
+    simula el arranque en frío: lo que llegue antes de que el servidor
+    "despierte" espera hasta ese momento.
+    """
+
+    def __init__(self, respuestas, retraso=0.0, arranque=0.0):
+        stub = self
+        self.respuestas = respuestas
+        self.retraso = retraso
+        self.arranque = arranque
+        self.despierta_en = None
+        self.peticiones = []
+        self._candado = threading.Lock()
+
+        class Manejador(BaseHTTPRequestHandler):
+            def _responder(self):
+                largo = int(self.headers.get('Content-Length') or 0)
+                cuerpo = self.rfile.read(largo) if largo else b""
+                with stub._candado:
+                    stub.peticiones.append((self.command, self.path, dict(self.headers)))
+                    if stub.despierta_en is None:
+                        stub.despierta_en = time.time() + stub.arranque
+                    espera = max(0.0, stub.despierta_en - time.time()) + stub.retraso
+                if espera:
+                    time.sleep(espera)
+                codigo, datos, *extra = stub.respuestas(self.path, cuerpo, self.headers)
+                if extra:
+                    contenido, cabeceras = datos, extra[0]
+                else:
+                    contenido, cabeceras = json.dumps(datos).encode('utf-8'), {'Content-Type': 'application/json'}
+                try:
+                    self.send_response(codigo)
+                    for nombre, valor in cabeceras.items():
+                        self.send_header(nombre, valor)
+                    self.send_header('Content-Length', str(len(contenido)))
+                    self.end_headers()
+                    self.wfile.write(contenido)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # El cliente se rindió (timeout) antes de la respuesta
+
+            do_GET = do_POST = _responder
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def respuestas_pedidos(escenario, semilla=0):
+    """Imita /api/crear-pedido. Cada POST crea un folio, como server.js (no deduplica)."""
+    azar = random.Random(semilla)
+    folios = []
+    candado = threading.Lock()
+
+    def responder(ruta, cuerpo, cabeceras):
+        if ruta == servidor.RUTA_FOLIO:
+            return 200, {"folio": 1000 + len(folios)}
+        if escenario == "rechazo":
+            return 400, {"error": "cliente inexistente"}
+        if escenario == "intermitente" and azar.random() < 0.5:
+            return azar.choice([500, 502, 503]), {"error": "servidor despertando"}
+        with candado:
+            folios.append(1000 + len(folios))
+            return 201, {"folio": folios[-1]}
+
+    return responder
+
+
+def bench_pedidos(args):
+    retraso = args.retraso if args.escenario == "lento" else 0.0
+    respuestas = respuestas_pedidos(args.escenario)
+    stub = ServidorStub(respuestas, retraso=retraso)
+    url = f"{stub.url}{servidor.RUTA_CREAR_PEDIDO}"
+    dir_tmp = tempfile.mkdtemp(prefix="bench_pedidos_")
+    cliente = servidor.ClienteServidor(stub.url)
+    buzon = pedidos.BuzonPedidos(os.path.join(dir_tmp, "buzon.db"), cliente=cliente, timeout=args.timeout,
+                                 backoff_inicial=0.05, backoff_maximo=0.5, max_intentos=args.max_intentos)
+    try:
+        cotizacion = [{'codigo': '44458', 'cantidad': 2}]
+        payloads = [pedidos.armar_payload(f"CLIENTE {i}", "151", str(i), cotizacion) for i in range(args.pedidos)]
+
+        # Lo que antes esperaba la sesión: un POST bloqueante por pedido
+        def post_bloqueante():
+            try:
+                requests.post(url, json=payloads[0], timeout=args.timeout)
+            except requests.exceptions.RequestException:
+                pass
+
+        if args.escenario != "intermitente":
+            reportar("POST bloqueante (antes)", medir(post_bloqueante, 3))
+
+        buzon.iniciar()
+        inicio = time.perf_counter()
+        tiempos, claves = [], []
+        for i, payload in enumerate(payloads):
+            t0 = time.perf_counter()
+            claves.append(buzon.encolar(payload, pedidos.clave_idempotencia(payload, f"bench-{i}")))
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        # Doble clic: el mismo pedido con la misma clave no debe generar otro POST
+        for i, payload in enumerate(payloads[:10]):
+            buzon.encolar(payload, pedidos.clave_idempotencia(payload, f"bench-{i}"))
+        reportar_percentiles("encolar (lo que espera la UI)", tiempos)
+
+        while buzon.pendientes() and time.perf_counter() - inicio < args.limite:
+            time.sleep(0.05)
+        total = time.perf_counter() - inicio
+        estados = [buzon.estado(c) for c in claves]
+        conteo = {}
+        for e in estados:
+            conteo[e['estado']] = conteo.get(e['estado'], 0) + 1
+        posts = sum(1 for _, _, cabeceras in stub.peticiones if 'Idempotency-Key' in cabeceras)
+        print(f"{'':<40} {args.pedidos} pedidos en {total:.2f} s | estados {conteo}"
+              f" | {posts} POST | folios distintos {len({e['folio'] for e in estados if e['folio']})}")
+        reportar_metricas(cliente)
+    finally:
+        buzon.detener()
+        stub.cerrar()
+        shutil.rmtree(dir_tmp, ignore_errors=True)
+
+
+def reportar_metricas(cliente):
+    for endpoint, m in cliente.resumen_metricas().items():
+        print(f"{endpoint:<40} p50 {m['p50_ms']:8.2f} ms | p95 {m['p95_ms']:8.2f} ms"
+              f" | {m['llamadas']} llamadas, {m['errores']} errores")
+
+
+def bench_servidor(args):
+    # Conexión nueva por llamada (como antes) vs la sesión con pool
+    stub = ServidorStub(respuestas_pedidos("normal"), retraso=args.retraso)
+    try:
+        url = f"{stub.url}{servidor.RUTA_FOLIO}"
+        reportar_percentiles("requests.get sin sesión (antes)",
+                             medir(lambda: requests.get(url, timeout=10), args.repeticiones))
+        cliente = servidor.ClienteServidor(stub.url)
+        reportar_percentiles("sesión compartida con pool",
+                             medir(lambda: cliente.folio_actual(), args.repeticiones))
+    finally:
+        stub.cerrar()
+
+    # Arranque en frío: el primer pedido sin calentar vs después de calentar al abrir la app
+    payload = pedidos.armar_payload("CLIENTE", "151", "1", [{'codigo': '44458', 'cantidad': 1}])
+    for calentar in (False, True):
+        stub = ServidorStub(respuestas_pedidos("normal"), arranque=args.arranque)
+        try:
+            cliente = servidor.ClienteServidor(stub.url)
+            if calentar:
+                cliente.calentar()
+                time.sleep(args.tiempo_armado)  # el vendedor arma la cotización
+            inicio = time.perf_counter()
+            cliente.post(servidor.RUTA_CREAR_PEDIDO, json=payload, timeout=servidor.TIMEOUT_CALENTAR)
+            nombre = "primer pedido tras calentar" if calentar else "primer pedido en frío"
+            print(f"{nombre:<40} {(time.perf_counter() - inicio) * 1000:9.2f} ms"
+                  f" (arranque simulado {args.arranque:.1f} s)")
+            reportar_metricas(cliente)
+        finally:
+            stub.cerrar()
+
+
+
+# --- CLIENTES: SHEET LOCAL CON ETAG ---
+
+def generar_csv_clientes(n, semilla=0):
+    azar = random.Random(semilla)
+    filas = ["ID Vendedor,ID Cliente,Nombre Cliente "]
+    for i in range(n):
+        filas.append(f"{azar.randint(100, 180)},{1000 + i},CLIENTE DE PRUEBA {i}")
+    return ("\n".join(filas) + "\n").encode('utf-8')
+
+
+def respuestas_sheet(estado):
+    """Imita el CSV publicado de Google: ETag y 304 si no cambió. `estado` se puede mutar."""
+    def responder(ruta, cuerpo, cabeceras):
+        if estado.get('caido'):
+            return 503, {"error": "no disponible"}
+        etag = f'"{hash(estado["csv"]) & 0xffffffff:x}"'
+        if cabeceras.get('If-None-Match') == etag:
+            return 304, b"", {'ETag': etag}
+        estado['descargas'] = estado.get('descargas', 0) + 1
+        return 200, estado['csv'], {'Content-Type': 'text/csv', 'ETag': etag}
+
+    return responder
+
+
+def bench_clientes(args):
+    estado = {'csv': generar_csv_clientes(args.clientes)}
+    stub = ServidorStub(respuestas_sheet(estado), retraso=args.retraso)
+    dir_snapshot = tempfile.mkdtemp(prefix="bench_clientes_")
+    url = f"{stub.url}/pub.csv"
+    try:
+        # Antes: cada vencimiento del TTL descargaba y parseaba el CSV en la ejecución del usuario
+        reportar("descarga síncrona (antes)", medir(lambda: pd.read_csv(url, dtype=str), 3))
+
+        inicio = time.perf_counter()
+        directorio = directorio_clientes.DirectorioClientes(url=url, dir_snapshot=dir_snapshot, ttl=args.ttl)
+        print(f"{'arranque sin snapshot':<40} {(time.perf_counter() - inicio) * 1000:9.2f} ms"
+              f" | origen {directorio.origen} | {len(directorio.tabla)} clientes")
+
+        reportar("arranque con snapshot local", medir(
+            lambda: directorio_clientes.DirectorioClientes(url=url, dir_snapshot=dir_snapshot, ttl=args.ttl), 5))
+
+        # TTL vencido: la consulta regresa de inmediato y revalida en segundo plano
+        time.sleep(args.ttl)
+        descargas = estado['descargas']
+        tiempos = medir(directorio.obtener, args.consultas)
+        directorio._hilo.join()
+        reportar_percentiles("obtener() con TTL vencido", tiempos)
+        print(f"{'':<40} descargas completas al revalidar sin cambios: {estado['descargas'] - descargas} (304)")
+
+        estado['csv'] = generar_csv_clientes(args.clientes + 10)
+        time.sleep(args.ttl)
+        directorio.obtener()
+        directorio._hilo.join()
+        print(f"{'Sheet modificado':<40} versión {directorio.version} | {len(directorio.tabla)} clientes")
+
+        # Filtro por vendedor en cada rerun: máscara sobre todo el DataFrame vs partición precalculada
+        df = directorio.tabla.df
+        vendedores = [str(v) for v in range(100, 181)]
+        indice = directorio.derivado('indice', directorio_clientes.IndiceClientes)
+        reportar_percentiles("filtro por máscara + tolist (antes)", medir(
+            lambda: df[df['cve_age'] == random.choice(vendedores)]['display'].tolist(), args.consultas))
+        reportar_percentiles("partición por vendedor", medir(
+            lambda: indice.opciones(random.choice(vendedores)), args.consultas))
+        reportar_percentiles("búsqueda por nombre/clave", medir(
+            lambda: indice.opciones("", f"prueba {random.randrange(args.clientes)}"), args.consultas))
+
+        estado['caido'] = True
+        time.sleep(args.ttl)
+        tabla = directorio.obtener()
+        directorio._hilo.join()
+        print(f"{'Sheet caído':<40} se sigue sirviendo {len(tabla)} clientes | error: {directorio.ultimo_error}")
+    finally:
+        stub.cerrar()
+        shutil.rmtree(dir_snapshot, ignore_errors=True)
+
+
+
+# --- COTIZACIÓN: DATAFRAME POR RERUN VS MODELO INCREMENTAL ---
+
+def rerun_con_dataframe(productos, lista):
+    """Lo que hacía cada rerun: DataFrame nuevo, precios, Subtotal y dos `iterrows()`."""
+    df_cot = pd.DataFrame(productos)
+    if lista == "Distribuidor":
+        df_cot['precio_unitario'] = df_cot['precio_base']
+    else:
+        df_cot['precio_unitario'] = df_cot['precio_base'] / 0.90
+    df_cot['Subtotal'] = df_cot['cantidad'] * df_cot['precio_unitario']
+    renglones = []
+    for _, row in df_cot.iterrows():
+        renglones.append(f"{row['cantidad']} x ${row['precio_unitario']:,.2f} = *${row['Subtotal']:,.2f}*")
+    total = df_cot['Subtotal'].sum()
+    mensaje = ""
+    for _, fila in df_cot.iterrows():
+        mensaje += f"· {fila['codigo']} {int(fila['cantidad'])} {fila['descripcion']}\n"
+    return renglones, total, mensaje
+
+
+def rerun_con_modelo(cot, lista):
+    """Lo que hace ahora: sólo formatear las líneas; total y mensaje ya están listos."""
+    i = cot.motor.indice(lista)
+    renglones = [f"{l.cantidad} x ${l.precios[i]:,.2f} = *${l.cantidad * l.precios[i]:,.2f}*" for l in cot.lineas]
+    return renglones, cot.total(lista), cot.texto_detalle()
+
+
+def bench_cotizacion(args):
+    df_catalogo = catalogo.cargar_catalogo(args.catalogo, args.actualizaciones)
+    for n in args.lineas:
+        df = generar_cotizacion(df_catalogo, n)
+        productos = [{'codigo': c, 'descripcion': d, 'cantidad': q, 'precio_base': p}
+                     for c, d, q, p in zip(df['codigo'], df['descripcion'], df['cantidad'], df['precio_base'])]
+        cot = modelo_cotizacion.Cotizacion(productos)
+        cot.texto_detalle()
+
+        reportar(f"rerun con DataFrame ({n} líneas)", medir(lambda: rerun_con_dataframe(productos, "Dimefet"), args.repeticiones))
+        reportar(f"rerun con modelo ({n} líneas)", medir(lambda: rerun_con_modelo(cot, "Dimefet"), args.repeticiones))
+        reportar(f"cambiar lista, total ({n} líneas)",
+                 medir(lambda: (cot.total("Distribuidor"), cot.total("Dimefet")), args.repeticiones))
+
+        def agregar_y_quitar():
+            cot.agregar('44458', 'PRUEBA', 2, 10.0)
+            cot.quitar(len(cot) - 1)
+
+        reportar(f"agregar + quitar línea ({n} líneas)", medir(agregar_y_quitar, args.repeticiones))
+        esperado = sum(p['cantidad'] * p['precio_base'] / 0.90 for p in productos)
+        print(f"{'':<40} diferencia del total incremental {abs(cot.total('Dimefet') - esperado):.2e}")
+
+
+
+# --- LISTAS DE PRECIOS: COLUMNAS PRECALCULADAS ---
+
+LISTAS_EJEMPLO = listas_precios.LISTAS_PRECIOS + [
+    {'nombre': "Mayoreo", 'factor': 0.95, 'redondeo': 2,
+     'escalas': [{'desde': 12, 'factor': 0.98}, {'desde': 100, 'factor': 0.95}],
+     'precios_especiales': {'44458': 35.0}},
+    {'nombre': "Cliente 159", 'factor': 0.93, 'clientes': ['159']},
+]
+
+
+def bench_listas(args):
+    df_catalogo = catalogo.cargar_catalogo(args.catalogo, args.actualizaciones)
+    motor = listas_precios.MotorPrecios(LISTAS_EJEMPLO)
+    reportar(f"precalcular catálogo ({len(motor.nombres)} listas)",
+             medir(lambda: motor.precalcular(df_catalogo), args.repeticiones))
+    tabla = motor.precalcular(df_catalogo)
+
+    for n in args.lineas:
+        df = generar_cotizacion(df_catalogo, n)
+        productos = [{'codigo': c, 'descripcion': d, 'cantidad': q, 'precio_base': p}
+                     for c, d, q, p in zip(df['codigo'], df['descripcion'], df['cantidad'], df['precio_base'])]
+
+        def por_linea():
+            cot = modelo_cotizacion.Cotizacion(motor=motor)
+            for p in productos:
+                cot.agregar(p['codigo'], p['descripcion'], p['cantidad'], p['precio_base'])
+            return cot
+
+        reportar(f"cargar línea por línea ({n} líneas)", medir(por_linea, args.repeticiones))
+        reportar(f"cargar en bloque ({n} líneas)",
+                 medir(lambda: modelo_cotizacion.Cotizacion(productos, motor=motor), args.repeticiones))
+        reportar(f"cargar desde la tabla ({n} líneas)", medir(
+            lambda: modelo_cotizacion.Cotizacion(motor=motor).extender(productos, tabla_precios=tabla),
+            args.repeticiones))
+        cot = modelo_cotizacion.Cotizacion(productos, motor=motor)
+        reportar(f"cambiar de lista ({n} líneas)",
+                 medir(lambda: [cot.total(nombre) for nombre in motor.nombres], args.repeticiones))
+
+        # La tabla, el cálculo en bloque y el cálculo por línea deben coincidir
+        lote = tabla.precios_lote([p['codigo'] for p in productos], [p['cantidad'] for p in productos])
+        unitarios = [motor.precios(p['precio_base'], p['codigo'], p['cantidad']) for p in productos[:200]]
+        iguales = all(abs(a - b) < 1e-9 for fila, u in zip(lote.tolist(), unitarios) for a, b in zip(fila, u))
+        print(f"{'':<40} tabla == cálculo por línea: {iguales}")
+
+
+# --- RECOTIZACIÓN DEL HISTORIAL ---
+
+def llenar_historial(ruta_db, df_catalogo, cotizaciones, lineas, semilla=0):
+    """Historial sintético: precios guardados con ±10% de variación y algún código que ya no existe."""
+    azar = random.Random(semilla)
+    codigos = df_catalogo['codigo'].tolist()
+    descripciones = df_catalogo['descripcion'].tolist()
+    precios = df_catalogo['precio'].tolist()
+    motor = listas_precios.motor_predeterminado()
+    historial.inicializar(ruta_db, ruta_json=os.path.join(os.path.dirname(ruta_db), "no_existe.json"))
+    filas = []
+    for i in range(cotizaciones):
+        lista = azar.choice(motor.nombres)
+        productos = []
+        for _ in range(lineas):
+            j = azar.randrange(len(codigos))
+            base = precios[j] * azar.choice([1.0, 1.0, 1.0, 0.9, 1.1])
+            codigo = codigos[j] if azar.random() > 0.01 else f"9{azar.randrange(10**5):05d}"
+            cantidad = azar.randint(1, 50)
+            unitario = motor.precios(base, codigo, cantidad)[motor.indice(lista)]
+            productos.append({'codigo': codigo, 'descripcion': descripciones[j], 'cantidad': cantidad,
+                              'precio_base': base, 'precio_unitario': unitario})
+        filas.append({'id': f"{i:08d}", 'fecha': f"2026-{1 + i % 12:02d}-{1 + i % 28:02d} 10:00:00",
+                      'cliente': f"CLIENTE {i % 300}", 'vendedor': str(i % 15),
+                      'tipo_doc': "Remisión", 'lista_precios': lista, 'productos': productos,
+                      'total': sum(p['cantidad'] * p['precio_unitario'] for p in productos)})
+    for datos in filas:
+        historial.guardar(datos, ruta_db)
+
+
+def recotizar_por_cotizacion(ruta_db, tabla_precios):
+    """Lo que había que hacer antes: cargar cada cotización al modelo y comparar su total."""
+    cambiadas = 0
+    cursor = None
+    while True:
+        pagina, cursor = historial.consultar(cursor=cursor, limite=500, ruta_db=ruta_db)
+        for resumen in pagina:
+            datos = historial.obtener(resumen['id'], ruta_db)
+            cot = modelo_cotizacion.Cotizacion(motor=tabla_precios.motor)
+            cot.extender(datos['productos'], tabla_precios=tabla_precios)
+            cambiadas += abs(cot.total(datos['lista_precios']) - datos['total']) > recotizar.TOLERANCIA
+        if cursor is None:
+            return cambiadas
+
+
+def bench_recotizar(args):
+    df_catalogo = catalogo.cargar_catalogo(args.catalogo, args.actualizaciones)
+    tabla = listas_precios.motor_predeterminado().precalcular(df_catalogo)
+    directorio = tempfile.mkdtemp()
+    try:
+        ruta_db = os.path.join(directorio, "historial.db")
+        inicio = time.perf_counter()
+        llenar_historial(ruta_db, df_catalogo, args.cotizaciones, args.lineas)
+        print(f"{args.cotizaciones} cotizaciones x {args.lineas} líneas generadas en "
+              f"{time.perf_counter() - inicio:.1f} s")
+
+        reportar("leer líneas (json_each)", medir(lambda: historial.leer_lineas(ruta_db), args.repeticiones))
+        lineas = historial.leer_lineas(ruta_db)
+        reportar("recotizar en bloque", medir(lambda: recotizar.recotizar(lineas, tabla), args.repeticiones))
+        reportar("leer + recotizar", medir(lambda: recotizar.recotizar_historial(df_catalogo, ruta_db=ruta_db), 1))
+        reportar("cotización por cotización", medir(lambda: recotizar_por_cotizacion(ruta_db, tabla), 1))
+        reporte = recotizar.recotizar(lineas, tabla)
+        print(f"{'':<40} {reporte.resumen()}")
+        cambios = reporte.cambios()
+        reportar("guardar líneas y totales", medir(lambda: historial.actualizar_recotizadas(cambios, ruta_db), 1))
+        print(f"{'':<40} tras guardar: {recotizar.recotizar_historial(df_catalogo, ruta_db=ruta_db).resumen()}"
+              f"; por cotización coincide: {recotizar_por_cotizacion(ruta_db, tabla) == 0}")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+# --- VENTAS: AGREGADOS CONTRA RECORRER EL HISTORIAL ---
+
+def tablero_recorriendo(ruta_db):
+    """Lo que había que hacer antes: leer todo el historial y sumar línea por línea en Python."""
+    productos, vendedores, clientes, meses = {}, {}, {}, {}
+    for datos in historial.leer_todo(ruta_db).values():
+        for p in datos['productos']:
+            importe = p['cantidad'] * p['precio_unitario']
+            productos[p['codigo']] = productos.get(p['codigo'], 0) + importe
+            vendedores[datos['vendedor']] = vendedores.get(datos['vendedor'], 0) + importe
+            clientes[datos['cliente']] = clientes.get(datos['cliente'], 0) + importe
+            meses[datos['fecha'][:7]] = meses.get(datos['fecha'][:7], 0) + importe
+    return sorted(productos.items(), key=lambda e: -e[1])[:10], vendedores, clientes, meses
+
+
+def tablero_agregado(ruta_db):
+    return (ventas.productos_top(ruta_db=ruta_db), ventas.totales_por_vendedor(ruta_db=ruta_db),
+            ventas.totales_por_cliente(ruta_db=ruta_db), ventas.tendencia_mensual(ruta_db=ruta_db))
+
+
+def bench_ventas(args):
+    df_catalogo = catalogo.cargar_catalogo(args.catalogo, args.actualizaciones)
+    directorio = tempfile.mkdtemp()
+    try:
+        ruta_db = os.path.join(directorio, "historial.db")
+        inicio = time.perf_counter()
+        llenar_historial(ruta_db, df_catalogo, args.cotizaciones, args.lineas)
+        print(f"{args.cotizaciones} cotizaciones x {args.lineas} líneas generadas en "
+              f"{time.perf_counter() - inicio:.1f} s")
+
+        reportar("reconstruir agregados de ventas", medir(lambda: historial.reconstruir_ventas(ruta_db), 1))
+        with closing(historial.conectar(ruta_db)) as conexion:
+            for tabla in historial.AGREGADOS_VENTAS:
+                print(f"{'':<40} {tabla}: {conexion.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]} filas")
+        reportar("tablero recorriendo el historial", medir(lambda: tablero_recorriendo(ruta_db), 1))
+        reportar("tablero desde los agregados", medir(lambda: tablero_agregado(ruta_db), args.repeticiones))
+        reportar("productos top de un vendedor y mes", medir(lambda: ventas.productos_top(
+            desde="2026-03-01", hasta="2026-03-31", vendedor="3", ruta_db=ruta_db), args.repeticiones))
+        top_antes = [c for c, _ in tablero_recorriendo(ruta_db)[0]]
+        print(f"{'':<40} top 10 coincide: {top_antes == [p['codigo'] for p in ventas.productos_top(ruta_db=ruta_db)]}")
+
+        # Costo de los triggers en cada guardado: editar cotizaciones con y sin ellos
+        datos = historial.obtener(f"{0:08d}", ruta_db)
+        reportar("guardar (con triggers)", medir(lambda: historial.guardar(datos, ruta_db), args.repeticiones))
+        with closing(historial.conectar(ruta_db)) as conexion, conexion:
+            triggers = conexion.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+            for nombre, _ in triggers:
+                conexion.execute(f"DROP TRIGGER {nombre}")
+        reportar("guardar (sin triggers)", medir(lambda: historial.guardar(datos, ruta_db), args.repeticiones))
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+# --- COSTO DE LA INSTRUMENTACIÓN ---
+
+def bench_perfil(args):
+    def nada():
+        return None
+
+    medida = perfil.medido('nada')(nada)
+
+    def con_etapa():
+        with perfil.etapa('nada'):
+            return None
+
+    def por_llamada(funcion):
+        inicio = time.perf_counter()
+        for _ in range(args.llamadas):
+            funcion()
+        return (time.perf_counter() - inicio) / args.llamadas * 1e9
+
+    perfil.activar(None)
+    print(f"{'función sin decorar':<40} {por_llamada(nada):8.1f} ns/llamada")
+    print(f"{'@medido, perfil apagado':<40} {por_llamada(medida):8.1f} ns/llamada")
+    print(f"{'etapa(), perfil apagado':<40} {por_llamada(con_etapa):8.1f} ns/llamada")
+    perfilador = perfil.Perfilador()
+    perfil.activar(perfilador)
+    print(f"{'@medido, perfil encendido':<40} {por_llamada(medida):8.1f} ns/llamada")
+    print(f"{'etapa(), perfil encendido':<40} {por_llamada(con_etapa):8.1f} ns/llamada")
+    perfil.activar(None)
+    resumen = perfilador.resumen()['nada']
+    print(f"{'':<40} {resumen['llamadas']} muestras, p50 {resumen['p50_ms'] * 1000:.2f} µs")
+
+
+# --- APP COMPLETA: `streamlit run` REAL Y CLIENTES POR WEBSOCKET ---
+
+class EntornoApp:
+    """`streamlit run app.py` en una carpeta temporal con el catálogo y stubs locales del Sheet y de Render.
+
+    El historial, el buzón, los snapshots y el log del perfil quedan en la carpeta
+    temporal; no se toca nada del repo ni de la red. Cada `cliente()` es una pestaña
+    del navegador contra ese mismo servidor.
+    """
+
+    ARCHIVOS = (catalogo.ARCHIVO_CATALOGO, catalogo.ARCHIVO_ACTUALIZACIONES,
+                "logo_tepalcates.png", "logo_truper_completo.png")
+    CLAVE_PERFIL = "benchmarks"
+
+    def __init__(self, clientes=4500, retraso_sheet=0.0, retraso_servidor=0.0):
+        self.repo = os.path.dirname(os.path.abspath(__file__))
+        self.app = os.path.join(self.repo, "app.py")
+        self.clientes = clientes
+        self.retraso_sheet = retraso_sheet
+        self.retraso_servidor = retraso_servidor
+
+    def __enter__(self):
+        self.directorio = tempfile.mkdtemp()
+        for nombre in self.ARCHIVOS:
+            if os.path.exists(os.path.join(self.repo, nombre)):
+                os.symlink(os.path.join(self.repo, nombre), os.path.join(self.directorio, nombre))
+        self.sheet = ServidorStub(respuestas_sheet({'csv': generar_csv_clientes(self.clientes)}),
+                                  retraso=self.retraso_sheet)
+        self.render = ServidorStub(respuestas_pedidos("normal"), retraso=self.retraso_servidor)
+        # Cada rerun completo agrega sus muestras del perfil a este archivo
+        self.log_perfil = os.path.join(self.directorio, "perfil.jsonl")
+        entorno = dict(os.environ, CLIENTES_SHEET_URL=f"{self.sheet.url}/pub.csv", SERVIDOR_PEDIDOS_URL=self.render.url,
+                       COTIZADOR_PERFIL_CLAVE=self.CLAVE_PERFIL, COTIZADOR_PERFIL_LOG=self.log_perfil,
+                       COTIZADOR_PERFIL_LOG_MAX_MB="1024")
+        self._cwd = os.getcwd()
+        os.chdir(self.directorio)
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            puerto = s.getsockname()[1]
+        self.url = f"http://127.0.0.1:{puerto}"
+        self._salida = open(os.path.join(self.directorio, "streamlit.log"), "w")
+        self.servidor = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", self.app, "--server.headless=true",
+             "--server.address=127.0.0.1", f"--server.port={puerto}", "--server.fileWatcherType=none",
+             "--browser.gatherUsageStats=false"],
+            cwd=self.directorio, env=entorno, stdout=self._salida, stderr=subprocess.STDOUT)
+        try:
+            self._esperar_servidor()
+        except Exception:
+            self.__exit__()
+            raise
+        return self
+
+    def _esperar_servidor(self, limite=60):
+        fin = time.monotonic() + limite
+        while time.monotonic() < fin:
+            if self.servidor.poll() is not None:
+                break
+            try:
+                if requests.get(f"{self.url}/_stcore/health", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        with open(self._salida.name) as f:
+            raise RuntimeError(f"streamlit run no respondió en {self.url}:\n{f.read()[-2000:]}")
+
+    def __exit__(self, *excepcion):
+        self.servidor.terminate()
+        try:
+            self.servidor.wait(10)
+        except subprocess.TimeoutExpired:
+            self.servidor.kill()
+        self._salida.close()
+        os.chdir(self._cwd)
+        self.sheet.cerrar()
+        self.render.cerrar()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def cliente(self, con_perfil=True):
+        # El cliente trae Streamlit: sólo se importa para los benchmarks que corren la app
+        from cliente_streamlit import ClienteApp
+        return ClienteApp(self.url, f"perfil={self.CLAVE_PERFIL}" if con_perfil else "")
+
+    def muestras_perfil(self, desde=0):
+        """{etapa: [ms]} de las líneas del log del perfil a partir del byte `desde`."""
+        etapas = {}
+        if os.path.exists(self.log_perfil):
+            with open(self.log_perfil, encoding='utf-8') as f:
+                f.seek(desde)
+                for linea in f:
+                    muestra = json.loads(linea)
+                    etapas.setdefault(muestra['etapa'], []).append(muestra['ms'])
+        return etapas
+
+
+def bench_secciones(args):
+    with EntornoApp() as entorno:
+        df_catalogo = catalogo.cargar_catalogo(catalogo.ARCHIVO_CATALOGO, catalogo.ARCHIVO_ACTUALIZACIONES)
+        llenar_historial(historial.ARCHIVO_HISTORIAL_DB, df_catalogo, 60, 5)
+        asyncio.run(_medir_secciones(entorno, generar_pedido_pegado(df_catalogo, args.lineas), args.repeticiones))
+
+
+async def _medir_secciones(entorno, texto_pedido, repeticiones):
+    cliente = entorno.cliente()
+    await cliente.conectar()
+    await cliente.escribir(texto_pedido, etiqueta="Pega aquí (Código Cantidad)", tipo='text_area')
+    await cliente.clic("Procesar")
+    print(f"Cotización de {cliente.contar('button', '❌')} líneas contra {entorno.url}")
+
+    def lista(i):
+        opciones = cliente.widget('radio', "Lista de Precios:")[0].options
+        return opciones[(i + 1) % len(opciones)]
+
+    # (interacción, widget que cambia); Datos Generales corre en el script principal,
+    # así que sus cambios son un rerun completo también desde el navegador
+    interacciones = [
+        ("buscar cliente", lambda i, completo: cliente.escribir(f"prueba {i}", clave="cli_busqueda", completo=completo)),
+        ("buscar producto", lambda i, completo: cliente.escribir(("martillo", "pinza", "cinta")[i % 3],
+                                                                 clave="prod_busqueda", completo=completo)),
+        ("quitar línea", lambda i, completo: cliente.clic("❌", completo=completo)),
+        ("página del historial", lambda i, completo: cliente.clic("Siguientes ➡️" if i % 2 == 0 else "⬅️ Anteriores",
+                                                                  completo=completo)),
+        ("clave de vendedor", lambda i, completo: cliente.escribir(("151", "")[i % 2],
+                                                                   etiqueta="Clave Vendedor (Sirve de Filtro):",
+                                                                   completo=completo)),
+        ("tipo de documento", lambda i, completo: cliente.escribir(("Cotización", "Remisión")[i % 2],
+                                                                   etiqueta="Tipo de Documento:", completo=completo)),
+        ("no. de pedido", lambda i, completo: cliente.escribir(f"P-{i}", etiqueta="No. Pedido (Dejar vacío para autogenerar):",
+                                                               completo=completo)),
+        ("lista de precios", lambda i, completo: cliente.elegir(lista(i), etiqueta="Lista de Precios:", tipo='radio',
+                                                                completo=completo)),
+    ]
+    # "Navegador" es lo que manda el frontend (con el fragmento del widget, si tiene);
+    # "rerun completo" manda el mismo cambio sin fragmento, como corría la app antes de
+    # las secciones. Los tiempos son del cliente: websocket local, script en el servidor
+    # y los deltas de regreso. `corridas` cuenta las del navegador
+    print(f"{'':<22} {'rerun completo':>15} {'navegador':>10}  corridas")
+    try:
+        for nombre, accion in interacciones:
+            parciales, corridas = [], set()
+            for i in range(repeticiones):
+                parciales.append(await accion(i, False))
+                corridas.add(cliente.corridas)
+            completos = [await accion(repeticiones + i, True) for i in range(repeticiones)]
+            completo, parcial = perfil.percentil(sorted(completos), 50), perfil.percentil(sorted(parciales), 50)
+            print(f"{nombre:<22} p50 {completo:8.1f} ms {parcial:7.1f} ms  "
+                  f"{'/'.join(map(str, sorted(corridas))):>8}  {completo / max(parcial, 0.001):5.1f}x")
+    finally:
+        await cliente.cerrar()
+
+
+# --- CARGA: MUCHAS PESTAÑAS CONTRA UN SOLO SERVIDOR ---
+
+ETAPAS_CARGA = ('catalogo', 'clientes', 'carga_rapida', 'agregar_producto', 'pdf', 'historial.guardar',
+                'historial.pagina', 'seccion.cotizacion')
+
+
+def memoria_mb(pid="self"):
+    """PSS actual de un proceso en MB (Linux), 0 si ya terminó."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for linea in f:
+                if linea.startswith("Pss:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def escenario_vendedor(entorno, numero, texto_pedido):
+    """Una pestaña completa: abrir, buscar y agregar, pegar un pedido, elegir cliente, descargar el PDF y guardar.
+
+    Regresa los ms de cada acción medidos en el cliente; si una falla (también la
+    descarga del PDF) el escenario cuenta como error con el nombre de la acción.
+    """
+    cliente = entorno.cliente()
+    acciones = {}
+
+    async def paso(nombre, interaccion):
+        try:
+            acciones[nombre] = await interaccion
+        except Exception as e:
+            raise RuntimeError(f"{nombre}: {type(e).__name__}: {e}") from e
+
+    await paso('abrir', cliente.conectar())
+    try:
+        await paso('buscar_producto', cliente.escribir("martillo", clave="prod_busqueda"))
+        producto = cliente.widget('selectbox', clave="prod_sel")[0].options[0]
+        await paso('elegir_producto', cliente.elegir(producto, clave="prod_sel"))
+        await paso('agregar_producto', cliente.clic("➕ Añadir"))
+        await paso('pegar_pedido', cliente.escribir(texto_pedido, etiqueta="Pega aquí (Código Cantidad)",
+                                                    tipo='text_area'))
+        await paso('carga_rapida', cliente.clic("Procesar"))
+        await paso('buscar_cliente', cliente.escribir(f"prueba {numero}", clave="cli_busqueda"))
+        opcion = cliente.widget('selectbox', "Seleccione Cliente:")[0].options[0]
+        await paso('elegir_cliente', cliente.elegir(opcion, etiqueta="Seleccione Cliente:"))
+        await paso('preparar_pdf', cliente.clic("📄 Preparar PDF"))
+        await paso('pdf', cliente.descargar("📥 Descargar PDF"))
+        await paso('guardar', cliente.clic("💾 Guardar Cotización"))
+    finally:
+        await cliente.cerrar()
+    return acciones
+
+
+async def _abrir_y_cerrar(cliente):
+    await cliente.conectar()
+    await cliente.cerrar()
+
+
+async def _correr_carga(entorno, pedidos):
+    """Todas las pestañas a la vez; regresa (resultados, segundos, pico de PSS del servidor)."""
+    pico = memoria_mb(entorno.servidor.pid)
+    terminado = asyncio.Event()
+
+    async def muestrear():
+        nonlocal pico
+        while not terminado.is_set():
+            pico = max(pico, memoria_mb(entorno.servidor.pid))
+            await asyncio.sleep(0.1)
+
+    muestreo = asyncio.create_task(muestrear())
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(escenario_vendedor(entorno, n, texto) for n, texto in enumerate(pedidos)),
+                                      return_exceptions=True)
+    segundos = time.perf_counter() - inicio
+    terminado.set()
+    await muestreo
+    return resultados, segundos, pico
+
+
+def bench_carga(args):
+    fallidos = 0
+    with EntornoApp(clientes=args.clientes, retraso_sheet=args.retraso_sheet,
+                    retraso_servidor=args.retraso_servidor) as entorno:
+        df_catalogo = catalogo.cargar_catalogo(catalogo.ARCHIVO_CATALOGO, catalogo.ARCHIVO_ACTUALIZACIONES)
+        # Snapshots del catálogo y de clientes ya compilados, como en un servidor que ya atendió a alguien
+        asyncio.run(_abrir_y_cerrar(entorno.cliente(con_perfil=False)))
+        print(f"Servidor: streamlit run en {entorno.url} (pid {entorno.servidor.pid})")
+        for sesiones in args.sesiones:
+            pedidos = [generar_pedido_pegado(df_catalogo, args.lineas, semilla=n) for n in range(sesiones)]
+            desde = os.path.getsize(entorno.log_perfil) if os.path.exists(entorno.log_perfil) else 0
+            base = memoria_mb(entorno.servidor.pid)
+            resultados, segundos, pico = asyncio.run(_correr_carga(entorno, pedidos))
+
+            acciones, errores = {}, []
+            for numero, resultado in enumerate(resultados):
+                if isinstance(resultado, Exception):
+                    errores.append(f"sesión {numero}: {type(resultado).__name__}: {resultado}")
+                    continue
+                for nombre, ms in resultado.items():
+                    acciones.setdefault(nombre, []).append(ms)
+            completos = sesiones - len(errores)
+            fallidos += len(errores)
+            total_acciones = sum(len(t) for t in acciones.values())
+            print(f"\n{sesiones} sesiones simultáneas en un solo servidor: {completos} escenarios en {segundos:.1f} s, "
+                  f"{completos / segundos:.2f} escenarios/s, {total_acciones / segundos:.1f} acciones/s, "
+                  f"{len(errores)} con error")
+            for error in errores[:5]:
+                print(f"  {error}")
+            print("Por acción (latencia en el cliente):")
+            for nombre, tiempos in acciones.items():
+                reportar_percentiles(f"  {nombre}", tiempos)
+            print("Por etapa del script (perfil del servidor):")
+            etapas = entorno.muestras_perfil(desde)
+            for etapa in ETAPAS_CARGA:
+                if etapas.get(etapa):
+                    reportar_percentiles(f"  {etapa}", etapas[etapa])
+            print(f"Memoria del servidor (PSS): {base:.0f} MB al empezar, pico {pico:.0f} MB, "
+                  f"{(pico - base) / sesiones:.1f} MB por sesión")
+    # Un escenario con error (una descarga perdida incluida) hace fallar la corrida
+    return 1 if fallidos else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("arranque", help="Tiempo de carga del catálogo en frío")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--repeticiones", type=int, default=10)
+    p.set_defaults(funcion=bench_arranque)
+
+    p = sub.add_parser("actualizaciones", help="Aplicar listas de precios de 100 a 50k filas")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--filas", type=int, nargs="+", default=[100, 1000, 5000, 10000, 50000])
+    p.add_argument("--max-por-fila", type=int, default=5000,
+                   help="Tope de filas para medir la versión por fila (es lenta)")
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.set_defaults(funcion=bench_actualizaciones)
+
+    p = sub.add_parser("busqueda", help="Latencia por consulta del buscador de productos")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--consultas", type=int, default=5000)
+    p.add_argument("--limite", type=int, default=25)
+    p.add_argument("--objetivo-p99", type=float, default=5.0)
+    p.set_defaults(funcion=bench_busqueda)
+
+    p = sub.add_parser("carga_rapida", help="Throughput del parser de pedidos pegados")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--lineas", type=int, nargs="+", default=[5, 100, 1000, 10000])
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.set_defaults(funcion=bench_carga_rapida)
+
+    p = sub.add_parser("pdf", help="Tiempo y tamaño del PDF con 1, 50 y 500 líneas")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--lineas", type=int, nargs="+", default=[1, 50, 500])
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.set_defaults(funcion=bench_pdf)
+
+    p = sub.add_parser("pdf_grande", help="Renderer paginado con cotizaciones de hasta 5,000 líneas")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--lineas", type=int, nargs="+", default=[100, 1000, 5000])
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(funcion=bench_pdf_grande)
+
+    p = sub.add_parser("pedidos", help="Buzón de pedidos contra un servidor local lento, intermitente o que rechaza")
+    p.add_argument("--escenario", choices=["normal", "lento", "intermitente", "rechazo"], default="intermitente")
+    p.add_argument("--pedidos", type=int, default=50)
+    p.add_argument("--retraso", type=float, default=2.0, help="Segundos por respuesta en el escenario lento")
+    p.add_argument("--timeout", type=float, default=pedidos.TIMEOUT_ENVIO)
+    p.add_argument("--max-intentos", type=int, default=pedidos.MAX_INTENTOS)
+    p.add_argument("--limite", type=float, default=120, help="Segundos máximos esperando la entrega")
+    p.set_defaults(funcion=bench_pedidos)
+
+    p = sub.add_parser("servidor", help="Sesión con pool y calentamiento contra un servidor local")
+    p.add_argument("--repeticiones", type=int, default=200)
+    p.add_argument("--retraso", type=float, default=0.0)
+    p.add_argument("--arranque", type=float, default=3.0, help="Segundos de arranque en frío simulado")
+    p.add_argument("--tiempo-armado", type=float, default=4.0, help="Segundos entre abrir la app y pedir")
+    p.set_defaults(funcion=bench_servidor)
+
+    p = sub.add_parser("clientes", help="Directorio de clientes contra un Sheet local con ETag")
+    p.add_argument("--clientes", type=int, default=4500)
+    p.add_argument("--retraso", type=float, default=0.5, help="Segundos que tarda el Sheet en responder")
+    p.add_argument("--ttl", type=float, default=1.0)
+    p.add_argument("--consultas", type=int, default=1000)
+    p.set_defaults(funcion=bench_clientes)
+
+    p = sub.add_parser("cotizacion", help="Rerun con DataFrame vs modelo incremental (10, 500 y 5,000 líneas)")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--lineas", type=int, nargs="+", default=[10, 500, 5000])
+    p.add_argument("--repeticiones", type=int, default=20)
+    p.set_defaults(funcion=bench_cotizacion)
+
+    p = sub.add_parser("listas", help="Motor de listas de precios sobre el catálogo y cotizaciones grandes")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--lineas", type=int, nargs="+", default=[500, 5000])
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.set_defaults(funcion=bench_listas)
+
+    p = sub.add_parser("recotizar", help="Recotizar el historial completo contra el catálogo vigente")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--cotizaciones", type=int, default=5000)
+    p.add_argument("--lineas", type=int, default=10)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(funcion=bench_recotizar)
+
+    p = sub.add_parser("ventas", help="Tablero de ventas desde los agregados vs recorrer el historial")
+    p.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    p.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    p.add_argument("--cotizaciones", type=int, default=10000)
+    p.add_argument("--lineas", type=int, default=20)
+    p.add_argument("--repeticiones", type=int, default=50)
+    p.set_defaults(funcion=bench_ventas)
+
+    p = sub.add_parser("perfil", help="Costo por llamada de la instrumentación apagada y encendida")
+    p.add_argument("--llamadas", type=int, default=200000)
+    p.set_defaults(funcion=bench_perfil)
+
+    p = sub.add_parser("secciones", help="Latencia por interacción contra streamlit run: rerun completo vs fragmento")
+    p.add_argument("--lineas", type=int, default=100, help="Líneas pegadas en la cotización")
+    p.add_argument("--repeticiones", type=int, default=10)
+    p.set_defaults(funcion=bench_secciones)
+
+    p = sub.add_parser("carga", help="Muchas pestañas a la vez contra un solo streamlit run con stubs locales")
+    p.add_argument("--sesiones", type=int, nargs="+", default=[30])
+    p.add_argument("--lineas", type=int, default=30, help="Líneas del pedido pegado en Carga Rápida")
+    p.add_argument("--clientes", type=int, default=4500)
+    p.add_argument("--retraso-sheet", type=float, default=0.5)
+    p.add_argument("--retraso-servidor", type=float, default=0.2)
+    p.set_defaults(funcion=bench_carga)
+
+    args = parser.parse_args()
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
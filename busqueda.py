@@ -0,0 +1,154 @@
+"""Búsqueda de productos del lado del servidor.
+
+Se construye una vez por versión del catálogo y responde consultas escritas
+con los N mejores resultados, para no mandar las ~16k opciones al navegador.
+
+- Índice invertido de tokens de `descripcion` (sin acentos, en minúsculas).
+  El vocabulario va ordenado y las listas de filas se guardan contiguas, así
+  que un prefijo ("desarm") se resuelve con un solo slice de numpy.
+- Índice de prefijos sobre `codigo` (lista ordenada + bisect).
+- Tolerancia a errores de dedo: distancia de edición 1 con un índice de
+  borrados (estilo SymSpell) para tokens de 4 letras o más.
+"""
+import bisect
+import re
+
+import numpy as np
+
+from texto import quitar_acentos
+
+PATRON_TOKEN = re.compile(r'[a-z0-9]+')
+LARGO_MIN_DIFUSO = 4
+
+# Peso de cada tipo de coincidencia; la cobertura (tokens encontrados) manda
+PESO_CODIGO_EXACTO = 6.0
+PESO_CODIGO_PREFIJO = 4.0
+PESO_EXACTO = 3.0
+PESO_PREFIJO = 2.0
+PESO_DIFUSO = 1.0
+PESO_COBERTURA = 10.0
+# "Martillo ..." antes que "Azadón ... y martillo"; a igualdad, la descripción más corta
+PESO_PRIMERA_PALABRA = 1.5
+PENALIZACION_LARGO = 0.01
+
+
+def tokenizar(texto):
+    return PATRON_TOKEN.findall(quitar_acentos(texto).lower())
+
+
+def _borrados(token):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class BuscadorProductos:
+    """Índices de búsqueda sobre la salida de `cargar_catalogo`."""
+
+    def __init__(self, df):
+        self.codigos = df['codigo'].tolist() if not df.empty else []
+        self.display = df['display'].tolist() if not df.empty else []
+        self.n = len(self.codigos)
+
+        postings = {}
+        primeros = []
+        largos_desc = []
+        for fila, descripcion in enumerate(df['descripcion'].tolist() if not df.empty else []):
+            tokens = tokenizar(descripcion)
+            primeros.append(tokens[0] if tokens else None)
+            largos_desc.append(len(tokens))
+            for token in set(tokens):
+                postings.setdefault(token, []).append(fila)
+
+        # Vocabulario ordenado con sus filas concatenadas en el mismo orden
+        self.vocabulario = sorted(postings)
+        self._posicion_token = {t: i for i, t in enumerate(self.vocabulario)}
+        largos = [len(postings[t]) for t in self.vocabulario]
+        self._offsets = np.zeros(len(self.vocabulario) + 1, dtype=np.int64)
+        np.cumsum(largos, out=self._offsets[1:])
+        self._filas = np.fromiter(
+            (f for t in self.vocabulario for f in postings[t]), dtype=np.int32, count=int(self._offsets[-1]))
+        self._primer_token = np.array(
+            [self._posicion_token[t] if t is not None else -1 for t in primeros], dtype=np.int32)
+        self._base = -PENALIZACION_LARGO * np.array(largos_desc, dtype=np.float32)
+
+        self._borrados = {}
+        for token in self.vocabulario:
+            if len(token) >= LARGO_MIN_DIFUSO:
+                for variante in _borrados(token):
+                    self._borrados.setdefault(variante, []).append(token)
+
+        orden = sorted(range(self.n), key=self.codigos.__getitem__)
+        self._codigos_ordenados = [self.codigos[i] for i in orden]
+        self._filas_codigo = np.array(orden, dtype=np.int32)
+
+    # --- Coincidencias por token ---
+
+    def _filas_de(self, inicio, fin):
+        return self._filas[self._offsets[inicio]:self._offsets[fin]]
+
+    def _rango_prefijo(self, token):
+        inicio = bisect.bisect_left(self.vocabulario, token)
+        fin = bisect.bisect_left(self.vocabulario, token + '\uffff', inicio)
+        return inicio, fin
+
+    def _vecinos_difusos(self, token):
+        """Tokens del vocabulario a distancia de edición 1 (aprox. por borrados)."""
+        candidatos = set(self._borrados.get(token, ()))
+        for variante in _borrados(token):
+            if variante in self._posicion_token and len(variante) >= LARGO_MIN_DIFUSO:
+                candidatos.add(variante)
+            candidatos.update(self._borrados.get(variante, ()))
+        candidatos.discard(token)
+        return candidatos
+
+    def _pesos_token(self, token):
+        pesos = np.zeros(self.n, dtype=np.float32)
+
+        inicio, fin = self._rango_prefijo(token)
+        if inicio < fin:
+            pesos[self._filas_de(inicio, fin)] = PESO_PREFIJO
+            if self.vocabulario[inicio] == token:
+                pesos[self._filas_de(inicio, inicio + 1)] = PESO_EXACTO
+            pesos += ((self._primer_token >= inicio) & (self._primer_token < fin)) * PESO_PRIMERA_PALABRA
+        elif len(token) >= LARGO_MIN_DIFUSO:
+            for vecino in self._vecinos_difusos(token):
+                posicion = self._posicion_token[vecino]
+                filas = self._filas_de(posicion, posicion + 1)
+                pesos[filas] = np.maximum(pesos[filas], PESO_DIFUSO)
+                pesos += (self._primer_token == posicion) * PESO_PRIMERA_PALABRA
+
+        if token.isdigit():
+            i = bisect.bisect_left(self._codigos_ordenados, token)
+            j = bisect.bisect_left(self._codigos_ordenados, token + '\uffff', i)
+            if i < j:
+                filas = self._filas_codigo[i:j]
+                pesos[filas] = np.maximum(pesos[filas], PESO_CODIGO_PREFIJO)
+                if self._codigos_ordenados[i] == token:
+                    pesos[self._filas_codigo[i]] = PESO_CODIGO_EXACTO
+        return pesos
+
+    # --- API ---
+
+    def buscar(self, consulta, limite=20):
+        """Posiciones de las `limite` mejores filas para la consulta."""
+        tokens = list(dict.fromkeys(tokenizar(consulta)))
+        if not tokens or self.n == 0:
+            return []
+        puntaje = self._base.copy()
+        encontrados = np.zeros(self.n, dtype=bool)
+        for token in tokens:
+            pesos = self._pesos_token(token)
+            puntaje += pesos
+            puntaje += (pesos > 0) * PESO_COBERTURA
+            encontrados |= pesos > 0
+
+        candidatos = np.flatnonzero(encontrados)
+        if len(candidatos) > limite:
+            mejores = np.argpartition(-puntaje[candidatos], limite - 1)[:limite]
+            candidatos = candidatos[mejores]
+        # Mayor puntaje primero; a igual puntaje, el orden del catálogo
+        orden = np.lexsort((candidatos, -puntaje[candidatos]))
+        return candidatos[orden].tolist()
+
+    def buscar_display(self, consulta, limite=20):
+        """Igual que `buscar`, pero regresa los textos para el selectbox."""
+        return [self.display[i] for i in self.buscar(consulta, limite)]
@@ -0,0 +1,57 @@
+"""Parser por lotes para la "Carga Rápida" (pegar líneas de código y cantidad).
+
+Todo el texto pegado se recorre con una sola expresión regular multilínea, así
+que una exportación de Excel con miles de renglones se procesa en una pasada.
+Los códigos repetidos se suman, y lo que no se pudo cargar se reporta en vez de
+descartarse en silencio.
+"""
+import re
+
+# Igual que el patrón por línea de antes: primer número de 4-6 dígitos es el
+# código y el siguiente de 1-3 dígitos la cantidad. Las líneas que no cumplen
+# igual hacen match (grupos vacíos) para poder reportarlas.
+PATRON_LINEA = re.compile(r'^(?:[^\d\n]*(\d{4,6})[^\d\n]*(\d{1,3}))?[^\n]*', re.M)
+
+
+def analizar_pedido(texto_pedido, mapa_codigos):
+    """Parsea un pedido pegado contra el mapa codigo -> (descripcion, precio).
+
+    Regresa un dict con:
+      productos     lista de renglones para la cotización (códigos ya sumados)
+      desconocidos  {codigo: cantidad} de códigos que no están en el catálogo
+      malformadas   líneas sin código/cantidad reconocibles
+      lineas        líneas no vacías procesadas
+    """
+    cantidades = {}
+    malformadas = []
+    lineas = 0
+    for match in PATRON_LINEA.finditer(texto_pedido):
+        codigo = match.group(1)
+        if codigo is None:
+            linea = match.group(0).strip()
+            if linea:
+                lineas += 1
+                malformadas.append(linea)
+            continue
+        lineas += 1
+        cantidades[codigo] = cantidades.get(codigo, 0) + int(match.group(2))
+
+    productos = []
+    desconocidos = {}
+    for codigo, cantidad in cantidades.items():
+        info = mapa_codigos.get(codigo)
+        if info is None:
+            desconocidos[codigo] = cantidad
+            continue
+        descripcion, precio = info
+        productos.append({
+            'codigo': codigo, 'descripcion': descripcion,
+            'cantidad': cantidad, 'precio_base': float(precio)
+        })
+
+    return {
+        'productos': productos,
+        'desconocidos': desconocidos,
+        'malformadas': malformadas,
+        'lineas': lineas,
+    }
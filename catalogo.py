@@ -0,0 +1,351 @@
+"""Carga del catálogo de productos y su snapshot compilado en disco.
+
+El catálogo en texto (~16k líneas) más `precios_actualizados.txt` se compilan a
+un archivo Arrow IPC sin compresión. Ese archivo se abre con memory-map, así que
+un proceso nuevo no vuelve a parsear el texto mientras las fuentes no cambien.
+
+Uso como paso de build:  python catalogo.py [catalogo.txt] [actualizaciones.txt]
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+import indices
+
+ARCHIVO_CATALOGO = "CATALAGO 25 TRUP PRUEBA COTIZADOR.txt"
+ARCHIVO_ACTUALIZACIONES = "precios_actualizados.txt"
+DIR_SNAPSHOT = ".cache_catalogo"
+VERSION_SNAPSHOT = 2
+
+COLUMNAS = ['codigo', 'descripcion', 'precio']
+
+
+def parsear_lineas_precios(lineas):
+    """Parseo vectorizado de líneas `codigo,descripcion,precio`.
+
+    La descripción puede traer comas: el código es lo que va antes de la
+    primera coma y el precio lo que va después de la última. Las líneas con
+    menos de tres campos o con precio inválido se descartan.
+    """
+    s = pd.Series(lineas, dtype=str).str.strip()
+    s = s[s.str.count(',') >= 2]
+    if s.empty:
+        return pd.DataFrame({'codigo': pd.Series(dtype=str), 'descripcion': pd.Series(dtype=str),
+                             'precio': pd.Series(dtype=float)})
+    cabeza = s.str.partition(',')
+    cola = cabeza[2].str.rpartition(',')
+    df = pd.DataFrame({
+        'codigo': cabeza[0].str.strip(),
+        'descripcion': cola[0].str.strip(),
+        'precio': pd.to_numeric(cola[2].str.strip(), errors='coerce'),
+    })
+    return df[df['precio'].notna()].reset_index(drop=True)
+
+
+def leer_archivo_precios(nombre_archivo):
+    """Lee un archivo de catálogo o de actualizaciones en una sola pasada."""
+    with open(nombre_archivo, 'r', encoding='utf-8') as f:
+        return parsear_lineas_precios(f.read().splitlines())
+
+
+def aplicar_actualizaciones(df_base, df_act):
+    """Upsert vectorizado de precios sobre el catálogo.
+
+    Actualiza los códigos existentes, agrega los nuevos al final (en el orden en
+    que aparecen) y, si un código se repite, gana la última línea. Regresa el
+    catálogo resultante y un resumen con cuántos códigos cambiaron, se
+    agregaron o quedaron igual.
+    """
+    act = df_act.groupby('codigo', sort=False)[['descripcion', 'precio']].last().reset_index()
+    base = df_base[COLUMNAS]
+
+    combinado = base.merge(act, on='codigo', how='left', suffixes=('', '_nuevo'))
+    tiene_act = combinado['precio_nuevo'].notna()
+    distinto = (combinado['descripcion'] != combinado['descripcion_nuevo']) | (combinado['precio'] != combinado['precio_nuevo'])
+    cambiados = combinado.loc[tiene_act & distinto, 'codigo'].nunique()
+
+    combinado['descripcion'] = combinado['descripcion_nuevo'].where(tiene_act, combinado['descripcion'])
+    combinado['precio'] = combinado['precio_nuevo'].where(tiene_act, combinado['precio'])
+
+    # get_indexer sobre un Index hash es mucho más rápido que isin con strings Arrow
+    en_base = pd.Index(base['codigo'].unique()).get_indexer(act['codigo']) >= 0
+    nuevos = act[~en_base]
+    df = pd.concat([combinado[COLUMNAS], nuevos[COLUMNAS]], ignore_index=True)
+
+    resumen = {
+        'cambiados': int(cambiados),
+        'agregados': len(nuevos),
+        'sin_cambio': len(act) - len(nuevos) - int(cambiados),
+    }
+    return df, resumen
+
+
+def parsear_catalogo(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
+    """Parseo en texto de ambas fuentes (el camino sin snapshot).
+
+    El resumen de la actualización queda en `df.attrs['actualizaciones']`.
+    """
+    try:
+        df = leer_archivo_precios(nombre_archivo_catalogo)
+    except FileNotFoundError:
+        return pd.DataFrame()
+    if df.empty: return pd.DataFrame(columns=['codigo', 'descripcion', 'precio'])
+
+    resumen = {'cambiados': 0, 'agregados': 0, 'sin_cambio': 0}
+    try:
+        df, resumen = aplicar_actualizaciones(df, leer_archivo_precios(nombre_archivo_actualizaciones))
+    except FileNotFoundError: pass
+
+    df['display'] = df['codigo'] + " - " + df['descripcion']
+    df.attrs['actualizaciones'] = resumen
+    return df
+
+
+def mapa_codigos(df):
+    """codigo -> (descripcion, precio), para parsear pedidos pegados."""
+    if df.empty: return {}
+    return dict(zip(df['codigo'].tolist(), zip(df['descripcion'].tolist(), df['precio'].tolist())))
+
+
+# --- SNAPSHOT COMPILADO ---
+
+def firma_fuentes(*rutas):
+    """mtime y tamaño de cada archivo fuente; None si no existe."""
+    firma = {}
+    for ruta in rutas:
+        try:
+            info = os.stat(ruta)
+            firma[os.path.abspath(ruta)] = [info.st_mtime_ns, info.st_size]
+        except FileNotFoundError:
+            firma[os.path.abspath(ruta)] = None
+    return {'version': VERSION_SNAPSHOT, 'fuentes': firma}
+
+
+def ruta_snapshot(firma, dir_snapshot=DIR_SNAPSHOT):
+    """Un snapshot por combinación de fuentes (p.ej. catálogo solo vs con actualizaciones)."""
+    clave = hashlib.sha1("|".join(firma['fuentes']).encode('utf-8')).hexdigest()[:10]
+    return os.path.join(dir_snapshot, f"catalogo-{clave}.arrow")
+
+
+def compilar_snapshot(nombre_archivo_catalogo, nombre_archivo_actualizaciones, dir_snapshot=DIR_SNAPSHOT):
+    """Parsea las fuentes y escribe el snapshot Arrow. Regresa el DataFrame."""
+    firma = firma_fuentes(nombre_archivo_catalogo, nombre_archivo_actualizaciones)
+    df = parsear_catalogo(nombre_archivo_catalogo, nombre_archivo_actualizaciones)
+    if df.empty:
+        return df
+
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({
+        b'firma': json.dumps(firma).encode('utf-8'),
+        b'actualizaciones': json.dumps(df.attrs.get('actualizaciones', {})).encode('utf-8'),
+    })
+
+    destino = ruta_snapshot(firma, dir_snapshot)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(dir_snapshot, exist_ok=True)
+        with pa.OSFile(temporal, 'wb') as sink:
+            with pa.ipc.new_file(sink, tabla.schema) as writer:
+                writer.write_table(tabla)
+        # Reemplazo atómico: otro proceso nunca ve un snapshot a medias
+        os.replace(temporal, destino)
+    except OSError:
+        # Disco de solo lectura o similar: seguimos con el DataFrame en memoria
+        if os.path.exists(temporal): os.remove(temporal)
+    return df
+
+
+def leer_snapshot(firma, dir_snapshot=DIR_SNAPSHOT):
+    """Abre el snapshot con memory-map si su firma coincide; si no, None."""
+    try:
+        lector = pa.ipc.open_file(pa.memory_map(ruta_snapshot(firma, dir_snapshot), 'r'))
+        metadata = lector.schema.metadata or {}
+        if json.loads(metadata.get(b'firma', b'null')) != firma:
+            return None
+        df = lector.read_all().to_pandas()
+        df.attrs['actualizaciones'] = json.loads(metadata.get(b'actualizaciones', b'{}'))
+        return df
+    except (OSError, pa.ArrowInvalid, ValueError):
+        return None
+
+
+def cargar_catalogo(nombre_archivo_catalogo, nombre_archivo_actualizaciones, dir_snapshot=DIR_SNAPSHOT):
+    """Catálogo desde el snapshot; lo recompila sólo si cambiaron las fuentes."""
+    firma = firma_fuentes(nombre_archivo_catalogo, nombre_archivo_actualizaciones)
+    df = leer_snapshot(firma, dir_snapshot)
+    if df is not None:
+        return df
+    return compilar_snapshot(nombre_archivo_catalogo, nombre_archivo_actualizaciones, dir_snapshot)
+
+
+# --- RECARGA INCREMENTAL ---
+
+class CatalogoIncremental:
+    """Catálogo compartido entre sesiones que sigue los cambios de las actualizaciones.
+
+    Guarda el catálogo base (sin actualizaciones), lo que ya se aplicó del
+    archivo de actualizaciones y hasta qué byte se leyó. Si el archivo sólo
+    creció, se parsean las líneas nuevas; si se editó, se aplica únicamente la
+    diferencia contra lo anterior. El catálogo base sólo se relee si cambia su
+    propio archivo.
+
+    Cada catálogo nuevo se arma aparte y se publica junto con su versión en una
+    sola asignación: una sesión nunca ve un DataFrame a medio aplicar ni una
+    versión que no le corresponde.
+    """
+
+    def __init__(self, nombre_archivo_catalogo, nombre_archivo_actualizaciones, dir_snapshot=DIR_SNAPSHOT):
+        self.nombre_archivo_catalogo = nombre_archivo_catalogo
+        self.nombre_archivo_actualizaciones = nombre_archivo_actualizaciones
+        self.dir_snapshot = dir_snapshot
+        self._vigente = (0, pd.DataFrame())
+        self._derivados = indices.DerivadosPorVersion(lambda: self._vigente)
+        self._lock = threading.Lock()
+        self._recargar_todo()
+
+    @property
+    def df(self):
+        return self._vigente[1]
+
+    @property
+    def version(self):
+        return self._vigente[0]
+
+    def _publicar(self, df):
+        self._vigente = (self.version + 1, df)
+
+    def _recargar_todo(self):
+        self._firma_catalogo = _estado_archivo(self.nombre_archivo_catalogo)
+        base = cargar_catalogo(self.nombre_archivo_catalogo, "", self.dir_snapshot)
+        if not base.empty:
+            base = base[COLUMNAS]
+        self._base = base
+        self._aplicadas = {}
+        self._offset = 0
+        self._hash_leido = hashlib.sha1()
+        self._firma_act = None
+        self._parcial = False
+        df = base.copy()
+        if not df.empty:
+            df['display'] = df['codigo'] + " - " + df['descripcion']
+        self._publicar(self._leer_actualizaciones(df))
+
+    def derivado(self, nombre, constructor):
+        """Estructura construida con `constructor(df)`, recalculada sólo cuando cambia la versión."""
+        return self._derivados.obtener(nombre, constructor)
+
+    def refrescar(self):
+        """Regresa el catálogo vigente, aplicando antes lo que haya cambiado.
+
+        Si otra sesión ya está aplicando cambios no se espera: se regresa el
+        catálogo anterior y la siguiente ejecución verá el nuevo.
+        """
+        if (_estado_archivo(self.nombre_archivo_actualizaciones) == self._firma_act
+                and _estado_archivo(self.nombre_archivo_catalogo) == self._firma_catalogo):
+            return self.df
+        if not self._lock.acquire(blocking=False):
+            return self.df
+        try:
+            if _estado_archivo(self.nombre_archivo_catalogo) != self._firma_catalogo:
+                self._recargar_todo()
+            else:
+                df = self._leer_actualizaciones(self.df)
+                if df is not self.df:
+                    self._publicar(df)
+        finally:
+            self._lock.release()
+        return self.df
+
+    def _leer_actualizaciones(self, df):
+        """Aplica a `df` lo que cambió en las actualizaciones; regresa el mismo `df` si no hubo cambios."""
+        self._firma_act = _estado_archivo(self.nombre_archivo_actualizaciones)
+        if self._base.empty:
+            return df
+        try:
+            with open(self.nombre_archivo_actualizaciones, 'rb') as f:
+                datos = f.read()
+        except FileNotFoundError:
+            datos = b""
+
+        # Si la vez anterior el archivo terminaba sin salto de línea, esa última línea ya se aplicó
+        # pero pudo cambiar o desaparecer: se diferencia todo el archivo
+        if (not self._parcial and len(datos) >= self._offset
+                and hashlib.sha1(datos[:self._offset]).digest() == self._hash_leido.digest()):
+            # Sólo se agregaron líneas al final
+            nuevas = self._lineas_completas(datos, self._offset)
+            df_act = parsear_lineas_precios(nuevas.decode('utf-8').splitlines())
+            cambios = df_act.groupby('codigo', sort=False)[['descripcion', 'precio']].last().reset_index()
+            removidos = []
+        else:
+            # Se editó o recortó el archivo: diferencia contra lo ya aplicado
+            self._offset = 0
+            self._hash_leido = hashlib.sha1()
+            completas = self._lineas_completas(datos, 0)
+            df_act = parsear_lineas_precios(completas.decode('utf-8').splitlines())
+            vigentes = df_act.groupby('codigo', sort=False)[['descripcion', 'precio']].last().reset_index()
+            previas = pd.DataFrame(
+                [(c, d, p) for c, (d, p) in self._aplicadas.items()], columns=COLUMNAS)
+            comparado = vigentes.merge(previas, on='codigo', how='left', suffixes=('', '_previo'))
+            distinto = (comparado['descripcion'] != comparado['descripcion_previo']) | (comparado['precio'] != comparado['precio_previo'])
+            cambios = comparado.loc[distinto, COLUMNAS]
+            codigos_vigentes = set(vigentes['codigo'])
+            removidos = [c for c in self._aplicadas if c not in codigos_vigentes]
+            self._aplicadas = {}
+
+        for codigo, descripcion, precio in df_act[COLUMNAS].itertuples(index=False):
+            self._aplicadas[codigo] = (descripcion, precio)
+        if cambios.empty and not removidos:
+            return df
+        return self._aplicar(df, cambios, removidos)
+
+    def _lineas_completas(self, datos, desde):
+        """Bytes desde `desde` hasta el final, incluida una última línea sin salto (como en `parsear_catalogo`).
+
+        El offset y el hash sólo avanzan hasta la última línea terminada; la que
+        queda sin salto se marca para diferenciar todo en la siguiente lectura.
+        """
+        fin = len(datos) if datos.endswith(b"\n") else datos.rfind(b"\n", desde) + 1
+        fin = max(fin, desde)
+        self._hash_leido.update(datos[desde:fin])
+        self._offset = fin
+        self._parcial = fin < len(datos)
+        return datos[desde:]
+
+    def _aplicar(self, df, cambios, removidos):
+        df = df[COLUMNAS]
+        resumen = {'cambiados': 0, 'agregados': 0, 'sin_cambio': 0, 'revertidos': len(removidos)}
+        if removidos:
+            # Un código que ya no está en actualizaciones vuelve a su valor base (o desaparece si era nuevo)
+            en_base = self._base[self._base['codigo'].isin(removidos)]
+            df = df[~(df['codigo'].isin(removidos) & ~df['codigo'].isin(en_base['codigo']))]
+            df, _ = aplicar_actualizaciones(df, en_base)
+        if not cambios.empty:
+            df, parcial = aplicar_actualizaciones(df, cambios)
+            resumen.update(parcial)
+        df['display'] = df['codigo'] + " - " + df['descripcion']
+        df.attrs['actualizaciones'] = resumen
+        return df
+
+
+def _estado_archivo(ruta):
+    try:
+        info = os.stat(ruta)
+        return (info.st_mtime_ns, info.st_size)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    ruta_cat = args[0] if len(args) > 0 else ARCHIVO_CATALOGO
+    ruta_act = args[1] if len(args) > 1 else ARCHIVO_ACTUALIZACIONES
+    df = compilar_snapshot(ruta_cat, ruta_act)
+    print(f"Snapshot compilado: {len(df)} productos -> {ruta_snapshot(firma_fuentes(ruta_cat, ruta_act))}")
+    resumen = df.attrs.get('actualizaciones', {})
+    print(f"Actualizaciones: {resumen.get('cambiados', 0)} cambiados, "
+          f"{resumen.get('agregados', 0)} agregados, {resumen.get('sin_cambio', 0)} sin cambio")
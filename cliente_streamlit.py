@@ -0,0 +1,163 @@
+"""Cliente de websocket que maneja `streamlit run app.py` como lo hace el navegador.
+
+Lo usan los benchmarks que corren la app completa (`secciones` y `carga`): cada
+`ClienteApp` es una pestaña que manda los reruns con los mismos BackMsg que el
+frontend y lee los ForwardMsg de regreso, así que las corridas de fragmentos,
+los st.rerun() y las descargas pasan por el servidor real.
+
+No es una API pública de Streamlit: reproduce su protocolo interno (ClientState,
+WidgetStates, deltas y backend_operation_request) tal como está en Streamlit
+1.65. Con otra versión avisa al crear el cliente; si algo deja de funcionar hay
+que revisar esos mensajes contra `streamlit/proto` y `runtime/app_session.py`.
+"""
+import asyncio
+import time
+import uuid
+import warnings
+
+import requests
+import streamlit
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.runtime.state.common import user_key_from_element_id
+from websockets.asyncio.client import connect
+
+VERSION_STREAMLIT = "1.65"
+
+
+class ClienteApp:
+    """Una pestaña del navegador: manda los reruns por el websocket de Streamlit como el frontend.
+
+    Guarda los elementos pintados por ruta (la corrida de un fragmento sólo
+    reemplaza los suyos) y el último valor de cada widget, que se reenvía en cada
+    rerun. Cada interacción regresa los ms desde que se manda hasta que termina la
+    última corrida que provocó; un fragmento que pide st.rerun() son dos corridas
+    y `corridas` las cuenta.
+    """
+
+    def __init__(self, url, query_string=""):
+        if not streamlit.__version__.startswith(VERSION_STREAMLIT + "."):
+            warnings.warn(f"ClienteApp está escrito para Streamlit {VERSION_STREAMLIT}; "
+                          f"con {streamlit.__version__} el protocolo puede haber cambiado")
+        self.url = url
+        self.query_string = query_string
+        self.elementos = {}  # ruta -> (id del fragmento, tipo, proto)
+        self.valores = {}  # id del widget -> WidgetState
+        self.corridas = 0
+        self.id_sesion = ""
+        self._pagina = ""
+        self._repintados = set()
+        self._respuestas = {}
+
+    async def conectar(self):
+        inicio = time.perf_counter()
+        self.ws = await connect(f"ws{self.url[4:]}/_stcore/stream", subprotocols=["streamlit"], max_size=None,
+                                proxy=None, open_timeout=60, ping_interval=None)
+        await self.rerun()
+        return (time.perf_counter() - inicio) * 1000
+
+    async def cerrar(self):
+        await self.ws.close()
+
+    def widget(self, tipo, etiqueta=None, clave=None):
+        """(proto, id del fragmento) del primer widget `tipo` con esa etiqueta o clave."""
+        for ruta in sorted(self.elementos):
+            fragmento, tipo_elemento, proto = self.elementos[ruta]
+            if tipo_elemento == tipo and etiqueta in (None, proto.label) \
+                    and clave in (None, user_key_from_element_id(proto.id)):
+                return proto, fragmento
+        raise LookupError(f"No hay {tipo} {etiqueta or clave!r} en la página")
+
+    def contar(self, tipo, etiqueta):
+        return sum(1 for _, t, proto in self.elementos.values() if t == tipo and proto.label == etiqueta)
+
+    async def escribir(self, valor, etiqueta=None, clave=None, tipo='text_input', completo=False):
+        proto, fragmento = self.widget(tipo, etiqueta, clave)
+        return await self.rerun(_estado_widget(proto.id, string_value=valor), fragmento=None if completo else fragmento)
+
+    async def elegir(self, opcion, etiqueta=None, clave=None, tipo='selectbox', completo=False):
+        return await self.escribir(opcion, etiqueta, clave, tipo, completo)
+
+    async def clic(self, etiqueta, completo=False):
+        proto, fragmento = self.widget('button', etiqueta)
+        return await self.rerun(_estado_widget(proto.id, trigger_value=True), fragmento=None if completo else fragmento)
+
+    async def rerun(self, *cambios, fragmento=None):
+        """Manda un rerun con `cambios` (WidgetState) y espera a que termine; sin fragmento corre todo el script."""
+        disparos = [c for c in cambios if c.WhichOneof('value') == 'trigger_value']
+        self.valores.update((c.id, c) for c in cambios if c.WhichOneof('value') != 'trigger_value')
+        pintados = {proto.id for _, _, proto in self.elementos.values() if getattr(proto, 'id', '')}
+        mensaje = BackMsg()
+        estado = mensaje.rerun_script
+        estado.query_string = self.query_string
+        estado.page_script_hash = self._pagina
+        estado.fragment_id = fragmento or ""
+        # Como el frontend: el valor de todos los widgets en pantalla más el botón presionado
+        estado.widget_states.widgets.extend(v for i, v in self.valores.items() if i in pintados)
+        estado.widget_states.widgets.extend(disparos)
+        inicio = time.perf_counter()
+        self.corridas = 0
+        await self.ws.send(mensaje.SerializeToString())
+        while not await self._recibir():
+            pass
+        ms = (time.perf_counter() - inicio) * 1000
+        errores = [proto.message for _, tipo, proto in self.elementos.values() if tipo == 'exception']
+        if errores:
+            raise RuntimeError(errores[0])
+        return ms
+
+    async def descargar(self, etiqueta):
+        """Presiona un download_button: pide el archivo diferido al servidor y lo baja por HTTP."""
+        proto, _ = self.widget('download_button', etiqueta)
+        inicio = time.perf_counter()
+        url = proto.url
+        if proto.deferred_file_id:
+            mensaje = BackMsg()
+            peticion = mensaje.backend_operation_request
+            peticion.request_id = uuid.uuid4().hex
+            peticion.session_id = self.id_sesion
+            peticion.deferred_file.file_id = proto.deferred_file_id
+            await self.ws.send(mensaje.SerializeToString())
+            while peticion.request_id not in self._respuestas:
+                await self._recibir()
+            respuesta = self._respuestas.pop(peticion.request_id)
+            if respuesta.error_msg:
+                raise RuntimeError(respuesta.error_msg)
+            url = respuesta.deferred_file.url
+        archivo = await asyncio.to_thread(requests.get, f"{self.url}/{url.lstrip('/')}", timeout=120)
+        archivo.raise_for_status()
+        return (time.perf_counter() - inicio) * 1000
+
+    async def _recibir(self):
+        """Procesa un ForwardMsg; True cuando terminó la última corrida del rerun."""
+        mensaje = ForwardMsg.FromString(await self.ws.recv())
+        tipo = mensaje.WhichOneof('type')
+        if tipo == 'new_session':
+            sesion = mensaje.new_session
+            self.corridas += 1
+            self._pagina = sesion.page_script_hash
+            if sesion.initialize.session_id:
+                self.id_sesion = sesion.initialize.session_id
+            if not sesion.fragment_ids_this_run:
+                self.elementos.clear()
+            self._repintados = set()
+        elif tipo == 'delta' and mensaje.delta.WhichOneof('type') == 'new_element':
+            fragmento = mensaje.delta.fragment_id
+            if fragmento and fragmento not in self._repintados:
+                # El fragmento se vuelve a pintar completo: se descarta lo que pintó antes
+                self._repintados.add(fragmento)
+                self.elementos = {r: e for r, e in self.elementos.items() if e[0] != fragmento}
+            elemento = mensaje.delta.new_element
+            tipo_elemento = elemento.WhichOneof('type')
+            self.elementos[tuple(mensaje.metadata.delta_path)] = (fragmento, tipo_elemento,
+                                                                  getattr(elemento, tipo_elemento))
+        elif tipo == 'backend_operation_response':
+            self._respuestas[mensaje.backend_operation_response.request_id] = mensaje.backend_operation_response
+        elif tipo == 'script_finished':
+            return mensaje.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN
+        return False
+
+
+def _estado_widget(id_widget, **valor):
+    return WidgetState(id=id_widget, **valor)
@@ -0,0 +1,253 @@
+"""Directorio de clientes: Google Sheet con snapshot local y refresco en segundo plano.
+
+Se sirve siempre la última versión buena sin esperar a la red
+(stale-while-revalidate). Cuando vence el TTL, la siguiente consulta lanza la
+revalidación en un hilo y sigue regresando lo que ya tenía. La descarga es
+condicional (ETag / Last-Modified): si el Sheet no cambió, Google responde
+304 y no se baja ni se reparsea nada.
+
+Cada descarga buena se guarda en `.cache_clientes/`, así que un arranque en
+frío lee el snapshot local en lugar de esperar al Sheet. `clientes.txt` queda
+sólo como último respaldo si nunca se ha podido descargar.
+"""
+import io
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import requests
+
+import busqueda
+import indices
+
+# CLIENTES_SHEET_URL permite apuntar a un servidor local para pruebas
+URL_CLIENTES_SHEET = os.environ.get(
+    "CLIENTES_SHEET_URL",
+    "https://docs.google.com/spreadsheets/d/e/2PACX-1vTxPh4_poWxwC63UWWeczmFn-iAItg6UYnrZjtzBHcz-7SRs550_0pqwRHS8LCvu3PYe7oLgmn1IKoz/pub?gid=0&single=true&output=csv")
+ARCHIVO_CLIENTES = "clientes.txt"
+DIR_SNAPSHOT = ".cache_clientes"
+TTL_CLIENTES = 600
+# Tras un error no se reintenta en cada rerun, sino pasado este tiempo
+REINTENTO_ERROR = 60
+TIMEOUT_SHEET = 30
+
+COLUMNAS = ['cve', 'cve_age', 'nombre', 'display']
+CLAVES_INDICE = ['display', 'cve']
+LIMITE_OPCIONES = 25
+
+
+def normalizar_sheet(df):
+    """Columnas del Sheet -> cve, cve_age, nombre, display."""
+    df = df.fillna("").rename(columns={
+        'ID Vendedor': 'cve_age',
+        'ID Cliente': 'cve',
+        'Nombre Cliente ': 'nombre'
+    })
+    df = df[df['cve'].str.strip() != ""].copy()
+    df['cve'] = df['cve'].str.strip()
+    df['cve_age'] = df['cve_age'].str.strip()
+    df['nombre'] = df['nombre'].str.strip()
+    df['display'] = df['cve'] + " - " + df['nombre'] + " (Vend: " + df['cve_age'] + ")"
+    return df[COLUMNAS].reset_index(drop=True)
+
+
+def leer_csv_sheet(contenido):
+    """Bytes del CSV publicado -> DataFrame normalizado."""
+    return normalizar_sheet(pd.read_csv(io.BytesIO(contenido), dtype=str))
+
+
+def leer_archivo_clientes(nombre_archivo_clientes):
+    """Respaldo local `cve,cve_age,nombre` (el nombre puede llevar comas)."""
+    clientes = []
+    try:
+        with open(nombre_archivo_clientes, 'r', encoding='utf-8') as f:
+            for line in f:
+                partes = line.strip().split(',', 2)
+                if len(partes) >= 3:
+                    cve = partes[0].strip()
+                    cve_age = partes[1].strip()
+                    nombre = partes[2].strip()
+                    display = f"{cve} - {nombre} (Vend: {cve_age})"
+                    clientes.append({'cve': cve, 'cve_age': cve_age, 'nombre': nombre, 'display': display})
+    except FileNotFoundError:
+        return pd.DataFrame()
+    return pd.DataFrame(clientes)
+
+
+class IndiceClientes:
+    """Particiones por vendedor y búsqueda por nombre/clave, armadas una vez por versión.
+
+    Así el filtro "Clave Vendedor" es un lookup de dict y el selectbox recibe
+    sólo la lista del vendedor o los mejores resultados de la búsqueda, no los
+    ~4.5k clientes.
+    """
+
+    def __init__(self, tabla):
+        df = tabla.df
+        if df.empty:
+            self.por_vendedor = {}
+            self._vendedor_de_fila = []
+            self.buscador = busqueda.BuscadorProductos(pd.DataFrame(columns=['codigo', 'descripcion', 'display']))
+            return
+        self.por_vendedor = {cve_age: tuple(displays)
+                             for cve_age, displays in df.groupby('cve_age', sort=False)['display']}
+        self._vendedor_de_fila = df['cve_age'].tolist()
+        # El mismo buscador de productos: `cve` hace de código y `nombre` de descripción
+        self.buscador = busqueda.BuscadorProductos(
+            df[['cve', 'nombre', 'display']].rename(columns={'cve': 'codigo', 'nombre': 'descripcion'}))
+
+    def opciones(self, vendedor="", consulta="", limite=LIMITE_OPCIONES):
+        """Displays para el selectbox: la partición del vendedor, filtrada por la consulta si hay."""
+        vendedor = str(vendedor).strip()
+        if not consulta:
+            return list(self.por_vendedor.get(vendedor, ())) if vendedor else []
+        if not vendedor:
+            return self.buscador.buscar_display(consulta, limite)
+        posiciones = self.buscador.buscar(consulta, self.buscador.n)
+        return [self.buscador.display[i] for i in posiciones if self._vendedor_de_fila[i] == vendedor][:limite]
+
+
+class DirectorioClientes:
+    """Tabla de clientes compartida entre sesiones, revalidada en segundo plano.
+
+    `origen` dice de dónde salió la tabla vigente: 'sheet', 'snapshot',
+    'archivo' (clientes.txt) o None si no hubo nada. `version` sube cada vez
+    que cambia la tabla, para recalcular lo que se derive de ella.
+    """
+
+    def __init__(self, url=URL_CLIENTES_SHEET, archivo_respaldo=ARCHIVO_CLIENTES, dir_snapshot=DIR_SNAPSHOT,
+                 ttl=TTL_CLIENTES, sesion=None):
+        self.url = url
+        self.archivo_respaldo = archivo_respaldo
+        self.dir_snapshot = dir_snapshot
+        self.ttl = ttl
+        self.sesion = sesion or requests.Session()
+        self._vigente = (0, indices.TablaIndexada(pd.DataFrame(columns=COLUMNAS), CLAVES_INDICE))
+        self.origen = None
+        self.ultimo_error = None
+        self.validado_en = 0.0
+        self._etag = None
+        self._ultima_modificacion = None
+        self._derivados = indices.DerivadosPorVersion(lambda: self._vigente)
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._arrancar()
+
+    @property
+    def tabla(self):
+        return self._vigente[1]
+
+    @property
+    def version(self):
+        return self._vigente[0]
+
+    @property
+    def ruta_csv(self):
+        return os.path.join(self.dir_snapshot, "clientes.csv")
+
+    @property
+    def ruta_meta(self):
+        return os.path.join(self.dir_snapshot, "clientes.json")
+
+    def _arrancar(self):
+        if self._leer_snapshot():
+            return
+        # Sin snapshot no hay nada que servir mientras tanto: se espera la descarga
+        with self._lock:
+            self._revalidar()
+        if self.origen is None:
+            df = leer_archivo_clientes(self.archivo_respaldo)
+            if not df.empty:
+                self._publicar(df, 'archivo')
+
+    def _leer_snapshot(self):
+        try:
+            with open(self.ruta_meta, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(self.ruta_csv, 'rb') as f:
+                df = leer_csv_sheet(f.read())
+        except (OSError, ValueError, KeyError):
+            return False
+        if meta.get('url') != self.url or df.empty:
+            return False
+        self._etag = meta.get('etag')
+        self._ultima_modificacion = meta.get('last_modified')
+        self.validado_en = meta.get('validado_en', 0.0)
+        self._publicar(df, 'snapshot')
+        return True
+
+    def _guardar_meta(self):
+        meta = {'url': self.url, 'etag': self._etag, 'last_modified': self._ultima_modificacion,
+                'validado_en': self.validado_en}
+        self._escribir_atomico(self.ruta_meta, json.dumps(meta).encode('utf-8'))
+
+    def _escribir_atomico(self, destino, contenido):
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.dir_snapshot, exist_ok=True)
+            with open(temporal, 'wb') as f:
+                f.write(contenido)
+            os.replace(temporal, destino)
+        except OSError:
+            # Disco de solo lectura o similar: seguimos con lo que hay en memoria
+            if os.path.exists(temporal): os.remove(temporal)
+
+    def _publicar(self, df, origen):
+        # Tabla y versión en una sola asignación, como en catalogo.CatalogoIncremental
+        self._vigente = (self.version + 1, indices.TablaIndexada(df, CLAVES_INDICE))
+        self.origen = origen
+
+    def _revalidar(self):
+        """Descarga condicional del Sheet. Se llama con `_lock` tomado."""
+        cabeceras = {}
+        if self._etag:
+            cabeceras['If-None-Match'] = self._etag
+        if self._ultima_modificacion:
+            cabeceras['If-Modified-Since'] = self._ultima_modificacion
+        try:
+            respuesta = self.sesion.get(self.url, headers=cabeceras, timeout=TIMEOUT_SHEET)
+            if respuesta.status_code == 304:
+                self.validado_en = time.time()
+                if self.origen not in ('sheet', 'snapshot'):
+                    raise ValueError("El Sheet respondió 304 sin snapshot local")
+            else:
+                respuesta.raise_for_status()
+                df = leer_csv_sheet(respuesta.content)
+                if df.empty:
+                    raise ValueError("El Sheet no trae clientes")
+                self._etag = respuesta.headers.get('ETag')
+                self._ultima_modificacion = respuesta.headers.get('Last-Modified')
+                self.validado_en = time.time()
+                self._escribir_atomico(self.ruta_csv, respuesta.content)
+                self._publicar(df, 'sheet')
+            self.ultimo_error = None
+            self._guardar_meta()
+        except Exception as e:
+            self.ultimo_error = f"{type(e).__name__}: {e}"
+            self.validado_en = time.time() - self.ttl + REINTENTO_ERROR
+
+    def _revalidar_y_soltar(self):
+        try:
+            self._revalidar()
+        finally:
+            self._lock.release()
+
+    def revalidar_en_segundo_plano(self):
+        """Lanza la revalidación en un hilo si no hay otra en curso. Regresa el hilo o None."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        self._hilo = threading.Thread(target=self._revalidar_y_soltar, name="revalidar-clientes", daemon=True)
+        self._hilo.start()
+        return self._hilo
+
+    def obtener(self):
+        """La tabla vigente (`TablaIndexada`) sin esperar a la red."""
+        if time.time() - self.validado_en >= self.ttl:
+            self.revalidar_en_segundo_plano()
+        return self.tabla
+
+    def derivado(self, nombre, constructor):
+        """Estructura construida con `constructor(tabla)`, recalculada sólo cuando cambia la versión."""
+        return self._derivados.obtener(nombre, constructor)
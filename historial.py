@@ -0,0 +1,355 @@
+"""Historial de cotizaciones guardado en SQLite.
+
+Cada guardado es un upsert atómico de una sola cotización (antes se reescribía
+todo `historial_cotizaciones.json`), y hay índices por cliente y por fecha. El
+JSON anterior se importa una sola vez y se deja intacto como respaldo.
+
+Las tablas `ventas_*` acumulan cantidad, importe y cotizaciones por día ×
+vendedor × cliente × código (y agregados más chicos por cliente y por código
+y mes). Las mantienen triggers sobre `cotizaciones`, en la misma transacción
+de cada guardado (al editar se resta lo anterior y se suma lo nuevo);
+`ventas.py` las consulta y las reconstruye.
+
+Migración manual:  python historial.py migrar [historial_cotizaciones.json]
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+from contextlib import closing
+
+import basedatos
+
+ARCHIVO_HISTORIAL_DB = "historial_cotizaciones.db"
+ARCHIVO_HISTORIAL_JSON = "historial_cotizaciones.json"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cotizaciones (
+    id TEXT PRIMARY KEY,
+    fecha TEXT NOT NULL,
+    cliente TEXT NOT NULL,
+    tipo_doc TEXT,
+    lista_precios TEXT,
+    total REAL NOT NULL,
+    productos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cotizaciones_cliente ON cotizaciones (cliente);
+CREATE INDEX IF NOT EXISTS idx_cotizaciones_fecha ON cotizaciones (fecha);
+CREATE TABLE IF NOT EXISTS migraciones (
+    nombre TEXT PRIMARY KEY,
+    fecha TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+"""
+
+# Agregados de ventas que mantienen los triggers: tabla -> (columnas clave, expresiones
+# sobre una cotización `{c}` y sus líneas `p`). El detalle por día × vendedor × cliente ×
+# código sirve cualquier filtro; los otros dos son más chicos para el tablero general.
+_LINEA = {
+    'codigo': "CAST(json_extract(p.value, '$.codigo') AS TEXT)",
+    'cantidad': "CAST(json_extract(p.value, '$.cantidad') AS REAL)",
+    'precio': "COALESCE(json_extract(p.value, '$.precio_unitario'), json_extract(p.value, '$.precio_base'), 0)",
+}
+AGREGADOS_VENTAS = {
+    'ventas_diarias': ("dia, vendedor, cliente, codigo",
+                       "date({c}.fecha), COALESCE({c}.vendedor, ''), {c}.cliente, " + _LINEA['codigo']),
+    'ventas_diarias_cliente': ("dia, vendedor, cliente", "date({c}.fecha), COALESCE({c}.vendedor, ''), {c}.cliente"),
+    'ventas_mensuales_codigo': ("codigo, mes", _LINEA['codigo'] + ", substr({c}.fecha, 1, 7)"),
+}
+
+
+def _sql_agregado(tabla, c, signo="", conteo="1", desde="json_each({c}.productos) p", acumular=True):
+    """INSERT ... SELECT de las líneas de `c` agrupadas por las claves de `tabla`.
+
+    Con `acumular` se suman (o restan, con `signo`) a lo que ya hay, como en los triggers.
+    """
+    claves, valores = AGREGADOS_VENTAS[tabla]
+    grupo = ", ".join(str(i + 1) for i in range(claves.count(",") + 1))
+    sql = f"""
+        INSERT INTO {tabla} ({claves}, cantidad, importe, cotizaciones)
+        SELECT {valores.format(c=c)}, {signo} SUM({_LINEA['cantidad']}),
+               {signo} SUM({_LINEA['cantidad']} * {_LINEA['precio']}), {signo} {conteo}
+        FROM {desde.format(c=c)} WHERE true GROUP BY {grupo}"""
+    if acumular:
+        sql += f"""
+        ON CONFLICT ({claves}) DO UPDATE SET
+            cantidad = cantidad + excluded.cantidad, importe = importe + excluded.importe,
+            cotizaciones = cotizaciones + excluded.cotizaciones"""
+    return sql + ";"
+
+
+def _sql_limpiar(tabla):
+    # Lo que quedó en cero cotizaciones tras restar OLD se borra, para que editar no deje filas vacías
+    claves, valores = AGREGADOS_VENTAS[tabla]
+    return f"""
+        DELETE FROM {tabla} WHERE cotizaciones <= 0
+            AND ({claves}) IN (SELECT {valores.format(c="OLD")} FROM json_each(OLD.productos) p);"""
+
+
+_SUMAR_NUEVA = "".join(_sql_agregado(tabla, "NEW") for tabla in AGREGADOS_VENTAS)
+_RESTAR_ANTERIOR = "".join(_sql_agregado(tabla, "OLD", signo="-") + _sql_limpiar(tabla) for tabla in AGREGADOS_VENTAS)
+_TABLAS_VENTAS = "".join(f"""
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        {claves.replace(",", " TEXT NOT NULL,")} TEXT NOT NULL,
+        cantidad REAL NOT NULL,
+        importe REAL NOT NULL,
+        cotizaciones INTEGER NOT NULL,
+        PRIMARY KEY ({claves})
+    ) WITHOUT ROWID;""" for tabla, (claves, _) in AGREGADOS_VENTAS.items())
+
+# Cambios de esquema en orden; PRAGMA user_version guarda cuántos ya se aplicaron
+MIGRACIONES_ESQUEMA = [
+    """
+    ALTER TABLE cotizaciones ADD COLUMN vendedor TEXT;
+    CREATE INDEX IF NOT EXISTS idx_cotizaciones_vendedor ON cotizaciones (vendedor, fecha);
+    CREATE INDEX IF NOT EXISTS idx_cotizaciones_fecha_id ON cotizaciones (fecha, id);
+    """,
+    f"""{_TABLAS_VENTAS}
+    CREATE INDEX IF NOT EXISTS idx_ventas_vendedor ON ventas_diarias (vendedor, dia);
+    CREATE INDEX IF NOT EXISTS idx_ventas_cliente ON ventas_diarias (cliente, dia);
+    CREATE INDEX IF NOT EXISTS idx_ventas_codigo ON ventas_diarias (codigo, dia);
+    CREATE TRIGGER IF NOT EXISTS ventas_al_insertar AFTER INSERT ON cotizaciones BEGIN
+        {_SUMAR_NUEVA}
+    END;
+    CREATE TRIGGER IF NOT EXISTS ventas_al_borrar AFTER DELETE ON cotizaciones BEGIN
+        {_RESTAR_ANTERIOR}
+    END;
+    CREATE TRIGGER IF NOT EXISTS ventas_al_actualizar
+    AFTER UPDATE OF fecha, cliente, vendedor, productos ON cotizaciones BEGIN
+        {_RESTAR_ANTERIOR}
+        {_SUMAR_NUEVA}
+    END;
+    """,
+]
+
+COLUMNAS = ['id', 'fecha', 'cliente', 'tipo_doc', 'lista_precios', 'total', 'productos', 'vendedor']
+COLUMNAS_RESUMEN = ['id', 'fecha', 'cliente', 'vendedor', 'tipo_doc', 'lista_precios', 'total']
+PATRON_VENDEDOR = re.compile(r'\(Vend: ([^)]*)\)\s*$')
+
+
+def conectar(ruta_db=ARCHIVO_HISTORIAL_DB):
+    return basedatos.conectar(ruta_db)
+
+
+def inicializar(ruta_db=ARCHIVO_HISTORIAL_DB, ruta_json=ARCHIVO_HISTORIAL_JSON):
+    """Crea el esquema y migra el JSON anterior si no se había hecho."""
+    with closing(conectar(ruta_db)) as conexion, conexion:
+        conexion.executescript(ESQUEMA)
+        _migrar_esquema(conexion)
+    return migrar_json(ruta_json, ruta_db)
+
+
+def _migrar_esquema(conexion):
+    version = conexion.execute("PRAGMA user_version").fetchone()[0]
+    for numero, script in enumerate(MIGRACIONES_ESQUEMA[version:], start=version + 1):
+        conexion.executescript(script)
+        if numero == 1:
+            # Las cotizaciones anteriores no guardaban vendedor: sale del display del cliente
+            filas = conexion.execute("SELECT id, cliente FROM cotizaciones WHERE vendedor IS NULL").fetchall()
+            conexion.executemany("UPDATE cotizaciones SET vendedor = ? WHERE id = ?",
+                                 [(vendedor_de_cliente(cliente), cot_id) for cot_id, cliente in filas])
+        elif numero == 2:
+            _reconstruir_ventas(conexion)
+        conexion.execute(f"PRAGMA user_version = {numero}")
+
+
+def vendedor_de_cliente(cliente_display):
+    """'123 - NOMBRE (Vend: 151)' -> '151'; '' si no trae vendedor."""
+    match = PATRON_VENDEDOR.search(cliente_display or "")
+    return match.group(1).strip() if match else ""
+
+
+def migrar_json(ruta_json=ARCHIVO_HISTORIAL_JSON, ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Importa `historial_cotizaciones.json` una sola vez. Regresa cuántas cotizaciones importó."""
+    if not os.path.exists(ruta_json):
+        return 0
+    nombre = f"json:{os.path.abspath(ruta_json)}"
+    with closing(conectar(ruta_db)) as conexion, conexion:
+        if conexion.execute("SELECT 1 FROM migraciones WHERE nombre = ?", (nombre,)).fetchone():
+            return 0
+        with open(ruta_json, 'r', encoding='utf-8') as f:
+            try:
+                anterior = json.load(f)
+            except json.JSONDecodeError:
+                anterior = {}
+        filas = [_a_fila(dict(datos, id=datos.get('id', cot_id))) for cot_id, datos in anterior.items()]
+        # Lo que ya esté en la base (guardado después) gana sobre el JSON
+        conexion.executemany(
+            f"INSERT OR IGNORE INTO cotizaciones ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))})",
+            filas)
+        conexion.execute("INSERT INTO migraciones (nombre) VALUES (?)", (nombre,))
+    return len(filas)
+
+
+def _a_fila(datos):
+    return (
+        datos['id'], datos['fecha'], datos.get('cliente') or "MOSTRADOR", datos.get('tipo_doc'),
+        datos.get('lista_precios'), float(datos.get('total', 0)),
+        json.dumps(datos.get('productos', []), ensure_ascii=False),
+        datos.get('vendedor') or vendedor_de_cliente(datos.get('cliente')),
+    )
+
+
+def _de_fila(fila):
+    datos = dict(zip(COLUMNAS, fila))
+    datos['productos'] = json.loads(datos['productos'])
+    return datos
+
+
+def guardar(datos, ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Upsert atómico de una cotización (dict con el mismo formato que el JSON)."""
+    with closing(conectar(ruta_db)) as conexion, conexion:
+        conexion.execute(
+            f"INSERT INTO cotizaciones ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))}) "
+            "ON CONFLICT(id) DO UPDATE SET fecha = excluded.fecha, cliente = excluded.cliente, "
+            "tipo_doc = excluded.tipo_doc, lista_precios = excluded.lista_precios, "
+            "total = excluded.total, productos = excluded.productos, vendedor = excluded.vendedor",
+            _a_fila(datos))
+    return datos['id']
+
+
+def guardar_nueva(datos, ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Inserta una cotización nueva; si su id ya existe (dos sesiones en el mismo segundo) le agrega un sufijo."""
+    base = datos['id']
+    with closing(conectar(ruta_db)) as conexion, conexion:
+        for intento in range(1, 1000):
+            cot_id = base if intento == 1 else f"{base}-{intento}"
+            try:
+                conexion.execute(
+                    f"INSERT INTO cotizaciones ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))})",
+                    _a_fila(dict(datos, id=cot_id)))
+                return cot_id
+            except sqlite3.IntegrityError:
+                continue
+    raise RuntimeError(f"No se pudo asignar un id libre para la cotización {base}")
+
+
+def obtener(cot_id, ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Una cotización por id, o None."""
+    with closing(conectar(ruta_db)) as conexion:
+        fila = conexion.execute(
+            f"SELECT {', '.join(COLUMNAS)} FROM cotizaciones WHERE id = ?", (cot_id,)).fetchone()
+    return _de_fila(fila) if fila else None
+
+
+def buscar_por_cliente(cliente, ruta_db=ARCHIVO_HISTORIAL_DB):
+    with closing(conectar(ruta_db)) as conexion:
+        filas = conexion.execute(
+            f"SELECT {', '.join(COLUMNAS)} FROM cotizaciones WHERE cliente = ? ORDER BY fecha DESC",
+            (cliente,)).fetchall()
+    return [_de_fila(f) for f in filas]
+
+
+def buscar_por_fecha(desde, hasta, ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Cotizaciones con `desde <= fecha < hasta` (texto 'YYYY-MM-DD[ HH:MM:SS]')."""
+    with closing(conectar(ruta_db)) as conexion:
+        filas = conexion.execute(
+            f"SELECT {', '.join(COLUMNAS)} FROM cotizaciones WHERE fecha >= ? AND fecha < ? ORDER BY fecha DESC",
+            (desde, hasta)).fetchall()
+    return [_de_fila(f) for f in filas]
+
+
+def consultar(cliente=None, vendedor=None, desde=None, hasta=None, total_min=None, total_max=None,
+              cursor=None, limite=20, ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Una página de resúmenes (sin `productos`), de la más reciente a la más antigua.
+
+    `cliente` busca por texto parcial; `desde`/`hasta` son fechas 'YYYY-MM-DD'
+    (inclusivas). La paginación es por cursor: se pasa el `siguiente` que
+    regresó la página anterior y la consulta sigue desde ahí usando el índice
+    (fecha, id), sin OFFSET. Regresa (filas, siguiente); `siguiente` es None
+    en la última página.
+    """
+    condiciones, parametros = [], []
+    if cliente:
+        condiciones.append("cliente LIKE ?")
+        parametros.append(f"%{cliente}%")
+    if vendedor:
+        condiciones.append("vendedor = ?")
+        parametros.append(vendedor)
+    if desde:
+        condiciones.append("fecha >= ?")
+        parametros.append(str(desde))
+    if hasta:
+        condiciones.append("fecha < date(?, '+1 day')")
+        parametros.append(str(hasta))
+    if total_min is not None:
+        condiciones.append("total >= ?")
+        parametros.append(total_min)
+    if total_max is not None:
+        condiciones.append("total <= ?")
+        parametros.append(total_max)
+    if cursor:
+        fecha_cursor, id_cursor = cursor.split("|", 1)
+        condiciones.append("(fecha, id) < (?, ?)")
+        parametros.extend([fecha_cursor, id_cursor])
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    with closing(conectar(ruta_db)) as conexion:
+        filas = conexion.execute(
+            f"SELECT {', '.join(COLUMNAS_RESUMEN)} FROM cotizaciones {where} "
+            "ORDER BY fecha DESC, id DESC LIMIT ?", (*parametros, limite + 1)).fetchall()
+
+    pagina = [dict(zip(COLUMNAS_RESUMEN, f)) for f in filas[:limite]]
+    siguiente = f"{pagina[-1]['fecha']}|{pagina[-1]['id']}" if len(filas) > limite else None
+    return pagina, siguiente
+
+
+COLUMNAS_LINEAS = ['id', 'fecha', 'cliente', 'lista_precios', 'total', 'codigo', 'descripcion', 'cantidad', 'precio_base', 'precio_unitario']
+
+
+def leer_lineas(ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Todas las líneas de todas las cotizaciones, con los datos de su cotización (`COLUMNAS_LINEAS`).
+
+    SQLite desarma el JSON de `productos` (json_each), así que no se
+    deserializa cotización por cotización en Python.
+    """
+    with closing(conectar(ruta_db)) as conexion:
+        return conexion.execute(
+            "SELECT c.id, c.fecha, c.cliente, c.lista_precios, c.total, CAST(json_extract(p.value, '$.codigo') AS TEXT), "
+            "json_extract(p.value, '$.descripcion'), json_extract(p.value, '$.cantidad'), "
+            "json_extract(p.value, '$.precio_base'), json_extract(p.value, '$.precio_unitario') "
+            "FROM cotizaciones c, json_each(c.productos) p ORDER BY c.id, p.key").fetchall()
+
+
+def actualizar_recotizadas(cambios, ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Reescribe `total` y `productos` de varias cotizaciones en una sola transacción.
+
+    `cambios` es {id: (total, productos)}; las líneas y el total quedan siempre de acuerdo.
+    """
+    with closing(conectar(ruta_db)) as conexion, conexion:
+        conexion.executemany("UPDATE cotizaciones SET total = ?, productos = ? WHERE id = ?",
+                             [(float(total), json.dumps(productos, ensure_ascii=False), cot_id)
+                              for cot_id, (total, productos) in cambios.items()])
+    return len(cambios)
+
+
+def _reconstruir_ventas(conexion):
+    filas = 0
+    for tabla in AGREGADOS_VENTAS:
+        conexion.execute(f"DELETE FROM {tabla}")
+        conexion.execute(_sql_agregado(tabla, "c", conteo="COUNT(DISTINCT c.id)",
+                                       desde="cotizaciones c, json_each(c.productos) p", acumular=False))
+        filas += conexion.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    return filas
+
+
+def reconstruir_ventas(ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Recalcula los agregados de ventas desde todo el historial, en una transacción. Regresa cuántas filas quedaron."""
+    with closing(conectar(ruta_db)) as conexion, conexion:
+        return _reconstruir_ventas(conexion)
+
+
+def leer_todo(ruta_db=ARCHIVO_HISTORIAL_DB):
+    """Todo el historial como {id: datos}, igual que el JSON anterior."""
+    with closing(conectar(ruta_db)) as conexion:
+        filas = conexion.execute(f"SELECT {', '.join(COLUMNAS)} FROM cotizaciones").fetchall()
+    return {f[0]: _de_fila(f) for f in filas}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrar":
+        print(__doc__)
+        sys.exit(1)
+    ruta_json = sys.argv[2] if len(sys.argv) > 2 else ARCHIVO_HISTORIAL_JSON
+    importadas = inicializar(ruta_json=ruta_json)
+    print(f"{importadas} cotizaciones importadas de {ruta_json} a {ARCHIVO_HISTORIAL_DB}")
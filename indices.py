@@ -0,0 +1,60 @@
+"""Índices hash sobre las tablas cargadas (catálogo y clientes) y sus estructuras derivadas por versión."""
+import threading
+
+
+class TablaIndexada:
+    """DataFrame con búsqueda en O(1) de una fila por el valor de una columna clave.
+
+    Los índices se arman una sola vez, dentro de los loaders cacheados, y los
+    handlers de la UI los consultan en lugar de filtrar el DataFrame completo.
+    Si un valor se repite, gana la primera fila (como el `.iloc[0]` de antes).
+    """
+
+    def __init__(self, df, claves):
+        self.df = df
+        self._registros = df.to_dict('records') if not df.empty else []
+        self._indices = {}
+        for clave in claves:
+            indice = {}
+            if clave in df.columns:
+                for posicion, valor in enumerate(df[clave].tolist()):
+                    indice.setdefault(valor, posicion)
+            self._indices[clave] = indice
+
+    def posicion(self, clave, valor):
+        """Posición de la fila con `clave == valor`, o None."""
+        return self._indices[clave].get(valor)
+
+    def fila(self, clave, valor):
+        """La fila como dict, o None si no existe."""
+        posicion = self._indices[clave].get(valor)
+        return self._registros[posicion] if posicion is not None else None
+
+    def __len__(self):
+        return len(self._registros)
+
+
+class DerivadosPorVersion:
+    """Estructuras construidas a partir de una tabla compartida, una vez por versión.
+
+    `vigente()` regresa `(version, datos)` de una sola lectura. Si varias
+    sesiones piden la misma estructura justo después de un cambio, una la
+    construye y las demás esperan y reciben la misma.
+    """
+
+    def __init__(self, vigente):
+        self._vigente = vigente
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, nombre, constructor):
+        version, valor = self._valores.get(nombre, (None, None))
+        if version == self._vigente()[0]:
+            return valor
+        with self._lock:
+            version, datos = self._vigente()
+            guardada, valor = self._valores.get(nombre, (None, None))
+            if guardada != version:
+                valor = constructor(datos)
+                self._valores[nombre] = (version, valor)
+        return valor
@@ -0,0 +1,178 @@
+"""Listas de precios declarativas y sus columnas precalculadas sobre el catálogo.
+
+Cada lista se define con datos, no con código: factor o divisor sobre el
+precio base, redondeo, escalas por cantidad, precios especiales por código y,
+opcionalmente, los clientes que la pueden usar (descuentos por cliente). Las
+definiciones de `LISTAS_PRECIOS` se pueden reemplazar con un
+`listas_precios.json` junto a la app, con la misma forma.
+
+Los precios se calculan vectorizados con numpy: una vez para todo el catálogo
+al cargarlo (una columna por lista y escala) y en bloque para las cotizaciones
+que se cargan del historial. Las líneas de la cotización guardan el precio de
+cada lista, así que cambiar de lista no recalcula nada por fila.
+"""
+import bisect
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+ARCHIVO_LISTAS = "listas_precios.json"
+
+# Dimefet se define con divisor para conservar exactamente el `p_base / 0.90` de siempre
+LISTAS_PRECIOS = [
+    {'nombre': "Distribuidor"},
+    {'nombre': "Dimefet", 'divisor': 0.90},
+]
+# Ejemplos de lo que acepta cada definición:
+#   {'nombre': "Mayoreo", 'factor': 0.95, 'redondeo': 2,
+#    'escalas': [{'desde': 12, 'factor': 0.98}, {'desde': 100, 'factor': 0.95}],
+#    'precios_especiales': {'44458': 35.0}}
+#   {'nombre': "Ferretería X", 'factor': 0.93, 'clientes': ['159', '692']}
+
+
+class ListaPrecios:
+    """precio = precio_base * factor / divisor * escala(cantidad), redondeado; los especiales ganan."""
+
+    def __init__(self, nombre, factor=1.0, divisor=1.0, redondeo=None, escalas=(), precios_especiales=None,
+                 clientes=None):
+        if divisor == 0:
+            raise ValueError(f"Lista '{nombre}': el divisor no puede ser 0")
+        self.nombre = nombre
+        self.factor = float(factor)
+        self.divisor = float(divisor)
+        self.redondeo = redondeo
+        escalas = sorted(escalas, key=lambda e: e['desde'])
+        # Siempre hay una escala desde 1 (sin ajuste), así cada umbral es una columna
+        self.umbrales = [1] + [int(e['desde']) for e in escalas if int(e['desde']) > 1]
+        self.factores_escala = [1.0] + [float(e['factor']) for e in escalas if int(e['desde']) > 1]
+        self.precios_especiales = {str(c): float(p) for c, p in (precios_especiales or {}).items()}
+        self.clientes = set(map(str, clientes)) if clientes is not None else None
+
+    def calcular(self, precios_base, codigos, cantidades):
+        """Precios de la lista para arreglos alineados de precio base, código y cantidad."""
+        precios = np.asarray(precios_base, dtype=np.float64) * self.factor / self.divisor
+        if len(self.umbrales) > 1:
+            tramo = np.searchsorted(self.umbrales, np.maximum(np.asarray(cantidades), 1), side='right') - 1
+            precios = precios * np.asarray(self.factores_escala)[tramo]
+        if self.redondeo is not None:
+            precios = np.round(precios, self.redondeo)
+        if self.precios_especiales:
+            especiales = [self.precios_especiales.get(c) for c in codigos]
+            mascara = np.array([p is not None for p in especiales], dtype=bool)
+            if mascara.any():
+                precios = precios.copy()
+                precios[mascara] = [p for p in especiales if p is not None]
+        return precios
+
+    def tramo(self, cantidad):
+        return max(0, bisect.bisect_right(self.umbrales, cantidad) - 1)
+
+
+class TablaPrecios:
+    """Precios de todas las listas y escalas para cada producto del catálogo.
+
+    Se arma una vez por versión del catálogo; una línea nueva sólo busca su
+    fila y toma la columna de su escala.
+    """
+
+    def __init__(self, motor, df_catalogo):
+        self.motor = motor
+        codigos = df_catalogo['codigo'].tolist() if not df_catalogo.empty else []
+        self._posiciones = {}
+        for posicion, codigo in enumerate(codigos):
+            self._posiciones.setdefault(codigo, posicion)
+        precios_base = df_catalogo['precio'].to_numpy(dtype=np.float64) if codigos else np.zeros(0)
+        self.precios_base = precios_base
+
+        columnas, self._inicios = [], []
+        for lista in motor.listas:
+            self._inicios.append(len(columnas))
+            for umbral in lista.umbrales:
+                columnas.append(lista.calcular(precios_base, codigos, np.full(len(codigos), umbral)))
+        self.precios = np.column_stack(columnas) if codigos else np.zeros((0, len(columnas)))
+
+    def __contains__(self, codigo):
+        return codigo in self._posiciones
+
+    def precios_codigo(self, codigo, cantidad):
+        """Tupla con el precio en cada lista, o None si el código no está en el catálogo."""
+        posicion = self._posiciones.get(codigo)
+        if posicion is None:
+            return None
+        fila = self.precios[posicion]
+        return tuple(float(fila[inicio + lista.tramo(cantidad)])
+                     for inicio, lista in zip(self._inicios, self.motor.listas))
+
+    def precios_base_lote(self, codigos):
+        """Precio base del catálogo de cada código; NaN en los desconocidos."""
+        posiciones = np.array([self._posiciones.get(c, -1) for c in codigos], dtype=np.int64)
+        salida = np.full(len(posiciones), np.nan)
+        validas = posiciones >= 0
+        salida[validas] = self.precios_base[posiciones[validas]]
+        return salida
+
+    def precios_lote(self, codigos, cantidades):
+        """Matriz (n, listas) para muchas líneas a la vez; NaN en códigos desconocidos."""
+        posiciones = np.array([self._posiciones.get(c, -1) for c in codigos], dtype=np.int64)
+        cantidades = np.maximum(np.asarray(cantidades), 1)
+        salida = np.full((len(posiciones), len(self.motor.listas)), np.nan)
+        validas = posiciones >= 0
+        for j, (inicio, lista) in enumerate(zip(self._inicios, self.motor.listas)):
+            tramo = np.searchsorted(lista.umbrales, cantidades[validas], side='right') - 1
+            salida[validas, j] = self.precios[posiciones[validas], inicio + tramo]
+        return salida
+
+
+class MotorPrecios:
+    """Conjunto de listas de precios activas."""
+
+    def __init__(self, definiciones=None):
+        self.listas = [ListaPrecios(**d) for d in (definiciones or LISTAS_PRECIOS)]
+        self.nombres = tuple(lista.nombre for lista in self.listas)
+        if len(set(self.nombres)) != len(self.nombres):
+            raise ValueError("Hay listas de precios con el mismo nombre")
+        self._indices = {nombre: i for i, nombre in enumerate(self.nombres)}
+
+    def indice(self, nombre):
+        return self._indices[nombre]
+
+    def disponibles(self, cve_cliente=""):
+        """Nombres de las listas que puede usar el cliente (las generales más las suyas)."""
+        return [l.nombre for l in self.listas if l.clientes is None or str(cve_cliente) in l.clientes]
+
+    def calcular(self, precios_base, codigos, cantidades):
+        """Matriz (n, listas) con el precio de cada línea en cada lista."""
+        codigos = list(codigos)
+        if not codigos:
+            return np.zeros((0, len(self.listas)))
+        return np.column_stack([l.calcular(precios_base, codigos, cantidades) for l in self.listas])
+
+    def precios(self, precio_base, codigo, cantidad):
+        """Tupla con el precio de una línea en cada lista."""
+        return tuple(float(p) for p in self.calcular([precio_base], [codigo], [cantidad])[0])
+
+    def precio_base_desde(self, precio_unitario, nombre_lista):
+        """Inverso aproximado (sin escalas ni redondeo) para registros viejos sin `precio_base`."""
+        lista = self.listas[self._indices[nombre_lista]] if nombre_lista in self._indices else None
+        if lista is None:
+            return float(precio_unitario)
+        return float(precio_unitario) * lista.divisor / lista.factor
+
+    def precalcular(self, df_catalogo):
+        return TablaPrecios(self, df_catalogo)
+
+
+def leer_definiciones(ruta=ARCHIVO_LISTAS):
+    """Definiciones de `listas_precios.json` si existe; si no, las de este módulo."""
+    if not os.path.exists(ruta):
+        return LISTAS_PRECIOS
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def motor_predeterminado():
+    """El motor de la app, con las listas leídas una vez por proceso."""
+    return MotorPrecios(leer_definiciones())
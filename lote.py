@@ -0,0 +1,283 @@
+"""Cotizador sin Streamlit: genera cotizaciones en PDF por lote con un pool de procesos.
+
+Usa los mismos módulos que la app (catálogo, Carga Rápida, listas de precios,
+PDF), así que un lote cotiza exactamente igual que el editor.
+
+    python lote.py pedidos.jsonl --salida cotizaciones.zip
+    python lote.py carpeta_de_pedidos/ --salida cotizaciones/ --lista Dimefet
+    python lote.py pedido.txt --clientes-de 151 --salida cotizaciones_151.zip
+    python lote.py --historial --vendedor 151 --salida recotizadas/
+
+Cada entrada es un dict con `pedido` (texto como en Carga Rápida) o
+`productos` ([{codigo, cantidad}]), y opcionalmente `nombre`, `cliente`
+(clave), `tipo_doc` y `lista`. En un .jsonl va una entrada por línea; en una
+carpeta cada .txt es un pedido y el nombre del archivo es el de la cotización.
+Junto a los PDF se escribe `resumen.json` con totales y códigos desconocidos.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import carga_rapida
+import catalogo
+import directorio_clientes
+import historial
+import listas_precios
+import modelo_cotizacion
+import pdf_cotizacion
+from texto import limpiar_nombre_archivo
+
+TIPO_DOC = "Remisión"
+LISTA = "Distribuidor"
+
+
+class Cotizador:
+    """Catálogo, mapa de códigos y precios precalculados, listos para cotizar muchas entradas."""
+
+    def __init__(self, df_catalogo, motor=None):
+        self.motor = motor or listas_precios.motor_predeterminado()
+        self.mapa_codigos = catalogo.mapa_codigos(df_catalogo)
+        self.tabla_precios = self.motor.precalcular(df_catalogo)
+
+    @classmethod
+    def desde_archivos(cls, nombre_archivo_catalogo=catalogo.ARCHIVO_CATALOGO,
+                       nombre_archivo_actualizaciones=catalogo.ARCHIVO_ACTUALIZACIONES):
+        return cls(catalogo.cargar_catalogo(nombre_archivo_catalogo, nombre_archivo_actualizaciones))
+
+    def analizar(self, entrada):
+        """Mismo resultado que `carga_rapida.analizar_pedido`, venga el pedido en texto o en productos."""
+        if 'pedido' in entrada:
+            return carga_rapida.analizar_pedido(entrada['pedido'], self.mapa_codigos)
+        cantidades = {}
+        for p in entrada.get('productos', []):
+            codigo = str(p['codigo']).strip()
+            cantidades[codigo] = cantidades.get(codigo, 0) + int(p['cantidad'])
+        productos, desconocidos = [], {}
+        for codigo, cantidad in cantidades.items():
+            info = self.mapa_codigos.get(codigo)
+            if info is None:
+                desconocidos[codigo] = cantidad
+                continue
+            productos.append({'codigo': codigo, 'descripcion': info[0], 'cantidad': cantidad,
+                              'precio_base': float(info[1])})
+        return {'productos': productos, 'desconocidos': desconocidos, 'malformadas': [], 'lineas': len(cantidades)}
+
+    def cotizar(self, entrada):
+        """Cotiza una entrada. Regresa un dict con el PDF y el resumen."""
+        resultado = self.analizar(entrada)
+        lista = entrada.get('lista') or LISTA
+        cot = modelo_cotizacion.Cotizacion(motor=self.motor)
+        cot.extender(resultado['productos'], tabla_precios=self.tabla_precios)
+        total = cot.total(lista)
+        nombre = entrada.get('nombre') or "MOSTRADOR"
+        pdf = pdf_cotizacion.generar_pdf_lineas(
+            cot.renglones(lista), nombre, entrada.get('tipo_doc') or TIPO_DOC, lista, total)
+        return {
+            'nombre': nombre,
+            'cliente': entrada.get('cliente', ""),
+            'lista': lista,
+            'lineas': len(cot),
+            'total': round(total, 2),
+            'desconocidos': resultado['desconocidos'],
+            'malformadas': len(resultado['malformadas']),
+            'pdf': pdf,
+        }
+
+
+# --- POOL DE PROCESOS ---
+
+_cotizador = None
+
+
+def _inicializar_proceso(nombre_archivo_catalogo, nombre_archivo_actualizaciones):
+    # Cada proceso abre el snapshot del catálogo (memory-map) y precalcula precios una vez
+    global _cotizador
+    _cotizador = Cotizador.desde_archivos(nombre_archivo_catalogo, nombre_archivo_actualizaciones)
+
+
+def _cotizar_en_proceso(entrada):
+    return _cotizador.cotizar(entrada)
+
+
+class Salida:
+    """Escribe los PDF en una carpeta o en un .zip, con nombres únicos."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.zip = zipfile.ZipFile(ruta, 'w', zipfile.ZIP_STORED) if ruta.lower().endswith('.zip') else None
+        if self.zip is None:
+            os.makedirs(ruta, exist_ok=True)
+        self._usados = set()
+        self.bytes = 0
+
+    def nombre_unico(self, base):
+        nombre, n = f"{base}.pdf", 1
+        while nombre in self._usados:
+            n += 1
+            nombre = f"{base}_{n}.pdf"
+        self._usados.add(nombre)
+        return nombre
+
+    def escribir(self, nombre, contenido):
+        self.bytes += len(contenido)
+        if self.zip is not None:
+            # Los PDF ya vienen comprimidos; ZIP_STORED evita gastar CPU en recomprimir
+            self.zip.writestr(nombre, contenido)
+        else:
+            with open(os.path.join(self.ruta, nombre), 'wb') as f:
+                f.write(contenido)
+
+    def cerrar(self):
+        if self.zip is not None:
+            self.zip.close()
+
+
+def cotizar_lote(entradas, salida, procesos=None, nombre_archivo_catalogo=catalogo.ARCHIVO_CATALOGO,
+                 nombre_archivo_actualizaciones=catalogo.ARCHIVO_ACTUALIZACIONES, tamano_bloque=8):
+    """Cotiza todas las `entradas` y escribe los PDF en `salida` (carpeta o .zip).
+
+    Con `procesos=1` todo corre en este proceso. Regresa el resumen por
+    cotización y las estadísticas de throughput.
+    """
+    entradas = list(entradas)
+    destino = Salida(salida)
+    fecha = datetime.now().strftime("%d-%m-%Y")
+    resumen = []
+    inicio = time.perf_counter()
+    ejecutor = None
+    try:
+        if procesos == 1:
+            _inicializar_proceso(nombre_archivo_catalogo, nombre_archivo_actualizaciones)
+            resultados = map(_cotizar_en_proceso, entradas)
+        else:
+            ejecutor = ProcessPoolExecutor(procesos, initializer=_inicializar_proceso,
+                                           initargs=(nombre_archivo_catalogo, nombre_archivo_actualizaciones))
+            resultados = ejecutor.map(_cotizar_en_proceso, entradas, chunksize=tamano_bloque)
+        # Se escribe conforme llegan, en el orden de las entradas
+        for resultado in resultados:
+            pdf = resultado.pop('pdf')
+            resultado['archivo'] = destino.nombre_unico(
+                f"Cotizacion_{limpiar_nombre_archivo(resultado['nombre'])}_{fecha}")
+            destino.escribir(resultado['archivo'], pdf)
+            resumen.append(resultado)
+        destino.escribir("resumen.json", json.dumps(resumen, ensure_ascii=False, indent=2).encode('utf-8'))
+    finally:
+        if ejecutor is not None:
+            ejecutor.shutdown(cancel_futures=True)
+        destino.cerrar()
+
+    segundos = time.perf_counter() - inicio
+    lineas = sum(r['lineas'] for r in resumen)
+    estadisticas = {
+        'cotizaciones': len(resumen),
+        'lineas': lineas,
+        'segundos': segundos,
+        'cotizaciones_por_segundo': len(resumen) / segundos if segundos else 0.0,
+        'lineas_por_segundo': lineas / segundos if segundos else 0.0,
+        'mb_escritos': destino.bytes / 1024 / 1024,
+    }
+    return resumen, estadisticas
+
+
+# --- ENTRADAS ---
+
+def leer_entradas(ruta):
+    """Entradas de un .jsonl, de una carpeta de .txt o de un solo .txt."""
+    if os.path.isdir(ruta):
+        for archivo in sorted(os.listdir(ruta)):
+            if archivo.lower().endswith('.txt'):
+                with open(os.path.join(ruta, archivo), 'r', encoding='utf-8') as f:
+                    yield {'nombre': os.path.splitext(archivo)[0], 'pedido': f.read()}
+    elif ruta.lower().endswith('.jsonl'):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for numero, linea in enumerate(f, start=1):
+                if linea.strip():
+                    try:
+                        yield json.loads(linea)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"{ruta}:{numero}: JSON inválido ({e})") from e
+    else:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            yield {'nombre': os.path.splitext(os.path.basename(ruta))[0], 'pedido': f.read()}
+
+
+def entradas_del_historial(vendedor=None, ruta_db=historial.ARCHIVO_HISTORIAL_DB):
+    """Cada cotización guardada como entrada, para recotizarla con el catálogo vigente."""
+    cursor = None
+    while True:
+        pagina, cursor = historial.consultar(vendedor=vendedor, cursor=cursor, limite=500, ruta_db=ruta_db)
+        for resumen in pagina:
+            datos = historial.obtener(resumen['id'], ruta_db=ruta_db)
+            yield {'nombre': f"{datos['cliente']} {datos['id']}", 'productos': datos['productos'],
+                   'tipo_doc': datos['tipo_doc'], 'lista': datos['lista_precios']}
+        if cursor is None:
+            break
+
+
+def clientes_del_vendedor(tabla_clientes, vendedor):
+    """Filas {cve, nombre, ...} de los clientes de un vendedor."""
+    indice = directorio_clientes.IndiceClientes(tabla_clientes)
+    return [tabla_clientes.fila('display', display) for display in indice.por_vendedor.get(str(vendedor), ())]
+
+
+def resolver_clientes(entradas, tabla_clientes):
+    """Pone el nombre del cliente a las entradas que sólo traen su clave."""
+    for entrada in entradas:
+        if entrada.get('cliente') and not entrada.get('nombre'):
+            fila = tabla_clientes.fila('cve', str(entrada['cliente']))
+            entrada = dict(entrada, nombre=fila['nombre'] if fila else str(entrada['cliente']))
+        yield entrada
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entrada", nargs="?", help=".jsonl, carpeta de .txt o un .txt")
+    parser.add_argument("--salida", required=True, help="Carpeta o archivo .zip")
+    parser.add_argument("--historial", action="store_true", help="Recotizar las cotizaciones guardadas")
+    parser.add_argument("--vendedor", help="Con --historial, sólo las de este vendedor")
+    parser.add_argument("--clientes-de", help="Generar el pedido de entrada para cada cliente de este vendedor")
+    parser.add_argument("--lista", help="Lista de precios para las entradas que no traen una")
+    parser.add_argument("--tipo-doc", help="Tipo de documento para las entradas que no traen uno")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por omisión, uno por CPU)")
+    parser.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    parser.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    args = parser.parse_args(argv)
+
+    if args.historial:
+        entradas = list(entradas_del_historial(args.vendedor))
+    elif args.entrada:
+        entradas = list(leer_entradas(args.entrada))
+    else:
+        parser.error("Indique un archivo de entrada o --historial")
+
+    if args.clientes_de or any(e.get('cliente') for e in entradas):
+        tabla_clientes = directorio_clientes.DirectorioClientes().obtener()
+        if args.clientes_de:
+            entradas = [dict(e, nombre=c['nombre'], cliente=c['cve'])
+                        for c in clientes_del_vendedor(tabla_clientes, args.clientes_de) for e in entradas]
+        entradas = list(resolver_clientes(entradas, tabla_clientes))
+
+    motor = listas_precios.motor_predeterminado()
+    for entrada in entradas:
+        entrada.setdefault('lista', args.lista)
+        entrada.setdefault('tipo_doc', args.tipo_doc)
+        if entrada['lista'] and entrada['lista'] not in motor.nombres:
+            parser.error(f"Lista de precios desconocida: {entrada['lista']}")
+
+    resumen, estadisticas = cotizar_lote(entradas, args.salida, args.procesos, args.catalogo, args.actualizaciones)
+    desconocidos = sum(len(r['desconocidos']) for r in resumen)
+    print(f"{estadisticas['cotizaciones']} cotizaciones ({estadisticas['lineas']} líneas) en "
+          f"{estadisticas['segundos']:.2f} s: {estadisticas['cotizaciones_por_segundo']:.1f} cotizaciones/s, "
+          f"{estadisticas['lineas_por_segundo']:,.0f} líneas/s, {estadisticas['mb_escritos']:.1f} MB -> {args.salida}")
+    if desconocidos:
+        print(f"{desconocidos} códigos desconocidos; ver resumen.json", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Modelo de la cotización en edición (lo que vive en `st.session_state.cotizacion`).
+
+Antes cada rerun convertía la lista de dicts en un DataFrame, recalculaba los
+precios de la lista activa y el Subtotal de todas las líneas y la recorría dos
+veces con `iterrows()`. Aquí cada línea guarda su precio en todas las listas
+(calculados por `listas_precios` al agregarla) y
+la cotización lleva el total de cada lista al día al agregar, quitar o cambiar
+cantidades, así que cambiar de Distribuidor a Dimefet es O(1) y un rerun sólo
+pinta. Lo que se deriva de todas las líneas (renglones del PDF, texto de
+WhatsApp) se memoiza por versión.
+"""
+import uuid
+
+import numpy as np
+
+import listas_precios
+
+
+class LineaCotizacion:
+    """Una línea con su precio en cada lista del motor (en el orden de `motor.nombres`)."""
+
+    __slots__ = ('codigo', 'descripcion', 'cantidad', 'precio_base', 'precios')
+
+    def __init__(self, codigo, descripcion, cantidad, precio_base, precios):
+        self.codigo = codigo
+        self.descripcion = descripcion
+        self.cantidad = cantidad
+        self.precio_base = precio_base
+        self.precios = precios
+
+
+class Cotizacion:
+    """Líneas de la cotización con el total de cada lista de precios siempre al día."""
+
+    __slots__ = ('lineas', 'version', 'uid', 'motor', '_totales', '_memo')
+
+    def __init__(self, productos=(), lista=None, motor=None):
+        self.lineas = []
+        self.version = 0
+        # Identifica esta cotización (con `version`, el estado exacto) para la clave del pedido
+        self.uid = uuid.uuid4().hex
+        self.motor = motor or listas_precios.motor_predeterminado()
+        self._totales = [0.0] * len(self.motor.nombres)
+        self._memo = {}
+        self.extender(productos, lista)
+
+    # --- Cambios ---
+
+    def _sumar(self, linea, signo):
+        for i, precio in enumerate(linea.precios):
+            self._totales[i] += signo * linea.cantidad * precio
+
+    def _cambio(self):
+        self.version += 1
+        self._memo.clear()
+        if not self.lineas:
+            # Sin líneas el total es exactamente cero, sin residuos de punto flotante
+            self._totales = [0.0] * len(self.motor.nombres)
+
+    def agregar(self, codigo, descripcion, cantidad, precio_base, precios=None):
+        """Agrega una línea. `precios` viene de la `TablaPrecios` del catálogo; si no, se calcula."""
+        precio_base = float(precio_base)
+        if precios is None:
+            precios = self.motor.precios(precio_base, codigo, cantidad)
+        linea = LineaCotizacion(codigo, descripcion, cantidad, precio_base, precios)
+        self.lineas.append(linea)
+        self._sumar(linea, 1)
+        self._cambio()
+        return linea
+
+    def extender(self, productos, lista=None, tabla_precios=None):
+        """Agrega dicts como los del historial o de Carga Rápida, con los precios calculados en bloque.
+
+        Con `tabla_precios` los precios se toman de las columnas precalculadas
+        del catálogo; sin ella se calculan del `precio_base` guardado. Los
+        registros viejos que sólo traen `precio_unitario` recuperan el
+        `precio_base` con la lista en que se guardaron (`lista`).
+        """
+        productos = list(productos)
+        if not productos:
+            return
+        precios_base = [
+            p['precio_base'] if p.get('precio_base') is not None
+            else self.motor.precio_base_desde(p['precio_unitario'], lista)
+            for p in productos]
+        codigos = [p['codigo'] for p in productos]
+        cantidades = [p['cantidad'] for p in productos]
+        if tabla_precios is not None and tabla_precios.motor is self.motor:
+            matriz = tabla_precios.precios_lote(codigos, cantidades)
+            faltan = np.isnan(matriz).any(axis=1)
+            if faltan.any():
+                matriz[faltan] = self.motor.calcular(
+                    np.asarray(precios_base)[faltan], [c for c, f in zip(codigos, faltan) if f],
+                    np.asarray(cantidades)[faltan])
+        else:
+            matriz = self.motor.calcular(precios_base, codigos, cantidades)
+
+        # Totales en bloque: una suma por columna en lugar de una por línea
+        for i, total in enumerate(matriz.T @ np.asarray(cantidades, dtype=np.float64)):
+            self._totales[i] += float(total)
+        for producto, precio_base, precios in zip(productos, precios_base, matriz.tolist()):
+            self.lineas.append(LineaCotizacion(producto['codigo'], producto['descripcion'], producto['cantidad'],
+                                               float(precio_base), tuple(precios)))
+        self._cambio()
+
+    def quitar(self, indice):
+        linea = self.lineas.pop(indice)
+        self._sumar(linea, -1)
+        self._cambio()
+        return linea
+
+    def cambiar_cantidad(self, indice, cantidad):
+        """Cambia la cantidad; el precio se recalcula por si la lista tiene escalas."""
+        linea = self.lineas[indice]
+        self._sumar(linea, -1)
+        linea.cantidad = cantidad
+        linea.precios = self.motor.precios(linea.precio_base, linea.codigo, cantidad)
+        self._sumar(linea, 1)
+        self._cambio()
+
+    def limpiar(self):
+        self.lineas = []
+        self._cambio()
+
+    # --- Consultas ---
+
+    def __len__(self):
+        return len(self.lineas)
+
+    def __bool__(self):
+        return bool(self.lineas)
+
+    def __iter__(self):
+        return iter(self.lineas)
+
+    def total(self, lista):
+        return self._totales[self.motor.indice(lista)]
+
+    def memoizado(self, nombre, constructor):
+        """`constructor()` calculado una vez por versión de la cotización."""
+        if nombre not in self._memo:
+            self._memo[nombre] = constructor()
+        return self._memo[nombre]
+
+    def renglones(self, lista):
+        """Tuplas (codigo, descripcion, cantidad, precio_unitario, subtotal) para el PDF."""
+        i = self.motor.indice(lista)
+        return self.memoizado(('renglones', lista), lambda: [
+            (l.codigo, l.descripcion, l.cantidad, l.precios[i], l.cantidad * l.precios[i]) for l in self.lineas])
+
+    def texto_detalle(self):
+        """Líneas "· código cantidad descripción" para los mensajes de WhatsApp."""
+        return self.memoizado('texto_detalle', lambda: "".join(
+            f"· {l.codigo} {int(l.cantidad)} {l.descripcion}\n" for l in self.lineas))
+
+    def a_productos(self, lista):
+        """Dicts para el historial, con el precio unitario de la lista con que se guarda."""
+        i = self.motor.indice(lista)
+        return [{'codigo': l.codigo, 'descripcion': l.descripcion, 'cantidad': l.cantidad,
+                 'precio_base': l.precio_base, 'precio_unitario': l.precios[i]} for l in self.lineas]
+
+    def cantidades(self):
+        """[{'codigo', 'cantidad'}] para armar el pedido al servidor."""
+        return self.memoizado('cantidades', lambda: [
+            {'codigo': l.codigo, 'cantidad': l.cantidad} for l in self.lineas])
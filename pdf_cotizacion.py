@@ -0,0 +1,212 @@
+"""Generación del PDF de cotización, con caché LRU por contenido.
+
+Los logos se preparan una vez por proceso (reducidos a la resolución de
+impresión y en JPEG) y el encabezado vive en una plantilla FPDF.
+
+El PDF se arma sólo cuando el usuario pide la descarga, y dos cotizaciones con
+las mismas líneas, cliente, tipo de documento, lista y fecha comparten los bytes
+ya generados.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+from fpdf import FPDF
+from PIL import Image
+
+TAMANO_CACHE_PDF = 64
+COLUMNAS_PDF = ['codigo', 'descripcion', 'cantidad', 'precio_unitario', 'Subtotal']
+
+_cache_pdf = OrderedDict()
+_lock_cache = threading.Lock()
+
+
+# --- LOGOS Y PLANTILLA ---
+
+# (archivo, x, y, ancho en mm) de cada logo del encabezado
+LOGOS_PDF = [
+    ("logo_tepalcates.png", 10, 8, 35),
+    ("logo_truper_completo.png", 165, 8, 35),  # Asegúrate de que tu imagen nueva se llame así
+]
+DPI_LOGOS = 300
+
+
+@lru_cache(maxsize=None)
+def preparar_logos():
+    """Lee, reduce y convierte a JPEG los logos una sola vez por proceso.
+
+    FPDF incrusta un JPEG tal cual, sin decodificar ni recomprimir, así que
+    cada documento sólo copia unos KB en lugar de procesar los PNG completos.
+    """
+    logos = []
+    for archivo, x, y, ancho in LOGOS_PDF:
+        try:
+            imagen = Image.open(archivo).convert('RGB')
+        except FileNotFoundError:
+            continue
+        ancho_px = round(ancho / 25.4 * DPI_LOGOS)
+        if imagen.width > ancho_px:
+            imagen = imagen.resize((ancho_px, round(imagen.height * ancho_px / imagen.width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        imagen.save(buffer, format='JPEG', quality=90)
+        logos.append((buffer.getvalue(), x, y, ancho))
+    return tuple(logos)
+
+
+class PlantillaCotizacion(FPDF):
+    """Encabezado fijo (logos y título); cada cotización sólo estampa sus datos."""
+
+    def header(self):
+        for datos, x, y, ancho in preparar_logos():
+            self.image(io.BytesIO(datos), x=x, y=y, w=ancho)
+
+        # TÍTULO SIMPLIFICADO
+        self.set_font("Arial", 'B', 16)
+        self.cell(200, 10, txt="Cotización", ln=True, align='C')
+        self.ln(15)
+
+
+# (ancho, título) de las columnas de la tabla
+COLUMNAS_TABLA = [(30, "Código"), (90, "Descripción"), (20, "Cant."), (25, "P. Unit"), (25, "Subt.")]
+ALTO_RENGLON = 8
+ALTO_SUBTOTAL = 7
+MARGEN_INFERIOR = 15
+
+
+def renglones_de_df(df):
+    """Tuplas (codigo, descripcion, cantidad, precio_unitario, subtotal) sin crear una Series por fila."""
+    return df[COLUMNAS_PDF].itertuples(index=False, name=None)
+
+
+def _encabezado_tabla(pdf):
+    pdf.set_font("Arial", 'B', 10)
+    for ancho, titulo in COLUMNAS_TABLA:
+        pdf.cell(ancho, 10, titulo, 1)
+    pdf.ln()
+    pdf.set_font("Arial", size=9)
+
+
+def _cerrar_tabla(pdf, x_columnas, y_inicio, y_fin):
+    """Verticales de la tabla de la hoja, de un solo trazo, y el cursor debajo."""
+    if y_fin > y_inicio:
+        for x in x_columnas:
+            pdf.line(x, y_inicio, x, y_fin)
+    pdf.set_y(y_fin)
+
+
+def _subtotal_hoja(pdf, hoja, subtotal, acumulado):
+    pdf.set_font("Arial", 'B', 9)
+    pdf.cell(165, ALTO_SUBTOTAL, f"Subtotal hoja {hoja}   (acumulado ${acumulado:,.2f})", 1, align='R')
+    pdf.cell(25, ALTO_SUBTOTAL, f"${subtotal:,.2f}", 1)
+    pdf.ln()
+    pdf.set_font("Arial", size=9)
+
+
+def generar_pdf_lineas(lineas, cliente, tipo_doc, lista, total=None):
+    """Genera el PDF consumiendo `lineas` como iterador, sin pasar por pandas.
+
+    Cada línea es (codigo, descripcion, cantidad, precio_unitario, subtotal).
+    Al llenarse una hoja se imprime su subtotal y el acumulado, y la siguiente
+    repite el encabezado de la tabla. Si no se da `total`, se usa el acumulado.
+    """
+    pdf = PlantillaCotizacion()
+    pdf.set_auto_page_break(False)
+    pdf.add_page()
+
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 8, txt=f"Cliente: {cliente}", ln=True)
+    pdf.cell(200, 8, txt=f"Tipo: {tipo_doc}", ln=True)
+    pdf.cell(200, 8, txt=f"Lista: {lista}", ln=True)
+    pdf.cell(200, 8, txt=f"Fecha: {datetime.now().strftime('%d/%m/%Y')}", ln=True)
+    pdf.ln(10)
+    _encabezado_tabla(pdf)
+
+    # Los renglones se dibujan con text() y líneas sueltas: cell() recalcula
+    # fuentes y saltos de línea en cada llamada y domina el tiempo en miles de filas
+    x_columnas = [pdf.l_margin]
+    for ancho, _ in COLUMNAS_TABLA:
+        x_columnas.append(x_columnas[-1] + ancho)
+    x_textos = [x + pdf.c_margin for x in x_columnas[:-1]]
+    ajuste_base = ALTO_RENGLON / 2 + 0.3 * pdf.font_size
+
+    limite = pdf.h - MARGEN_INFERIOR - ALTO_SUBTOTAL
+    hoja, subtotal_hoja, acumulado = 1, 0.0, 0.0
+    inicio_tabla = y = pdf.get_y()
+    for codigo, descripcion, cantidad, precio_unitario, subtotal in lineas:
+        if y + ALTO_RENGLON > limite:
+            _cerrar_tabla(pdf, x_columnas, inicio_tabla, y)
+            _subtotal_hoja(pdf, hoja, subtotal_hoja, acumulado)
+            pdf.add_page()
+            _encabezado_tabla(pdf)
+            hoja, subtotal_hoja = hoja + 1, 0.0
+            inicio_tabla = y = pdf.get_y()
+        base = y + ajuste_base
+        pdf.text(x_textos[0], base, str(codigo))
+        pdf.text(x_textos[1], base, str(descripcion)[:45])
+        pdf.text(x_textos[2], base, str(int(cantidad)))
+        pdf.text(x_textos[3], base, f"${precio_unitario:,.2f}")
+        pdf.text(x_textos[4], base, f"${subtotal:,.2f}")
+        y += ALTO_RENGLON
+        pdf.line(x_columnas[0], y, x_columnas[-1], y)
+        subtotal_hoja += subtotal
+        acumulado += subtotal
+    _cerrar_tabla(pdf, x_columnas, inicio_tabla, y)
+
+    if hoja > 1:
+        _subtotal_hoja(pdf, hoja, subtotal_hoja, acumulado)
+    if total is None:
+        total = acumulado
+
+    # Total y leyenda juntos; si no caben, pasan a una hoja nueva
+    if pdf.get_y() + 35 > pdf.h - MARGEN_INFERIOR:
+        pdf.add_page()
+    pdf.ln(5)
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(200, 10, txt=f"TOTAL: ${total:,.2f}", ln=True, align='R')
+    
+    pdf.ln(10) 
+    pdf.set_font("Arial", 'I', 10) 
+    pdf.cell(200, 10, txt="Válida únicamente durante el mes de emisión de este documento.", ln=True, align='C')
+    
+    try:
+        return bytes(pdf.output())
+    except TypeError:
+        return pdf.output(dest='S').encode('latin-1')
+    except AttributeError:
+        return pdf.output()
+
+
+def generar_pdf(df, cliente, tipo_doc, lista, total):
+    return generar_pdf_lineas(renglones_de_df(df), cliente, tipo_doc, lista, total)
+
+def huella_cotizacion(renglones, cliente, tipo_doc, lista, total, fecha):
+    """Hash del contenido que termina impreso en el PDF."""
+    h = hashlib.sha256()
+    h.update(json.dumps([cliente, tipo_doc, lista, round(float(total), 2), fecha]).encode('utf-8'))
+    h.update(json.dumps(renglones, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def generar_pdf_cacheado(renglones, cliente, tipo_doc, lista, total):
+    """`generar_pdf_lineas` memoizado en un LRU acotado compartido por todas las sesiones.
+
+    `renglones` es una lista de tuplas (codigo, descripcion, cantidad, precio_unitario, subtotal).
+    """
+    clave = huella_cotizacion(renglones, cliente, tipo_doc, lista, total, datetime.now().strftime('%d/%m/%Y'))
+    with _lock_cache:
+        if clave in _cache_pdf:
+            _cache_pdf.move_to_end(clave)
+            return _cache_pdf[clave]
+
+    pdf_bytes = generar_pdf_lineas(renglones, cliente, tipo_doc, lista, total)
+
+    with _lock_cache:
+        _cache_pdf[clave] = pdf_bytes
+        _cache_pdf.move_to_end(clave)
+        while len(_cache_pdf) > TAMANO_CACHE_PDF:
+            _cache_pdf.popitem(last=False)
+    return pdf_bytes
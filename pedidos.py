@@ -0,0 +1,231 @@
+"""Buzón de salida (outbox) para los pedidos que se mandan al servidor de Render.
+
+Al presionar "Convertir a Pedido" el pedido se escribe primero en SQLite con
+una clave (una por cotización y versión, así que un doble clic no lo duplica)
+y la sesión sigue sin esperar a la red. Un hilo de fondo lo entrega con el
+cliente compartido de `servidor` (conexiones reutilizadas). La UI sólo
+consulta el estado por la clave.
+
+Sólo se reintenta automáticamente lo que seguro no creó el pedido: errores de conexión
+antes de mandar la petición y respuestas 5xx/408/425/429, con backoff
+exponencial. Si la respuesta se pierde después de mandar el POST (timeout de
+lectura, conexión cortada, 201 sin folio) el servidor pudo haberlo creado, y
+server.js no deduplica por `Idempotency-Key`: el pedido queda `incierto` y
+sólo se reenvía a mano, después de revisar el ERP.
+
+Estados: pendiente -> enviado (con folio) | rechazado (4xx) | incierto |
+fallido (se agotaron los intentos). Los pendientes sobreviven a un reinicio
+de la app.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+import basedatos
+import servidor
+
+ARCHIVO_BUZON = "pedidos_pendientes.db"
+
+# Un POST que llega con el servicio dormido espera el arranque en frío; con menos
+# tiempo el primer pedido tras la siesta terminaría en timeout de lectura (incierto)
+TIMEOUT_ENVIO = servidor.TIMEOUT_CALENTAR
+BACKOFF_INICIAL = 2.0
+BACKOFF_MAXIMO = 300.0
+MAX_INTENTOS = 10
+# Respuestas 4xx que sí vale la pena reintentar
+CODIGOS_REINTENTABLES = {408, 425, 429}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pedidos (
+    clave TEXT PRIMARY KEY,
+    creado TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    siguiente_intento REAL NOT NULL DEFAULT 0,
+    folio TEXT,
+    error TEXT,
+    actualizado TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pedidos_pendientes ON pedidos (estado, siguiente_intento);
+"""
+
+COLUMNAS_ESTADO = ['clave', 'creado', 'estado', 'intentos', 'siguiente_intento', 'folio', 'error', 'actualizado']
+
+
+def armar_payload(nombre_cliente, id_vendedor, id_cliente, cotizacion):
+    """Traduce la cotización al formato exacto que pide el server.js."""
+    productos_formateados = []
+    for item in cotizacion:
+        productos_formateados.append({
+            "key": item["codigo"],        # server.js busca 'key'
+            "quantity": item["cantidad"], # server.js busca 'quantity'
+            "cve_suc": "PED",
+            "cve_mon": 1,
+            "lugar": "A2"                 # Forzando almacén A2 por defecto
+        })
+    return {
+        "clientName": nombre_cliente,
+        "agentId": id_vendedor,
+        "clientId": id_cliente,
+        "products": productos_formateados
+    }
+
+
+def clave_idempotencia(payload, origen):
+    """Clave del pedido. `origen` identifica el intento (p. ej. cotización y versión): el mismo
+    origen con el mismo payload da la misma clave; otro pedido igual más tarde, otra."""
+    contenido = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{origen}|{contenido}".encode('utf-8')).hexdigest()[:32]
+
+
+def sin_enviar(error):
+    """True si la petición seguro no llegó al servidor (no conectó), así que reintentar no duplica."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', error.args[0]), NewConnectionError)
+    return False
+
+
+def _ahora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class BuzonPedidos:
+    """Outbox persistente más el hilo que lo vacía. Una instancia por proceso."""
+
+    def __init__(self, ruta_db=ARCHIVO_BUZON, cliente=None, timeout=TIMEOUT_ENVIO,
+                 backoff_inicial=BACKOFF_INICIAL, backoff_maximo=BACKOFF_MAXIMO, max_intentos=MAX_INTENTOS):
+        self.ruta_db = ruta_db
+        self.cliente = cliente or servidor.cliente_compartido()
+        self.timeout = timeout
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self.max_intentos = max_intentos
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.executescript(ESQUEMA)
+
+    def _conectar(self):
+        return basedatos.conectar(self.ruta_db)
+
+    # --- Lado de la UI ---
+
+    def encolar(self, payload, clave=None):
+        """Guarda el pedido y regresa su clave. Si la clave ya existía no se duplica."""
+        clave = clave or clave_idempotencia(payload, uuid.uuid4().hex)
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute(
+                "INSERT OR IGNORE INTO pedidos (clave, creado, payload, actualizado) VALUES (?, ?, ?, ?)",
+                (clave, _ahora(), json.dumps(payload, ensure_ascii=False), _ahora()))
+        self._despertar.set()
+        return clave
+
+    def estado(self, clave):
+        """Dict con estado, intentos, folio y último error; None si la clave no existe."""
+        with closing(self._conectar()) as conexion:
+            fila = conexion.execute(
+                f"SELECT {', '.join(COLUMNAS_ESTADO)} FROM pedidos WHERE clave = ?", (clave,)).fetchone()
+        return dict(zip(COLUMNAS_ESTADO, fila)) if fila else None
+
+    def reintentar(self, clave):
+        """Regresa a pendiente un pedido rechazado, incierto o fallido (p. ej. tras revisarlo en el ERP)."""
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute(
+                "UPDATE pedidos SET estado = 'pendiente', intentos = 0, siguiente_intento = 0, actualizado = ? "
+                "WHERE clave = ? AND estado IN ('rechazado', 'incierto', 'fallido')", (_ahora(), clave))
+        self._despertar.set()
+
+    def pendientes(self):
+        with closing(self._conectar()) as conexion:
+            return conexion.execute("SELECT COUNT(*) FROM pedidos WHERE estado = 'pendiente'").fetchone()[0]
+
+    # --- Hilo de entrega ---
+
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ciclo, name="buzon-pedidos", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, timeout=5):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            espera = self.procesar_pendientes()
+            self._despertar.wait(espera)
+            self._despertar.clear()
+
+    def procesar_pendientes(self):
+        """Entrega lo que ya toca reintentar. Regresa cuántos segundos dormir."""
+        while not self._detener.is_set():
+            with closing(self._conectar()) as conexion:
+                fila = conexion.execute(
+                    "SELECT clave, payload, intentos FROM pedidos WHERE estado = 'pendiente' "
+                    "AND siguiente_intento <= ? ORDER BY siguiente_intento, creado LIMIT 1",
+                    (time.time(),)).fetchone()
+                proximo = conexion.execute(
+                    "SELECT MIN(siguiente_intento) FROM pedidos WHERE estado = 'pendiente'").fetchone()[0]
+            if fila is None:
+                return max(0.0, proximo - time.time()) if proximo is not None else None
+            self._entregar(*fila)
+        return None
+
+    def _entregar(self, clave, payload, intentos):
+        intentos += 1
+        try:
+            respuesta = self.cliente.post(
+                servidor.RUTA_CREAR_PEDIDO, data=payload.encode('utf-8'), timeout=self.timeout,
+                headers={"Content-Type": "application/json", "Idempotency-Key": clave})
+        except requests.exceptions.RequestException as e:
+            if sin_enviar(e):
+                self._reprogramar(clave, intentos, f"{type(e).__name__}: {e}")
+            else:
+                # El POST pudo haber llegado: reenviarlo solo podría duplicar el pedido en el ERP
+                self._actualizar(clave, estado='incierto', intentos=intentos, error=f"{type(e).__name__}: {e}")
+            return
+
+        if respuesta.status_code == 201:
+            try:
+                folio = str(respuesta.json()["folio"])
+            except (ValueError, KeyError, TypeError):
+                self._actualizar(clave, estado='incierto', intentos=intentos,
+                                 error=f"Respuesta 201 sin folio: {respuesta.text[:200]}")
+                return
+            self._actualizar(clave, estado='enviado', intentos=intentos, folio=folio, error=None)
+        elif respuesta.status_code < 500 and respuesta.status_code not in CODIGOS_REINTENTABLES:
+            self._actualizar(clave, estado='rechazado', intentos=intentos,
+                             error=f"{respuesta.status_code}: {respuesta.text[:500]}")
+        else:
+            self._reprogramar(clave, intentos, f"{respuesta.status_code}: {respuesta.text[:200]}")
+
+    def _reprogramar(self, clave, intentos, error):
+        if intentos >= self.max_intentos:
+            self._actualizar(clave, estado='fallido', intentos=intentos, error=error)
+            return
+        # Backoff exponencial con jitter para no despertar al servidor todos a la vez
+        espera = min(self.backoff_maximo, self.backoff_inicial * 2 ** (intentos - 1))
+        espera *= random.uniform(0.8, 1.2)
+        self._actualizar(clave, intentos=intentos, error=error, siguiente_intento=time.time() + espera)
+
+    def _actualizar(self, clave, **campos):
+        campos['actualizado'] = _ahora()
+        asignaciones = ', '.join(f"{campo} = ?" for campo in campos)
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute(f"UPDATE pedidos SET {asignaciones} WHERE clave = ?", (*campos.values(), clave))
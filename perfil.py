@@ -0,0 +1,195 @@
+"""Tiempos por etapa de cada rerun, por sesión.
+
+Se enciende por sesión abriendo la app con `?perfil=<clave>`, donde la clave
+es la de COTIZADOR_PERFIL_CLAVE (sin esa variable no hay forma de encenderlo
+desde la URL), o para todas las sesiones con COTIZADOR_PERFIL=1. Apagado casi no cuesta: `etapa()` regresa un contexto
+vacío y las funciones decoradas con `medido` sólo consultan una ContextVar
+antes de llamar a la original.
+
+Cada sesión lleva un `Perfilador` con un histograma por etapa; el panel de la
+app muestra p50/p95/p99 y las muestras se exportan como JSON-lines (una por
+medición) para comparar antes y después de un cambio. Con
+COTIZADOR_PERFIL_LOG=ruta.jsonl cada rerun se agrega a ese archivo; al pasar
+de COTIZADOR_PERFIL_LOG_MAX_MB (50 por omisión) se rota a `ruta.jsonl.1`.
+"""
+import bisect
+import contextvars
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+ACTIVO_PARA_TODOS = os.environ.get("COTIZADOR_PERFIL") == "1"
+CLAVE = os.environ.get("COTIZADOR_PERFIL_CLAVE", "")
+ARCHIVO_LOG = os.environ.get("COTIZADOR_PERFIL_LOG") or "perfil_reruns.jsonl"
+EXPORTAR_CADA_RERUN = bool(os.environ.get("COTIZADOR_PERFIL_LOG"))
+MAX_BYTES_LOG = int(float(os.environ.get("COTIZADOR_PERFIL_LOG_MAX_MB") or 50) * 1024 * 1024)
+MAX_MUESTRAS = 1000
+# Límites superiores (ms) de las cubetas del histograma; la última es "más de"
+CUBETAS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+_actual = contextvars.ContextVar('perfilador', default=None)
+_NULO = nullcontext()
+
+
+def habilitado(clave_url):
+    """Si la sesión puede usar el perfil: para todas con COTIZADOR_PERFIL=1, o con `?perfil=<clave>`."""
+    if ACTIVO_PARA_TODOS:
+        return True
+    return bool(CLAVE) and bool(clave_url) and hmac.compare_digest(str(clave_url), CLAVE)
+
+
+def percentil(ordenadas, p):
+    """Percentil `p` (vecino más cercano) de una lista ya ordenada; None si está vacía."""
+    if not ordenadas:
+        return None
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))]
+
+
+class HistogramaEtapa:
+    """Cubetas fijas de latencia más las últimas `MAX_MUESTRAS` muestras para los percentiles."""
+
+    def __init__(self):
+        self.cubetas = [0] * (len(CUBETAS_MS) + 1)
+        self.muestras = deque(maxlen=MAX_MUESTRAS)
+        self.llamadas = 0
+        self.total_ms = 0.0
+
+    def registrar(self, ms):
+        self.llamadas += 1
+        self.total_ms += ms
+        self.cubetas[bisect.bisect_left(CUBETAS_MS, ms)] += 1
+        self.muestras.append(ms)
+
+    def resumen(self):
+        ordenadas = sorted(self.muestras)
+        return {'llamadas': self.llamadas, 'total_ms': self.total_ms, 'p50_ms': percentil(ordenadas, 50),
+                'p95_ms': percentil(ordenadas, 95), 'p99_ms': percentil(ordenadas, 99),
+                'max_ms': ordenadas[-1] if ordenadas else None}
+
+    def histograma(self):
+        """[(etiqueta, cuenta)] por cubeta."""
+        etiquetas = [f"≤{limite:g} ms" for limite in CUBETAS_MS] + [f">{CUBETAS_MS[-1]:g} ms"]
+        return list(zip(etiquetas, self.cubetas))
+
+
+class Perfilador:
+    """Histogramas por etapa de una sesión y las muestras aún no exportadas."""
+
+    def __init__(self, sesion=None):
+        self.sesion = sesion or uuid.uuid4().hex[:8]
+        self.etapas = {}
+        self.rerun = 0
+        self._pendientes = deque(maxlen=MAX_MUESTRAS * 10)
+        self._candado = threading.Lock()
+
+    def registrar(self, etapa, ms):
+        with self._candado:
+            self.etapas.setdefault(etapa, HistogramaEtapa()).registrar(ms)
+            self._pendientes.append((time.time(), self.rerun, etapa, ms))
+
+    def resumen(self):
+        """{etapa: {llamadas, total_ms, p50_ms, p95_ms, p99_ms, max_ms}}, de la más lenta a la más rápida."""
+        with self._candado:
+            resumen = {etapa: h.resumen() for etapa, h in self.etapas.items()}
+        return dict(sorted(resumen.items(), key=lambda e: -e[1]['total_ms']))
+
+    def histograma(self, etapa):
+        with self._candado:
+            return self.etapas[etapa].histograma() if etapa in self.etapas else []
+
+    def a_jsonl(self):
+        """Las muestras pendientes como JSON-lines, sin marcarlas como exportadas."""
+        with self._candado:
+            pendientes = list(self._pendientes)
+        return "".join(json.dumps({'ts': round(ts, 3), 'sesion': self.sesion, 'rerun': rerun, 'etapa': etapa,
+                                   'ms': round(ms, 3)}, ensure_ascii=False) + "\n"
+                       for ts, rerun, etapa, ms in pendientes)
+
+    def exportar(self, ruta=ARCHIVO_LOG, max_bytes=MAX_BYTES_LOG):
+        """Agrega las muestras pendientes a `ruta` y las descarta. Regresa cuántas escribió.
+
+        Si el archivo pasaría de `max_bytes` se rota antes a `ruta.1` (se pierde la rotación anterior).
+        """
+        contenido = self.a_jsonl()
+        if contenido:
+            try:
+                if os.path.getsize(ruta) + len(contenido.encode('utf-8')) > max_bytes:
+                    os.replace(ruta, f"{ruta}.1")
+            except FileNotFoundError:
+                pass
+            with open(ruta, 'a', encoding='utf-8') as f:
+                f.write(contenido)
+        escritas = contenido.count("\n")
+        with self._candado:
+            for _ in range(min(escritas, len(self._pendientes))):
+                self._pendientes.popleft()
+        return escritas
+
+    def reiniciar(self):
+        with self._candado:
+            self.etapas = {}
+            self._pendientes.clear()
+
+
+class _Medicion:
+    __slots__ = ('perfilador', 'etapa', 'inicio')
+
+    def __init__(self, perfilador, etapa):
+        self.perfilador = perfilador
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        # También cuenta si la etapa terminó en st.rerun() o en un error
+        self.perfilador.registrar(self.etapa, (time.perf_counter() - self.inicio) * 1000)
+        return False
+
+
+def activar(perfilador):
+    """Fija el perfilador de la sesión para el rerun en curso (None lo apaga)."""
+    _actual.set(perfilador)
+    if perfilador is not None:
+        perfilador.rerun += 1
+
+
+def actual():
+    """El perfilador del rerun en curso, o None."""
+    return _actual.get()
+
+
+def etapa(nombre):
+    """Context manager que mide el bloque como `nombre`; vacío si el perfil está apagado."""
+    perfilador = _actual.get()
+    if perfilador is None:
+        return _NULO
+    return _Medicion(perfilador, nombre)
+
+
+def registrar(nombre, ms):
+    """Registra una medición hecha por fuera (p. ej. la latencia de un endpoint)."""
+    perfilador = _actual.get()
+    if perfilador is not None:
+        perfilador.registrar(nombre, ms)
+
+
+def medido(nombre):
+    """Decorador: mide cada llamada como `nombre` cuando el perfil está encendido."""
+    def decorar(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            perfilador = _actual.get()
+            if perfilador is None:
+                return funcion(*args, **kwargs)
+            with _Medicion(perfilador, nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorar
@@ -0,0 +1,167 @@
+"""Recotización del historial contra el catálogo vigente.
+
+Las cotizaciones guardadas conservan los precios con que se hicieron. Cuando
+cambia `precios_actualizados.txt`, esto cruza todas las líneas del historial
+con las columnas precalculadas del catálogo (`listas_precios.TablaPrecios`)
+en una sola pasada vectorizada y reporta qué quedó desactualizado:
+
+    python recotizar.py                       # resumen en pantalla
+    python recotizar.py --reporte cambios/    # CSV de cotizaciones, líneas y códigos faltantes
+    python recotizar.py --guardar             # además reescribe las cotizaciones que cambiaron
+
+Las líneas con códigos que ya no están en el catálogo, o de cotizaciones con
+una lista de precios que ya no existe, conservan su precio guardado en el
+total nuevo; las primeras se listan aparte. `--guardar` reescribe el
+`precio_base` y `precio_unitario` de cada línea junto con el total, así que
+"Cargar al Editor" muestra los precios nuevos y una segunda corrida ya no
+encuentra cambios.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import catalogo
+import historial
+import listas_precios
+
+# Diferencias menores a medio centavo son redondeo, no cambios de precio
+TOLERANCIA = 0.005
+
+
+class ReporteRecotizacion:
+    """Resultado de `recotizar`: cuatro DataFrames y el número de líneas revisadas.
+
+    cotizaciones      las que cambiaron: total guardado, total nuevo, diferencia,
+                      líneas cambiadas y códigos faltantes
+    lineas_cambiadas  id, código, cantidad, precio guardado y precio nuevo
+    faltantes         id, código, descripción y cantidad de los códigos que ya no están
+    lineas_nuevas     todas las líneas (en orden) de las cotizaciones con precios nuevos,
+                      con `precio_base` y `precio_unitario` ya recotizados
+    """
+
+    def __init__(self, cotizaciones, lineas_cambiadas, faltantes, lineas_nuevas, lineas_revisadas,
+                 cotizaciones_revisadas):
+        self.cotizaciones = cotizaciones
+        self.lineas_cambiadas = lineas_cambiadas
+        self.faltantes = faltantes
+        self.lineas_nuevas = lineas_nuevas
+        self.lineas_revisadas = lineas_revisadas
+        self.cotizaciones_revisadas = cotizaciones_revisadas
+
+    def totales_nuevos(self):
+        """{id: total nuevo} de las cotizaciones cuyo total cambió."""
+        cambiaron = self.cotizaciones[self.cotizaciones['diferencia'].abs() > TOLERANCIA]
+        return dict(zip(cambiaron['id'], cambiaron['total_nuevo']))
+
+    def cambios(self):
+        """{id: (total nuevo, productos)} para `historial.actualizar_recotizadas`."""
+        totales = dict(zip(self.cotizaciones['id'], self.cotizaciones['total_nuevo']))
+        productos = {}
+        for linea in self.lineas_nuevas.to_dict('records'):
+            cot_id = linea.pop('id')
+            if linea['precio_base'] != linea['precio_base']:
+                linea['precio_base'] = None  # registros viejos sin precio_base y código ya fuera del catálogo
+            productos.setdefault(cot_id, []).append(linea)
+        return {cot_id: (totales[cot_id], lineas) for cot_id, lineas in productos.items()}
+
+    def resumen(self):
+        diferencia = self.cotizaciones['diferencia'].sum() if not self.cotizaciones.empty else 0.0
+        return (f"{self.cotizaciones_revisadas} cotizaciones ({self.lineas_revisadas} líneas) revisadas: "
+                f"{len(self.totales_nuevos())} con total distinto, {len(self.lineas_cambiadas)} líneas con "
+                f"precio nuevo, {len(self.faltantes)} líneas con códigos fuera del catálogo. "
+                f"Diferencia total: ${diferencia:,.2f}")
+
+    def escribir(self, carpeta):
+        os.makedirs(carpeta, exist_ok=True)
+        self.cotizaciones.to_csv(os.path.join(carpeta, "cotizaciones.csv"), index=False)
+        self.lineas_cambiadas.to_csv(os.path.join(carpeta, "lineas_cambiadas.csv"), index=False)
+        self.faltantes.to_csv(os.path.join(carpeta, "faltantes.csv"), index=False)
+
+
+def recotizar(lineas, tabla_precios):
+    """Compara las `lineas` del historial (`historial.leer_lineas`) con los precios de `tabla_precios`."""
+    df = pd.DataFrame.from_records(lineas, columns=historial.COLUMNAS_LINEAS)
+    motor = tabla_precios.motor
+    n = len(df)
+    codigos = df['codigo'].fillna("").tolist()
+    cantidades = pd.to_numeric(df['cantidad'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    # Columna de la lista con que se guardó cada cotización; -1 si la lista ya no existe
+    columna = df['lista_precios'].map({nombre: i for i, nombre in enumerate(motor.nombres)})
+    lista_conocida = columna.notna().to_numpy()
+    columna = columna.fillna(0).astype(np.int64).to_numpy()
+    filas = np.arange(n)
+
+    guardado = pd.to_numeric(df['precio_unitario'], errors='coerce').to_numpy(dtype=np.float64)
+    sin_unitario = np.isnan(guardado)
+    if sin_unitario.any():
+        # Registros viejos sin `precio_unitario`: se recalcula del `precio_base` guardado
+        base = pd.to_numeric(df['precio_base'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        calculado = motor.calcular(base[sin_unitario], [c for c, s in zip(codigos, sin_unitario) if s],
+                                   cantidades[sin_unitario])
+        guardado[sin_unitario] = calculado[np.arange(sin_unitario.sum()), columna[sin_unitario]]
+
+    nuevo = tabla_precios.precios_lote(codigos, cantidades)[filas, columna]
+    faltante = np.isnan(nuevo)
+    conserva = faltante | ~lista_conocida
+    nuevo = np.where(conserva, guardado, nuevo)
+    cambiada = np.abs(nuevo - guardado) > TOLERANCIA
+    base_guardada = pd.to_numeric(df['precio_base'], errors='coerce').to_numpy(dtype=np.float64)
+    base_nueva = np.where(conserva, base_guardada, tabla_precios.precios_base_lote(codigos))
+
+    # Totales por cotización en bloque
+    posicion, ids = pd.factorize(df['id'])
+    total_nuevo = np.bincount(posicion, weights=cantidades * nuevo, minlength=len(ids))
+    cotizaciones = df.drop_duplicates('id')[['id', 'fecha', 'cliente', 'lista_precios', 'total']].rename(
+        columns={'total': 'total_guardado'}).reset_index(drop=True)
+    cotizaciones['total_nuevo'] = np.round(total_nuevo, 2)
+    cotizaciones['diferencia'] = np.round(cotizaciones['total_nuevo'] - cotizaciones['total_guardado'], 2)
+    cotizaciones['lineas_cambiadas'] = np.bincount(posicion, weights=cambiada, minlength=len(ids)).astype(int)
+    cotizaciones['codigos_faltantes'] = np.bincount(posicion, weights=faltante, minlength=len(ids)).astype(int)
+    cotizaciones = cotizaciones[(cotizaciones['diferencia'].abs() > TOLERANCIA) | (cotizaciones['lineas_cambiadas'] > 0)
+                                | (cotizaciones['codigos_faltantes'] > 0)].reset_index(drop=True)
+
+    lineas_cambiadas = df.loc[cambiada, ['id', 'codigo', 'descripcion', 'cantidad']].assign(
+        precio_guardado=guardado[cambiada], precio_nuevo=nuevo[cambiada]).reset_index(drop=True)
+    faltantes = df.loc[faltante, ['id', 'codigo', 'descripcion', 'cantidad']].reset_index(drop=True)
+    # Las cotizaciones con precios nuevos se reescriben completas, con sus líneas en el orden guardado
+    reescribir = df['id'].isin(cotizaciones.loc[(cotizaciones['diferencia'].abs() > TOLERANCIA)
+                                                | (cotizaciones['lineas_cambiadas'] > 0), 'id']).to_numpy()
+    lineas_nuevas = df.loc[reescribir, ['id', 'codigo', 'descripcion', 'cantidad']].assign(
+        precio_base=base_nueva[reescribir], precio_unitario=nuevo[reescribir]).reset_index(drop=True)
+    return ReporteRecotizacion(cotizaciones, lineas_cambiadas, faltantes, lineas_nuevas, n, len(ids))
+
+
+def recotizar_historial(df_catalogo, motor=None, ruta_db=historial.ARCHIVO_HISTORIAL_DB):
+    """`recotizar` sobre todo el historial con el catálogo `df_catalogo`."""
+    tabla_precios = (motor or listas_precios.motor_predeterminado()).precalcular(df_catalogo)
+    return recotizar(historial.leer_lineas(ruta_db), tabla_precios)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalogo", default=catalogo.ARCHIVO_CATALOGO)
+    parser.add_argument("--actualizaciones", default=catalogo.ARCHIVO_ACTUALIZACIONES)
+    parser.add_argument("--db", default=historial.ARCHIVO_HISTORIAL_DB)
+    parser.add_argument("--reporte", help="Carpeta donde escribir los CSV del reporte")
+    parser.add_argument("--guardar", action="store_true", help="Reescribir las líneas y totales que cambiaron")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    historial.inicializar(args.db)
+    reporte = recotizar_historial(catalogo.cargar_catalogo(args.catalogo, args.actualizaciones), ruta_db=args.db)
+    print(f"{reporte.resumen()} ({time.perf_counter() - inicio:.2f} s)")
+    if args.reporte:
+        reporte.escribir(args.reporte)
+        print(f"Reporte en {args.reporte}")
+    if args.guardar:
+        print(f"{historial.actualizar_recotizadas(reporte.cambios(), args.db)} cotizaciones reescritas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
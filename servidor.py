@@ -0,0 +1,133 @@
+"""Cliente HTTP compartido para el servidor de pedidos/folios en Render.
+
+Una sola `requests.Session` por proceso (pool de conexiones keep-alive), así
+que DNS y TLS se pagan una vez y no en cada pedido. Render duerme el servidor
+tras un rato sin tráfico; `calentar()` lo despierta en segundo plano al abrir
+la app o al empezar una cotización, para que "Convertir a Pedido" no pague el
+arranque en frío. Cada llamada registra su latencia por endpoint.
+"""
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import perfil
+
+# SERVIDOR_PEDIDOS_URL permite apuntar a un servidor local para pruebas
+URL_SERVIDOR = os.environ.get("SERVIDOR_PEDIDOS_URL", "https://servidor-pedidos.onrender.com")
+RUTA_FOLIO = "/api/folio-actual"
+RUTA_CREAR_PEDIDO = "/api/crear-pedido"
+
+TAMANO_POOL = 10
+TIMEOUT_CALENTAR = 90    # el arranque en frío de Render puede pasar del minuto
+TIMEOUT_FOLIO = 15
+# Render duerme el servicio gratuito tras ~15 min sin tráfico
+VIGENCIA_CALENTADO = 10 * 60
+MAX_MUESTRAS = 1000
+
+
+class MetricasEndpoint:
+    """Latencias (ms) de las últimas `MAX_MUESTRAS` llamadas a un endpoint."""
+
+    def __init__(self):
+        self.muestras = []
+        self.llamadas = 0
+        self.errores = 0
+
+    def registrar(self, ms, error):
+        self.llamadas += 1
+        self.errores += error
+        self.muestras.append(ms)
+        if len(self.muestras) > MAX_MUESTRAS:
+            del self.muestras[:len(self.muestras) - MAX_MUESTRAS]
+
+    def resumen(self):
+        ordenadas = sorted(self.muestras)
+        return {'llamadas': self.llamadas, 'errores': self.errores, 'p50_ms': perfil.percentil(ordenadas, 50),
+                'p95_ms': perfil.percentil(ordenadas, 95), 'max_ms': ordenadas[-1] if ordenadas else None}
+
+
+class ClienteServidor:
+    """Sesión con pool hacia el servidor de pedidos, con calentamiento y métricas."""
+
+    def __init__(self, url_base=URL_SERVIDOR, tamano_pool=TAMANO_POOL):
+        self.url_base = url_base.rstrip('/')
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamano_pool)
+        self.sesion.mount("http://", adaptador)
+        self.sesion.mount("https://", adaptador)
+        self.metricas = {}
+        self.ultimo_contacto = 0.0
+        self._candado = threading.Lock()
+        self._calentando = None
+
+    def solicitar(self, metodo, ruta, **kwargs):
+        """Como `Session.request`, pero mide la latencia del endpoint `ruta`."""
+        inicio = time.perf_counter()
+        error = True
+        try:
+            respuesta = self.sesion.request(metodo, f"{self.url_base}{ruta}", **kwargs)
+            error = respuesta.status_code >= 500
+            # Cualquier respuesta, aunque sea de error, indica que el servidor ya despertó
+            self.ultimo_contacto = time.time()
+            return respuesta
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            with self._candado:
+                self.metricas.setdefault(f"{metodo} {ruta}", MetricasEndpoint()).registrar(ms, error)
+            # Sólo cuenta si la llamada se hizo desde el rerun de una sesión con perfil
+            perfil.registrar(f"servidor {metodo} {ruta}", ms)
+
+    def get(self, ruta, **kwargs):
+        return self.solicitar("GET", ruta, **kwargs)
+
+    def post(self, ruta, **kwargs):
+        return self.solicitar("POST", ruta, **kwargs)
+
+    def calentar(self, ruta=RUTA_FOLIO, timeout=TIMEOUT_CALENTAR):
+        """Despierta el servidor en segundo plano si no se ha usado recientemente.
+
+        No bloquea; si ya hay un calentamiento en curso o hubo contacto en los
+        últimos `VIGENCIA_CALENTADO` segundos no hace nada. Regresa el hilo o None.
+        """
+        with self._candado:
+            if self._calentando is not None and self._calentando.is_alive():
+                return None
+            if time.time() - self.ultimo_contacto < VIGENCIA_CALENTADO:
+                return None
+            self._calentando = threading.Thread(
+                target=self._ping, args=(ruta, timeout), name="calentar-servidor", daemon=True)
+            self._calentando.start()
+            return self._calentando
+
+    def _ping(self, ruta, timeout):
+        try:
+            self.get(ruta, timeout=timeout)
+        except requests.exceptions.RequestException:
+            pass  # Queda registrado como error en las métricas
+
+    def folio_actual(self, timeout=TIMEOUT_FOLIO):
+        """Folio actual del servidor (int). Lanza `requests.RequestException` o `ValueError`."""
+        respuesta = self.get(RUTA_FOLIO, timeout=timeout)
+        respuesta.raise_for_status()
+        return int(respuesta.json()['folio'])
+
+    def resumen_metricas(self):
+        """{endpoint: {llamadas, errores, p50_ms, p95_ms, max_ms}}."""
+        with self._candado:
+            return {endpoint: m.resumen() for endpoint, m in sorted(self.metricas.items())}
+
+
+_cliente = None
+_candado_cliente = threading.Lock()
+
+
+def cliente_compartido():
+    """El `ClienteServidor` del proceso (se crea la primera vez)."""
+    global _cliente
+    with _candado_cliente:
+        if _cliente is None:
+            _cliente = ClienteServidor()
+        return _cliente
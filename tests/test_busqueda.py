@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+import busqueda
+
+
+@pytest.fixture(scope="module")
+def buscador():
+    df = pd.DataFrame({
+        'codigo': ["10001", "10002", "10003", "20001", "20002"],
+        'descripcion': ["Martillo de uña 16 oz", "Desarmador plano 1/4", "Desarmador de cruz",
+                        "Azadón forjado y martillo", "Pinzas de electricista"],
+    })
+    df['display'] = df['codigo'] + " - " + df['descripcion']
+    return busqueda.BuscadorProductos(df)
+
+
+def codigos(buscador, consulta, limite=20):
+    return [buscador.codigos[i] for i in buscador.buscar(consulta, limite)]
+
+
+@pytest.mark.parametrize("consulta, esperado", [
+    ("martilo", "10001"),      # letra faltante
+    ("martilllo", "10001"),    # letra de más
+    ("marrillo", "10001"),     # letra cambiada
+    ("pinsas", "20002"),
+    ("electrisista", "20002"),
+])
+def test_tolera_un_error_de_dedo(buscador, consulta, esperado):
+    assert codigos(buscador, consulta)[0] == esperado
+
+
+def test_sin_acentos_ni_mayusculas(buscador):
+    assert codigos(buscador, "AZADON") == ["20001"]
+
+
+def test_palabras_cortas_no_son_difusas(buscador):
+    # Con menos de 4 letras sólo cuenta el prefijo exacto
+    assert codigos(buscador, "oz") == ["10001"]
+    assert codigos(buscador, "ox") == []
+
+
+def test_primera_palabra_gana_y_prefijo(buscador):
+    assert codigos(buscador, "martillo") == ["10001", "20001"]
+    assert codigos(buscador, "desarm") == ["10003", "10002"]
+    assert codigos(buscador, "desarm plano") == ["10002", "10003"]
+
+
+def test_codigo_exacto_y_prefijo(buscador):
+    assert codigos(buscador, "10002")[0] == "10002"
+    assert sorted(codigos(buscador, "2000")) == ["20001", "20002"]
+    assert codigos(buscador, "martillo", limite=1) == ["10001"]
@@ -0,0 +1,27 @@
+import carga_rapida
+
+MAPA = {"10001": ("Martillo", 50.0), "10002": ("Pinzas", 30)}
+
+
+def test_suma_codigos_repetidos_en_orden_de_aparicion():
+    resultado = carga_rapida.analizar_pedido("10002 1\n10001 2\n10002\t3\n", MAPA)
+    assert [(p['codigo'], p['cantidad']) for p in resultado['productos']] == [("10002", 4), ("10001", 2)]
+    assert resultado['productos'][0] == {'codigo': "10002", 'descripcion': "Pinzas", 'cantidad': 4,
+                                         'precio_base': 30.0}
+    assert resultado['lineas'] == 3
+
+
+def test_reporta_desconocidos_y_malformadas():
+    texto = "10001 2\n99999 5\n99999 1\nsin codigo\n123 4\n\n   \n"
+    resultado = carga_rapida.analizar_pedido(texto, MAPA)
+    assert [p['codigo'] for p in resultado['productos']] == ["10001"]
+    assert resultado['desconocidos'] == {"99999": 6}
+    assert resultado['malformadas'] == ["sin codigo", "123 4"]
+    # Las líneas vacías no cuentan
+    assert resultado['lineas'] == 5
+
+
+def test_texto_con_formato_de_excel():
+    resultado = carga_rapida.analizar_pedido("Código: 10001, Cant: 12\r\n10002 - 7 pzas\r\n", MAPA)
+    assert {p['codigo']: p['cantidad'] for p in resultado['productos']} == {"10001": 12, "10002": 7}
+    assert resultado['malformadas'] == []
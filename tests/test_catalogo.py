@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import catalogo
+
+CATALOGO = "100,Martillo, TRUPER,50\n101,Pinzas,30\n102,Desarmador plano,20\n"
+
+
+def escribir(ruta, contenido):
+    with open(ruta, 'wb') as f:
+        f.write(contenido.encode('utf-8'))
+    # Dos escrituras seguidas pueden quedar con el mismo mtime; se fuerza uno distinto
+    info = os.stat(ruta)
+    os.utime(ruta, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000))
+
+
+def normalizar(df):
+    return df[catalogo.COLUMNAS].sort_values('codigo').reset_index(drop=True)
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    ruta_cat, ruta_act = str(tmp_path / "catalogo.txt"), str(tmp_path / "actualizaciones.txt")
+    escribir(ruta_cat, CATALOGO)
+    return ruta_cat, ruta_act, str(tmp_path / "snapshot")
+
+
+@pytest.mark.parametrize("pasos", [
+    # Agregar al final
+    ["100,Martillo, TRUPER,55\n", "100,Martillo, TRUPER,55\n200,Nuevo,10\n"],
+    # Editar una línea y luego recortar el archivo
+    ["100,Martillo,55\n101,Pinzas,31\n", "100,Martillo,60\n101,Pinzas,31\n", "100,Martillo,60\n"],
+    # Sin salto de línea al final, que luego se completa, cambia o desaparece
+    ["100001,X,1.5", "100001,X,1.5\n", "100001,X,1.5\n200,Y,2", "100001,X,1.5\n200,Y,2.5", "100001,X,1.5\n"],
+    ["101,Pinzas,35", ""],
+])
+def test_recarga_incremental_igual_a_parsear(rutas, pasos):
+    ruta_cat, ruta_act, dir_snapshot = rutas
+    escribir(ruta_act, "")
+    incremental = catalogo.CatalogoIncremental(ruta_cat, ruta_act, dir_snapshot)
+    for contenido in pasos:
+        escribir(ruta_act, contenido)
+        pd.testing.assert_frame_equal(normalizar(incremental.refrescar()),
+                                      normalizar(catalogo.parsear_catalogo(ruta_cat, ruta_act)))
+
+
+def test_ultima_linea_sin_salto_al_arrancar(rutas):
+    ruta_cat, ruta_act, dir_snapshot = rutas
+    escribir(ruta_act, "100001,X,1.5")
+    df = catalogo.CatalogoIncremental(ruta_cat, ruta_act, dir_snapshot).df
+    assert df.loc[df['codigo'] == "100001", 'precio'].tolist() == [1.5]
+
+
+def test_recarga_completa_no_publica_el_base_sin_actualizar(rutas, monkeypatch):
+    ruta_cat, ruta_act, dir_snapshot = rutas
+    escribir(ruta_act, "100,Martillo, TRUPER,55\n")
+    incremental = catalogo.CatalogoIncremental(ruta_cat, ruta_act, dir_snapshot)
+    vistos = []
+    leer = incremental._leer_actualizaciones
+
+    def leer_y_espiar(df):
+        # A media recarga otra sesión todavía debe ver el catálogo anterior, ya actualizado
+        vistos.append(incremental.df.loc[incremental.df['codigo'] == "100", 'precio'].tolist())
+        return leer(df)
+
+    monkeypatch.setattr(incremental, '_leer_actualizaciones', leer_y_espiar)
+    escribir(ruta_cat, CATALOGO + "103,Serrucho,80\n")
+    df = incremental.refrescar()
+    assert vistos == [[55.0]]
+    assert df.loc[df['codigo'] == "100", 'precio'].tolist() == [55.0]
+    assert "103" in df['codigo'].tolist()
+
+
+def test_derivado_se_construye_una_vez_por_version(rutas):
+    ruta_cat, ruta_act, dir_snapshot = rutas
+    escribir(ruta_act, "")
+    incremental = catalogo.CatalogoIncremental(ruta_cat, ruta_act, dir_snapshot)
+    construidos = []
+
+    def constructor(df):
+        construidos.append(len(df))
+        time.sleep(0.05)
+        return len(df)
+
+    hilos = [threading.Thread(target=incremental.derivado, args=('conteo', constructor)) for _ in range(8)]
+    for hilo in hilos: hilo.start()
+    for hilo in hilos: hilo.join()
+    assert construidos == [3]
+
+    escribir(ruta_act, "200,Nuevo,10\n")
+    incremental.refrescar()
+    assert incremental.derivado('conteo', constructor) == 4
+    assert construidos == [3, 4]
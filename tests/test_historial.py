@@ -0,0 +1,71 @@
+from contextlib import closing
+
+import pytest
+
+import historial
+
+
+@pytest.fixture
+def ruta_db(tmp_path):
+    ruta = str(tmp_path / "historial.db")
+    historial.inicializar(ruta, str(tmp_path / "no_existe.json"))
+    return ruta
+
+
+def cotizacion(cot_id, fecha, cliente="1 - CLIENTE (Vend: 151)", productos=(("100", 2, 10.0),), total=None):
+    lineas = [{'codigo': c, 'descripcion': f"Producto {c}", 'cantidad': n, 'precio_base': p, 'precio_unitario': p}
+              for c, n, p in productos]
+    return {'id': cot_id, 'fecha': fecha, 'cliente': cliente, 'tipo_doc': "Cotización", 'lista_precios': "Distribuidor",
+            'total': total if total is not None else sum(n * p for _, n, p in productos), 'productos': lineas}
+
+
+def leer_ventas(ruta_db):
+    with closing(historial.conectar(ruta_db)) as conexion:
+        return {tabla: sorted(conexion.execute(f"SELECT * FROM {tabla}").fetchall())
+                for tabla in historial.AGREGADOS_VENTAS}
+
+
+def test_paginacion_por_cursor_sin_huecos_ni_repetidos(ruta_db):
+    # Varias con la misma fecha: el desempate es por id
+    for i in range(7):
+        historial.guardar(cotizacion(f"COT-{i}", f"2024-01-0{1 + i // 3} 10:00:00"), ruta_db)
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        pagina, cursor = historial.consultar(cursor=cursor, limite=3, ruta_db=ruta_db)
+        vistos += [fila['id'] for fila in pagina]
+        paginas += 1
+        if cursor is None:
+            break
+    assert paginas == 3
+    assert vistos == ["COT-6", "COT-5", "COT-4", "COT-3", "COT-2", "COT-1", "COT-0"]
+
+
+def test_paginacion_con_filtros(ruta_db):
+    historial.guardar(cotizacion("A", "2024-02-01 09:00:00", cliente="2 - FERRETERIA SOL (Vend: 151)"), ruta_db)
+    historial.guardar(cotizacion("B", "2024-02-02 09:00:00", cliente="3 - TLAPALERIA (Vend: 200)"), ruta_db)
+    historial.guardar(cotizacion("C", "2024-02-03 09:00:00", cliente="4 - FERRETERIA LUNA (Vend: 151)"), ruta_db)
+    pagina, cursor = historial.consultar(cliente="ferreteria", limite=1, ruta_db=ruta_db)
+    assert [f['id'] for f in pagina] == ["C"]
+    pagina, cursor = historial.consultar(cliente="ferreteria", cursor=cursor, limite=1, ruta_db=ruta_db)
+    assert [f['id'] for f in pagina] == ["A"] and cursor is None
+    pagina, _ = historial.consultar(vendedor="151", hasta="2024-02-01", ruta_db=ruta_db)
+    assert [f['id'] for f in pagina] == ["A"]
+
+
+def test_triggers_de_ventas_igual_a_reconstruir(ruta_db):
+    historial.guardar(cotizacion("A", "2024-03-01 10:00:00", productos=[("100", 2, 10.0), ("200", 1, 5.5)]), ruta_db)
+    historial.guardar(cotizacion("B", "2024-03-01 12:00:00", productos=[("100", 3, 10.0)]), ruta_db)
+    historial.guardar(cotizacion("C", "2024-04-02 12:00:00", cliente="9 - OTRO (Vend: 300)",
+                                 productos=[("300", 1, 99.0)]), ruta_db)
+    # Editar cambia líneas, cliente y fecha; las filas que quedan en cero deben desaparecer
+    historial.guardar(cotizacion("B", "2024-03-05 12:00:00", cliente="9 - OTRO (Vend: 300)",
+                                 productos=[("200", 4, 5.5)]), ruta_db)
+    historial.actualizar_recotizadas({"A": (31.0, [{'codigo': "100", 'cantidad': 2, 'precio_unitario': 12.75}])},
+                                     ruta_db)
+    with closing(historial.conectar(ruta_db)) as conexion, conexion:
+        conexion.execute("DELETE FROM cotizaciones WHERE id = 'C'")
+
+    por_triggers = leer_ventas(ruta_db)
+    historial.reconstruir_ventas(ruta_db)
+    assert por_triggers == leer_ventas(ruta_db)
+    assert not any(fila[-1] <= 0 for filas in por_triggers.values() for fila in filas)
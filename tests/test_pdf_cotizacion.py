@@ -0,0 +1,47 @@
+from collections import OrderedDict
+
+import pytest
+
+import pdf_cotizacion
+
+RENGLONES = [("100", "Martillo", 2, 50.0, 100.0)]
+
+
+@pytest.fixture
+def generados(monkeypatch):
+    """Cache vacío de 2 entradas; cada PDF "generado" se anota en la lista."""
+    lista = []
+
+    def generar(renglones, cliente, tipo_doc, lista_precios, total):
+        lista.append(cliente)
+        return f"pdf {cliente} {len(lista)}".encode()
+
+    monkeypatch.setattr(pdf_cotizacion, '_cache_pdf', OrderedDict())
+    monkeypatch.setattr(pdf_cotizacion, 'TAMANO_CACHE_PDF', 2)
+    monkeypatch.setattr(pdf_cotizacion, 'generar_pdf_lineas', generar)
+    return lista
+
+
+def pdf_de(cliente):
+    return pdf_cotizacion.generar_pdf_cacheado(RENGLONES, cliente, "Cotización", "Distribuidor", 100.0)
+
+
+def test_misma_cotizacion_sale_del_cache(generados):
+    assert pdf_de("A") == pdf_de("A")
+    assert generados == ["A"]
+    # Otro contenido es otra entrada
+    pdf_cotizacion.generar_pdf_cacheado(RENGLONES, "A", "Cotización", "Dimefet", 100.0)
+    assert generados == ["A", "A"]
+
+
+def test_lru_saca_el_menos_usado(generados):
+    pdf_de("A")
+    pdf_de("B")
+    pdf_de("A")  # A pasa a ser el más reciente
+    pdf_de("C")  # sale B
+    assert len(pdf_cotizacion._cache_pdf) == 2
+    pdf_de("A")
+    assert generados == ["A", "B", "C"]
+    pdf_de("B")
+    assert generados == ["A", "B", "C", "B"]
+
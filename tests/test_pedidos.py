@@ -0,0 +1,113 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import pedidos
+
+PAYLOAD = {"clientName": "CLIENTE", "agentId": "151", "clientId": "1", "products": []}
+
+
+class Respuesta:
+    def __init__(self, status_code, cuerpo=None):
+        self.status_code = status_code
+        self._cuerpo = cuerpo
+        self.text = str(cuerpo)
+
+    def json(self):
+        if self._cuerpo is None:
+            raise ValueError("sin JSON")
+        return self._cuerpo
+
+
+class ClienteFalso:
+    """Regresa (o lanza) las respuestas en orden y guarda las claves de cada POST."""
+
+    def __init__(self, *respuestas):
+        self.respuestas = list(respuestas)
+        self.claves = []
+
+    def post(self, ruta, data, timeout, headers):
+        self.claves.append(headers["Idempotency-Key"])
+        respuesta = self.respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+
+def sin_conexion():
+    return requests.exceptions.ConnectionError(
+        MaxRetryError(None, "/api/crear-pedido", NewConnectionError(None, "Connection refused")))
+
+
+@pytest.fixture
+def buzon_con(tmp_path):
+    def crear(*respuestas, max_intentos=5):
+        cliente = ClienteFalso(*respuestas)
+        # Sin backoff: cada reintento toca de inmediato y procesar_pendientes lo entrega en la misma vuelta
+        buzon = pedidos.BuzonPedidos(str(tmp_path / "buzon.db"), cliente=cliente, backoff_inicial=0,
+                                     max_intentos=max_intentos)
+        return buzon, cliente
+    return crear
+
+
+def test_reintenta_5xx_y_sin_conexion_hasta_entregar(buzon_con):
+    buzon, cliente = buzon_con(Respuesta(503, "dormido"), sin_conexion(), Respuesta(429, "espera"),
+                               Respuesta(201, {"folio": 1234}))
+    clave = buzon.encolar(PAYLOAD, clave="cot-1:1")
+    buzon.procesar_pendientes()
+    estado = buzon.estado(clave)
+    assert (estado['estado'], estado['intentos'], estado['folio'], estado['error']) == ('enviado', 4, "1234", None)
+    assert cliente.claves == [clave] * 4
+
+
+def test_misma_clave_no_duplica(buzon_con):
+    buzon, cliente = buzon_con(Respuesta(201, {"folio": 1}))
+    assert buzon.encolar(PAYLOAD, clave="cot-1:1") == buzon.encolar(PAYLOAD, clave="cot-1:1")
+    buzon.procesar_pendientes()
+    assert len(cliente.claves) == 1 and buzon.pendientes() == 0
+
+
+@pytest.mark.parametrize("respuesta", [
+    requests.exceptions.ReadTimeout("sin respuesta"),
+    requests.exceptions.ConnectionError("Connection aborted"),
+    Respuesta(201, {"otro": 1}),
+])
+def test_respuesta_perdida_queda_incierta_y_no_se_reenvia(buzon_con, respuesta):
+    buzon, cliente = buzon_con(respuesta, Respuesta(201, {"folio": 7}))
+    clave = buzon.encolar(PAYLOAD)
+    buzon.procesar_pendientes()
+    assert buzon.estado(clave)['estado'] == 'incierto'
+    assert len(cliente.claves) == 1
+
+    # Sólo a mano, después de revisar el ERP
+    buzon.reintentar(clave)
+    assert buzon.estado(clave)['estado'] == 'pendiente'
+    buzon.procesar_pendientes()
+    assert (buzon.estado(clave)['estado'], buzon.estado(clave)['folio']) == ('enviado', "7")
+
+
+def test_4xx_se_rechaza(buzon_con):
+    buzon, cliente = buzon_con(Respuesta(400, "cliente inválido"))
+    clave = buzon.encolar(PAYLOAD)
+    buzon.procesar_pendientes()
+    estado = buzon.estado(clave)
+    assert estado['estado'] == 'rechazado' and estado['error'].startswith("400")
+
+
+def test_se_agotan_los_intentos(buzon_con):
+    buzon, cliente = buzon_con(Respuesta(502, "x"), Respuesta(502, "x"), Respuesta(201, {"folio": 1}),
+                               max_intentos=2)
+    clave = buzon.encolar(PAYLOAD)
+    buzon.procesar_pendientes()
+    assert (buzon.estado(clave)['estado'], buzon.estado(clave)['intentos']) == ('fallido', 2)
+    assert len(cliente.claves) == 2
+
+
+def test_backoff_reprograma_a_futuro(tmp_path):
+    buzon = pedidos.BuzonPedidos(str(tmp_path / "buzon.db"), cliente=ClienteFalso(Respuesta(503, "x")),
+                                 backoff_inicial=60)
+    clave = buzon.encolar(PAYLOAD)
+    espera = buzon.procesar_pendientes()
+    estado = buzon.estado(clave)
+    assert (estado['estado'], estado['intentos']) == ('pendiente', 1)
+    assert 60 * 0.8 - 1 <= espera <= 60 * 1.2
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+import historial
+import listas_precios
+import recotizar
+
+
+@pytest.fixture
+def ruta_db(tmp_path):
+    ruta = str(tmp_path / "historial.db")
+    historial.inicializar(ruta, str(tmp_path / "no_existe.json"))
+    return ruta
+
+
+def catalogo_con(*productos):
+    df = pd.DataFrame(productos, columns=['codigo', 'descripcion', 'precio'])
+    df['display'] = df['codigo'] + " - " + df['descripcion']
+    return df
+
+
+def linea(codigo, cantidad, precio_base, divisor=1.0):
+    return {'codigo': codigo, 'descripcion': f"Producto {codigo}", 'cantidad': cantidad,
+            'precio_base': precio_base, 'precio_unitario': round(precio_base / divisor, 2)}
+
+
+def test_guardar_reescribe_lineas_y_total(ruta_db):
+    historial.guardar({'id': "A", 'fecha': "2024-05-01 10:00:00", 'cliente': "1 - CLIENTE (Vend: 151)",
+                       'lista_precios': "Dimefet", 'total': 2 * 100.0 + 1 * 50.0,
+                       'productos': [linea("100", 2, 90.0, 0.9), linea("999", 1, 45.0, 0.9)]}, ruta_db)
+    historial.guardar({'id': "B", 'fecha': "2024-05-02 10:00:00", 'cliente': "2 - OTRO (Vend: 151)",
+                       'lista_precios': "Distribuidor", 'total': 30.0, 'productos': [linea("200", 3, 10.0)]}, ruta_db)
+    df_catalogo = catalogo_con(("100", "Martillo", 108.0), ("200", "Pinzas", 10.0))
+    motor = listas_precios.MotorPrecios(listas_precios.LISTAS_PRECIOS)
+
+    reporte = recotizar.recotizar_historial(df_catalogo, motor, ruta_db)
+    assert reporte.totales_nuevos() == {"A": 290.0}
+    assert reporte.faltantes['codigo'].tolist() == ["999"]
+    assert historial.actualizar_recotizadas(reporte.cambios(), ruta_db) == 1
+
+    guardada = historial.obtener("A", ruta_db)
+    assert guardada['total'] == 290.0
+    nueva, faltante = guardada['productos']
+    assert (nueva['precio_base'], nueva['precio_unitario'], nueva['cantidad']) == (108.0, 120.0, 2)
+    # El código que ya no está en el catálogo conserva su precio guardado
+    assert (faltante['precio_base'], faltante['precio_unitario']) == (45.0, 50.0)
+    assert historial.obtener("B", ruta_db)['productos'] == [linea("200", 3, 10.0)]
+
+    # Una segunda corrida ya no encuentra nada que cambiar
+    reporte = recotizar.recotizar_historial(df_catalogo, motor, ruta_db)
+    assert reporte.totales_nuevos() == {} and reporte.lineas_cambiadas.empty and reporte.cambios() == {}
@@ -0,0 +1,25 @@
+"""Utilidades de texto compartidas (acentos, normalización)."""
+import re
+
+REEMPLAZOS_ACENTOS = {
+    'á':'a', 'é':'e', 'í':'i', 'ó':'o', 'ú':'u',
+    'Á':'A', 'É':'E', 'Í':'I', 'Ó':'O', 'Ú':'U',
+    'ñ':'n', 'Ñ':'N', 'ü':'u', 'Ü':'U'
+}
+
+_TABLA_ACENTOS = str.maketrans(REEMPLAZOS_ACENTOS)
+
+
+def quitar_acentos(texto):
+    """Reemplaza vocales acentuadas, ñ y ü por su letra simple."""
+    return texto.translate(_TABLA_ACENTOS)
+
+
+def limpiar_nombre_archivo(nombre):
+    """Convierte el nombre del cliente en un nombre de archivo seguro."""
+    nombre = quitar_acentos(nombre)
+
+    nombre = re.sub(r'[<>:"/\\|?*,\.]', '', nombre)
+    nombre = '_'.join(nombre.split())
+
+    return nombre[:50] if nombre else "MOSTRADOR"
@@ -0,0 +1,155 @@
+"""Consultas de ventas para el tablero de gerencia.
+
+Antes había que leer todo el historial y recorrer los `productos` de cada
+cotización en Python. Aquí todo sale de los agregados `ventas_*` de
+`historial.py`, que se actualizan en cada guardado, así que las consultas sólo
+suman filas ya agregadas: por vendedor, cliente y mes desde
+`ventas_diarias_cliente`; los productos desde `ventas_mensuales_codigo` si el
+rango son meses completos y sin filtro de vendedor o cliente, y si no desde el
+detalle `ventas_diarias`. Los importes son los de los precios con que se
+cotizó cada línea.
+
+    python ventas.py                                  # resumen de todo el historial
+    python ventas.py --desde 2026-01-01 --vendedor 151
+    python ventas.py reconstruir                      # recalcular desde todo el historial
+"""
+import argparse
+import sys
+import time
+from contextlib import closing
+from datetime import date, timedelta
+
+import historial
+
+ORDENES = ('importe', 'cantidad', 'cotizaciones')
+
+
+def _rango_mensual(desde, hasta):
+    """('YYYY-MM', 'YYYY-MM') si `desde`/`hasta` cubren meses completos (o faltan), si no None."""
+    if desde and date.fromisoformat(str(desde)).day != 1:
+        return None
+    if hasta and (date.fromisoformat(str(hasta)) + timedelta(days=1)).day != 1:
+        return None
+    return (str(desde)[:7] if desde else None), (str(hasta)[:7] if hasta else None)
+
+
+def _filtros(columna_fecha, desde=None, hasta=None, vendedor=None, cliente=None, codigo=None):
+    """WHERE y parámetros comunes; `desde`/`hasta` son inclusivos."""
+    condiciones, parametros = [], []
+    for columna, operador, valor in ((columna_fecha, '>=', desde), (columna_fecha, '<=', hasta),
+                                     ('vendedor', '=', vendedor), ('cliente', '=', cliente), ('codigo', '=', codigo)):
+        if valor:
+            condiciones.append(f"{columna} {operador} ?")
+            parametros.append(str(valor))
+    return (f"WHERE {' AND '.join(condiciones)}" if condiciones else ""), parametros
+
+
+def _consultar(sql, parametros, columnas, ruta_db):
+    with closing(historial.conectar(ruta_db)) as conexion:
+        filas = conexion.execute(sql, parametros).fetchall()
+    return [dict(zip(columnas, f)) for f in filas]
+
+
+def _origen_por_codigo(desde, hasta, vendedor=None, cliente=None, codigo=None):
+    """Tabla, WHERE y parámetros para agrupar por código: la mensual si alcanza, si no el detalle diario."""
+    mensual = _rango_mensual(desde, hasta)
+    if mensual and not vendedor and not cliente:
+        return ("ventas_mensuales_codigo", *_filtros('mes', *mensual, codigo=codigo))
+    return ("ventas_diarias", *_filtros('dia', desde, hasta, vendedor, cliente, codigo))
+
+
+def productos_top(desde=None, hasta=None, vendedor=None, cliente=None, por='importe', limite=10,
+                  ruta_db=historial.ARCHIVO_HISTORIAL_DB):
+    """Los `limite` códigos con más `por` ('importe', 'cantidad' o 'cotizaciones')."""
+    if por not in ORDENES:
+        raise ValueError(f"Orden desconocido: {por}")
+    tabla, where, parametros = _origen_por_codigo(desde, hasta, vendedor, cliente)
+    return _consultar(
+        f"SELECT codigo, SUM(cantidad), SUM(importe), SUM(cotizaciones) FROM {tabla} {where} "
+        f"GROUP BY codigo ORDER BY SUM({por}) DESC LIMIT ?", (*parametros, limite),
+        ['codigo', 'cantidad', 'importe', 'cotizaciones'], ruta_db)
+
+
+def totales_por_vendedor(desde=None, hasta=None, ruta_db=historial.ARCHIVO_HISTORIAL_DB):
+    """Importe, piezas, cotizaciones y clientes distintos por vendedor, de mayor a menor importe."""
+    where, parametros = _filtros('dia', desde, hasta)
+    return _consultar(
+        "SELECT vendedor, SUM(importe), SUM(cantidad), SUM(cotizaciones), COUNT(DISTINCT cliente) "
+        f"FROM ventas_diarias_cliente {where} GROUP BY vendedor ORDER BY SUM(importe) DESC", parametros,
+        ['vendedor', 'importe', 'cantidad', 'cotizaciones', 'clientes'], ruta_db)
+
+
+def totales_por_cliente(desde=None, hasta=None, vendedor=None, limite=None, ruta_db=historial.ARCHIVO_HISTORIAL_DB):
+    """Importe, piezas y cotizaciones por cliente, de mayor a menor importe."""
+    where, parametros = _filtros('dia', desde, hasta, vendedor)
+    return _consultar(
+        f"SELECT cliente, vendedor, SUM(importe), SUM(cantidad), SUM(cotizaciones) FROM ventas_diarias_cliente {where} "
+        "GROUP BY cliente, vendedor ORDER BY SUM(importe) DESC LIMIT ?", (*parametros, limite or -1),
+        ['cliente', 'vendedor', 'importe', 'cantidad', 'cotizaciones'], ruta_db)
+
+
+def tendencia_mensual(desde=None, hasta=None, vendedor=None, cliente=None, codigo=None,
+                      ruta_db=historial.ARCHIVO_HISTORIAL_DB):
+    """Importe y piezas por mes ('YYYY-MM') con la variación contra el mes anterior (None en el primero)."""
+    if codigo:
+        tabla, where, parametros = _origen_por_codigo(desde, hasta, vendedor, cliente, codigo)
+    else:
+        tabla, (where, parametros) = "ventas_diarias_cliente", _filtros('dia', desde, hasta, vendedor, cliente)
+    columna_mes = "mes" if tabla == "ventas_mensuales_codigo" else "substr(dia, 1, 7)"
+    meses = _consultar(
+        f"SELECT {columna_mes}, SUM(importe), SUM(cantidad) FROM {tabla} {where} GROUP BY 1 ORDER BY 1",
+        parametros, ['mes', 'importe', 'cantidad'], ruta_db)
+    anterior = None
+    for mes in meses:
+        mes['variacion'] = (mes['importe'] - anterior) / anterior if anterior else None
+        anterior = mes['importe']
+    return meses
+
+
+def imprimir_resumen(desde=None, hasta=None, vendedor=None, limite=10, ruta_db=historial.ARCHIVO_HISTORIAL_DB):
+    inicio = time.perf_counter()
+    top = productos_top(desde, hasta, vendedor, limite=limite, ruta_db=ruta_db)
+    vendedores = totales_por_vendedor(desde, hasta, ruta_db=ruta_db)
+    clientes = totales_por_cliente(desde, hasta, vendedor, limite=limite, ruta_db=ruta_db)
+    meses = tendencia_mensual(desde, hasta, vendedor, ruta_db=ruta_db)
+    ms = (time.perf_counter() - inicio) * 1000
+
+    print("Productos más vendidos:")
+    for p in top:
+        print(f"  {p['codigo']:<12} {p['cantidad']:>10,.0f} pzas  ${p['importe']:>14,.2f}  {p['cotizaciones']} cot.")
+    print("Por vendedor:")
+    for v in vendedores:
+        print(f"  {v['vendedor'] or '(sin vendedor)':<14} ${v['importe']:>14,.2f}  {v['cotizaciones']} cot., "
+              f"{v['clientes']} clientes")
+    print("Por cliente:")
+    for c in clientes:
+        print(f"  {c['cliente'][:50]:<50} {c['vendedor']:<6} ${c['importe']:>14,.2f}")
+    print("Por mes:")
+    for m in meses:
+        variacion = f"{m['variacion']:+.1%}" if m['variacion'] is not None else ""
+        print(f"  {m['mes']}  ${m['importe']:>14,.2f}  {variacion}")
+    print(f"({ms:.1f} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("accion", nargs="?", choices=["resumen", "reconstruir"], default="resumen")
+    parser.add_argument("--db", default=historial.ARCHIVO_HISTORIAL_DB)
+    parser.add_argument("--desde", help="YYYY-MM-DD")
+    parser.add_argument("--hasta", help="YYYY-MM-DD")
+    parser.add_argument("--vendedor")
+    parser.add_argument("--limite", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    historial.inicializar(args.db)
+    if args.accion == "reconstruir":
+        inicio = time.perf_counter()
+        filas = historial.reconstruir_ventas(args.db)
+        print(f"{filas} filas en los agregados de ventas ({time.perf_counter() - inicio:.2f} s)")
+    else:
+        imprimir_resumen(args.desde, args.hasta, args.vendedor, args.limite, args.db)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())